@@ -3,9 +3,15 @@ from flask import Flask, render_template, request, redirect, url_for, flash, jso
 from werkzeug.utils import secure_filename
 import json
 import logging
+import mimetypes
+import threading
+import uuid
 import database
+import edit_cache
+import jobs
+import search
+import transcoder
 import utils
-from pydub import AudioSegment
 import io
 
 # Configuração de logging
@@ -15,6 +21,15 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "rivoTRIOwebapp")
 
+# Envios maiores que o limite são recusados pelo Werkzeug antes de serem lidos (413)
+app.config['MAX_CONTENT_LENGTH'] = utils.UPLOAD_MAX_BYTES + 1024 * 1024  # folga para os campos do formulário
+
+# Validade no navegador de um arquivo de áudio pedido pela URL versionada (1 ano)
+AUDIO_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Protege a escolha de nomes das edições que terminam ao mesmo tempo
+_edit_names_lock = threading.Lock()
+
 # Garantir que os diretórios existam
 def ensure_directories_exist():
     dirs = utils.get_audio_paths()
@@ -32,13 +47,51 @@ def index():
     audios = database.get_all_audios()
     return render_template('index.html', audios=audios)
 
+def content_version(audio):
+    """Versão do conteúdo de um áudio, usada como ETag e no parâmetro ?v= das URLs.
+
+    Vem do arquivo servido (inode, mtime e tamanho), e não do sha256 gravado
+    no upload, que descreve o envio antes da conversão: uma reconversão ou
+    um ajuste de ganho gera outra versão. Não lê o conteúdo, então a página
+    inicial não precisa ler todos os arquivos do catálogo.
+    """
+    st = os.stat(audio['caminho'])
+    return f"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"
+
+@app.template_global()
+def audio_url(audio):
+    """URL do arquivo de um áudio com a versão do conteúdo (pode ficar em cache indefinidamente)"""
+    try:
+        return url_for('get_audio', name=audio['nome'], v=content_version(audio))
+    except OSError:
+        return url_for('get_audio', name=audio['nome'])
+
 @app.route('/audio/<name>')
 def get_audio(name):
-    """Retorna o arquivo de áudio para reprodução"""
+    """Retorna o arquivo de áudio para reprodução.
+
+    Suporta Range (206, para o player avançar sem baixar tudo) e GET
+    condicional por ETag (304). Com ?v= igual à versão atual, a URL
+    identifica um conteúdo imutável e o navegador guarda o arquivo por um
+    ano sem revalidar; sem ela, o navegador revalida a cada uso.
+    """
     audio = database.get_audio_by_name(name)
-    if audio:
-        return send_file(audio['caminho'], mimetype='audio/mpeg')
-    return "Áudio não encontrado", 404
+    if not audio:
+        return "Áudio não encontrado", 404
+    
+    try:
+        version = content_version(audio)
+    except OSError:
+        return "Arquivo de áudio não encontrado", 404
+    
+    mimetype = mimetypes.guess_type(audio['caminho'])[0] or 'audio/mpeg'
+    # Caminho absoluto: o Flask resolveria um caminho relativo a partir da pasta do app
+    response = send_file(os.path.abspath(audio['caminho']), mimetype=mimetype, conditional=True, etag=version)
+    if request.args.get('v') == version:
+        response.headers['Cache-Control'] = f'public, max-age={AUDIO_IMMUTABLE_MAX_AGE}, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/audio/view/<name>')
 def view_audio(name):
@@ -76,25 +129,141 @@ def upload_audio():
             # Salvar o arquivo
             audio_dir = utils.get_audio_paths()[0]  # Pasta de originais
             file_path = os.path.join(audio_dir, f"{nome}.mp3")
-            
-            # Converter para MP3 se necessário
+            # O arquivo pode continuar em uso por duplicatas de um áudio renomeado ou
+            # excluído: nunca sobrescrever, escolher outro nome de arquivo
+            count = 1
+            while os.path.exists(file_path) or database.count_references(file_path) > 0:
+                file_path = os.path.join(audio_dir, f"{nome}_{count}.mp3")
+                count += 1
+
+            # Salvar o envio em disco, em blocos, calculando o hash do conteúdo
+            upload_path = os.path.join(audio_dir, f".upload_{uuid.uuid4().hex}")
             try:
-                audio = AudioSegment.from_file(file)
-                audio.export(file_path, format="mp3")
+                with open(upload_path, 'wb') as f:
+                    writer = utils.HashingWriter(f, max_bytes=utils.UPLOAD_MAX_BYTES)
+                    file.save(writer)
+                sha256 = writer.hexdigest()
                 
-                # Obter duração
-                duracao = len(audio)
+                # Mesmo conteúdo de um áudio existente: compartilhar o arquivo, sem converter
+                duplicate_of, shared = utils.reuse_duplicate(upload_path, sha256)
+                if duplicate_of:
+                    caminho = shared.pop('caminho')
+                    duracao = shared.pop('duracao', None)
+                else:
+                    # Converter para MP3 em um processo FFmpeg (o áudio não é decodificado no worker)
+                    success, result = utils.convert_to_mp3(upload_path, file_path)
+                    os.remove(upload_path)
+                    if not success:
+                        flash(f'Erro ao processar o arquivo: {result}')
+                        return redirect(request.url)
+                    caminho = file_path
+                    
+                    # Obter duração (lida do cabeçalho)
+                    duracao = utils.get_audio_duration(file_path)
                 
                 # Adicionar ao banco de dados
-                database.add_audio(nome, file_path, "original", emoji, duracao)
-                flash(f'Áudio "{nome}" adicionado com sucesso!')
+                success, result = database.add_audio(nome, caminho, "original", emoji, duracao, sha256=sha256, **shared)
+                if not success:
+                    # O arquivo compartilhado pertence ao áudio existente e não é apagado
+                    if not duplicate_of:
+                        utils.release_audio_file(caminho)
+                    flash(result)
+                    return redirect(request.url)
+                
+                transcoder.schedule_ingest(result)
+                if duplicate_of:
+                    flash(f'Áudio "{nome}" adicionado com sucesso! O conteúdo é igual ao de "{duplicate_of}" e o arquivo foi reaproveitado.')
+                else:
+                    flash(f'Áudio "{nome}" adicionado com sucesso!')
                 return redirect(url_for('index'))
             except Exception as e:
+                if os.path.exists(upload_path):
+                    os.remove(upload_path)
                 logger.error(f"Erro ao processar o arquivo: {e}")
                 flash(f'Erro ao processar o arquivo: {e}')
                 return redirect(request.url)
     
-    return render_template('upload.html')
+    return render_template('upload.html', max_mb=f"{utils.UPLOAD_MAX_MB:g}")
+
+@app.errorhandler(413)
+def upload_too_large(e):
+    """Envio maior que UPLOAD_MAX_MB"""
+    flash(f'O arquivo excede o limite de {utils.UPLOAD_MAX_MB:.0f} MB')
+    return redirect(url_for('upload_audio'))
+
+def _wants_json():
+    """Requisição feita pelo JavaScript da página (espera JSON em vez de redirecionamento)"""
+    return (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+            or request.accept_mimetypes.best == 'application/json')
+
+def _edit_error(name, message):
+    if _wants_json():
+        return jsonify({'erro': message}), 400
+    flash(message)
+    return redirect(url_for('edit_audio', name=name))
+
+def _finish_edit(audio, suffix):
+    """Função executada pela fila ao fim da edição: registra o novo áudio"""
+    def finish(job):
+        audio_dir = utils.get_audio_paths()[1]  # Pasta de editados
+        # Escolher o nome e registrar sob o lock, já que outra edição pode terminar ao mesmo tempo
+        with _edit_names_lock:
+            new_name = f"{audio['nome']}_{suffix}"
+            count = 1
+            while database.get_audio_by_name(new_name) or os.path.exists(os.path.join(audio_dir, f"{new_name}.mp3")):
+                new_name = f"{audio['nome']}_{suffix}_{count}"
+                count += 1
+            
+            new_path = os.path.join(audio_dir, f"{new_name}.mp3")
+            os.replace(job.output_path, new_path)
+            
+            # Obter duração do novo áudio (lida do cabeçalho)
+            duracao = utils.get_audio_duration(new_path)
+            success, result = database.add_audio(new_name, new_path, "editado", "", duracao)
+        
+        if not success:
+            os.remove(new_path)
+            raise RuntimeError(f"Erro ao registrar áudio no banco de dados: {result}")
+        
+        transcoder.schedule_ingest(result)
+        return {'nome': new_name, 'duracao': duracao}
+    return finish
+
+def _submit_edit(audio, label, suffix, done_message, operations):
+    """Enfileira uma edição e responde com o id do job, sem esperar o FFmpeg.
+
+    Uma edição já feita sobre o mesmo conteúdo é reaproveitada do cache de
+    edições, sem executar o FFmpeg de novo.
+    """
+    name = audio['nome']
+    audio_dir = utils.get_audio_paths()[1]  # Pasta de editados
+    # Arquivo temporário; recebe o nome definitivo quando a edição termina
+    output_path = os.path.join(audio_dir, f".job_{uuid.uuid4().hex}.mp3")
+    
+    def prepare(job):
+        # Hash do conteúdo e ffprobe do original, executados na thread da fila
+        try:
+            key = edit_cache.cache_key(audio['caminho'], operations)
+            command, expected_ms = utils.build_edit_command(audio['caminho'], output_path, operations)
+        except Exception as e:
+            raise RuntimeError(f'Erro ao {label} o áudio: {e}') from e
+        return command, expected_ms, key
+    
+    job = jobs.web_queue.submit(
+        f"{label} {name}", None, output_path,
+        finish=_finish_edit(audio, suffix), prepare=prepare
+    )
+    logger.info(f"Job {job.id} enfileirado: {label} {name}")
+    
+    if _wants_json():
+        return jsonify({
+            'job_id': job.id,
+            'status_url': url_for('api_job_status', job_id=job.id),
+            'mensagem': done_message
+        }), 202
+    flash(f'Edição enviada para a fila (job {job.id}). O novo áudio aparece na lista quando terminar.')
+    return redirect(url_for('edit_audio', name=name, job=job.id))
+
 @app.route('/audio/edit/<name>', methods=['GET', 'POST'])
 def edit_audio(name):
     """Página para edição de áudios"""
@@ -133,101 +302,48 @@ def edit_audio(name):
             try:
                 start_ms = utils.parse_time(start_time)
                 end_ms = utils.parse_time(end_time)
-                
-                if start_ms >= end_ms:
-                    flash('O tempo de início deve ser menor que o tempo de fim')
-                    return redirect(url_for('edit_audio', name=name))
-                
-                # Gerar um novo nome para o áudio editado
-                new_name = f"{name}_cortado"
-                count = 1
-                while database.get_audio_by_name(new_name):
-                    new_name = f"{name}_cortado_{count}"
-                    count += 1
-                
-                # Caminho para o novo arquivo
-                audio_dir = utils.get_audio_paths()[1]  # Pasta de editados
-                new_path = os.path.join(audio_dir, f"{new_name}.mp3")
-                
-                # Cortar o áudio
-                utils.cut_audio(audio['caminho'], new_path, start_ms, end_ms)
-                
-                # Obter duração do novo áudio
-                audio_segment = AudioSegment.from_file(new_path)
-                duracao = len(audio_segment)
-                
-                # Adicionar ao banco de dados
-                database.add_audio(new_name, new_path, "editado", "", duracao)
-                flash(f'Áudio cortado com sucesso e salvo como "{new_name}"!')
-                return redirect(url_for('index'))
             except Exception as e:
-                logger.error(f"Erro ao cortar o áudio: {e}")
-                flash(f'Erro ao cortar o áudio: {e}')
-                return redirect(url_for('edit_audio', name=name))
-        
-        elif operation == 'reverse':
-            # Gerar um novo nome para o áudio editado
-            new_name = f"{name}_invertido"
-            count = 1
-            while database.get_audio_by_name(new_name):
-                new_name = f"{name}_invertido_{count}"
-                count += 1
+                return _edit_error(name, f'Tempo inválido: {e}')
             
-            # Caminho para o novo arquivo
-            audio_dir = utils.get_audio_paths()[1]  # Pasta de editados
-            new_path = os.path.join(audio_dir, f"{new_name}.mp3")
+            if start_ms >= end_ms:
+                return _edit_error(name, 'O tempo de início deve ser menor que o tempo de fim')
             
-            try:
-                # Inverter o áudio
-                utils.reverse_audio(audio['caminho'], new_path)
-                
-                # Obter duração do novo áudio (deve ser a mesma do original)
-                duracao = audio.get('duracao', 0)
-                
-                # Adicionar ao banco de dados
-                database.add_audio(new_name, new_path, "editado", "", duracao)
-                flash(f'Áudio invertido com sucesso e salvo como "{new_name}"!')
-                return redirect(url_for('index'))
-            except Exception as e:
-                logger.error(f"Erro ao inverter o áudio: {e}")
-                flash(f'Erro ao inverter o áudio: {e}')
-                return redirect(url_for('edit_audio', name=name))
+            return _submit_edit(
+                audio, 'cortar', 'cortado', 'Áudio cortado',
+                [('cortar', start_ms, end_ms)]
+            )
+        
+        elif operation == 'reverse':
+            return _submit_edit(
+                audio, 'inverter', 'invertido', 'Áudio invertido',
+                [('inverter',)]
+            )
         
         elif operation == 'speed':
-            speed_factor = float(request.form.get('speed_factor', 1.0))
+            try:
+                speed_factor = float(request.form.get('speed_factor', 1.0))
+            except ValueError:
+                return _edit_error(name, 'Fator de velocidade inválido')
             
             if speed_factor <= 0:
-                flash('O fator de velocidade deve ser maior que zero')
-                return redirect(url_for('edit_audio', name=name))
+                return _edit_error(name, 'O fator de velocidade deve ser maior que zero')
             
-            # Gerar um novo nome para o áudio editado
             speed_text = "rapido" if speed_factor > 1 else "lento"
-            new_name = f"{name}_{speed_text}"
-            count = 1
-            while database.get_audio_by_name(new_name):
-                new_name = f"{name}_{speed_text}_{count}"
-                count += 1
-            
-            # Caminho para o novo arquivo
-            audio_dir = utils.get_audio_paths()[1]  # Pasta de editados
-            new_path = os.path.join(audio_dir, f"{new_name}.mp3")
-            
+            return _submit_edit(
+                audio, 'velocidade', speed_text, 'Velocidade alterada',
+                [('velocidade', speed_factor)]
+            )
+        
+        elif operation == 'pipeline':
             try:
-                # Alterar a velocidade do áudio
-                utils.change_speed(audio['caminho'], new_path, speed_factor)
-                
-                # Obter duração do novo áudio
-                audio_segment = AudioSegment.from_file(new_path)
-                duracao = len(audio_segment)
-                
-                # Adicionar ao banco de dados
-                database.add_audio(new_name, new_path, "editado", "", duracao)
-                flash(f'Velocidade alterada com sucesso e salvo como "{new_name}"!')
-                return redirect(url_for('index'))
-            except Exception as e:
-                logger.error(f"Erro ao alterar a velocidade do áudio: {e}")
-                flash(f'Erro ao alterar a velocidade do áudio: {e}')
-                return redirect(url_for('edit_audio', name=name))
+                operations = utils.parse_edit_operations(request.form.get('operations', '').split())
+            except ValueError as e:
+                return _edit_error(name, str(e))
+            
+            return _submit_edit(
+                audio, 'editar', 'editado', 'Áudio editado',
+                operations
+            )
     
     return render_template('edit.html', audio=audio)
 @app.route('/audio/delete/<name>', methods=['POST'])
@@ -239,12 +355,14 @@ def delete_audio(name):
         return redirect(url_for('index'))
     
     try:
-        # Remover o arquivo
-        if os.path.exists(audio['caminho']):
-            os.remove(audio['caminho'])
-        
         # Remover do banco de dados
-        database.remove_audio(name)
+        success, result = database.remove_audio(name)
+        if not success:
+            flash(f'Erro ao excluir o áudio: {result}')
+            return redirect(url_for('index'))
+        
+        # Remover o arquivo, se nenhum outro áudio tiver o mesmo conteúdo
+        utils.release_audio_file(result['caminho'])
         flash(f'Áudio "{name}" excluído com sucesso!')
     except Exception as e:
         logger.error(f"Erro ao excluir o áudio: {e}")
@@ -258,6 +376,22 @@ def api_audios():
     audios = database.get_all_audios()
     return jsonify(audios)
 
+@app.route('/api/jobs/<int:job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """API para acompanhar uma edição em andamento"""
+    job = jobs.web_queue.get(job_id)
+    if not job:
+        return jsonify({'erro': 'Job não encontrado'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/search', methods=['GET'])
+def api_search():
+    """API de busca aproximada por nome de áudio ('você quis dizer')"""
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 5, type=int), 25)
+    results = search.search(query, limit)
+    return jsonify([{"nome": nome, "score": score} for nome, score in results])
+
 @app.route('/audio/share/<name>')
 def share_audio(name):
     """Gera um link de compartilhamento para um áudio específico"""
@@ -0,0 +1,559 @@
+import os
+import sys
+import logging
+import shutil
+import subprocess
+import threading
+from array import array
+from functools import lru_cache
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import discord
+
+try:
+    import numpy as np
+except ImportError:  # Mixagem em Python puro, mais lenta
+    np = None
+
+# Configuração do logger
+logger = logging.getLogger('discord_bot.audio_sources')
+
+# Um quadro de 20 ms de PCM s16le, 48 kHz, estéreo (3840 bytes)
+FRAME_SIZE = discord.opus.Encoder.FRAME_SIZE
+
+# Limite de memória do cache de quadros
+FRAME_CACHE_MAX_BYTES = int(float(os.environ.get('AUDIO_FRAME_CACHE_MB', '64')) * 1024 * 1024)
+
+# Clipes mais longos que isso não entram no cache de quadros (PCM ou Opus)
+MAX_CACHED_CLIP_MS = 15000
+
+# Maior entrada aceita no cache, para que uma faixa longa não expulse os clipes curtos
+FRAME_CACHE_MAX_ENTRY_BYTES = FRAME_CACHE_MAX_BYTES // 16
+
+# Número máximo de áudios tocando ao mesmo tempo em um servidor
+MIXER_MAX_VOICES = int(os.environ.get('MIXER_MAX_VOICES', '4'))
+
+SILENCE = b'\x00' * FRAME_SIZE
+
+def iter_ogg_packets(stream):
+    """Lê os pacotes de um fluxo Ogg, página por página"""
+    partial = b''
+    while True:
+        header = stream.read(27)
+        if len(header) < 27:
+            return
+        if header[:4] != b'OggS':
+            raise ValueError("Fluxo Ogg inválido")
+        segment_count = header[26]
+        lacing = stream.read(segment_count)
+        data = stream.read(sum(lacing))
+        offset = 0
+        for size in lacing:
+            partial += data[offset:offset + size]
+            offset += size
+            # Um segmento menor que 255 bytes encerra o pacote
+            if size < 255:
+                yield partial
+                partial = b''
+
+class OggOpusAudio(discord.AudioSource):
+    """Reproduz um arquivo Ogg/Opus já codificado, sem FFmpeg.
+
+    Os pacotes Opus são enviados diretamente ao Discord; não há processo
+    externo, decodificação nem recodificação durante a reprodução.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._packets = (
+            packet for packet in iter_ogg_packets(self._file)
+            if not packet.startswith((b'OpusHead', b'OpusTags'))
+        )
+
+    def read(self):
+        return next(self._packets, b'')
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        if not self._file.closed:
+            self._file.close()
+
+class FrameCache:
+    """Cache LRU de quadros de 20 ms, limitado pelo total de bytes.
+
+    Guarda pacotes Opus (lidos das versões pré-codificadas) ou PCM
+    decodificado; cada entrada é uma tupla imutável de quadros que pode ser
+    reproduzida por várias fontes ao mesmo tempo.
+    """
+
+    def __init__(self, max_bytes=FRAME_CACHE_MAX_BYTES, max_entry_bytes=FRAME_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = min(max_entry_bytes, max_bytes)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {chave: (quadros, is_opus, tamanho)}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, frames, is_opus):
+        frames = tuple(frames)
+        size = sum(len(frame) for frame in frames)
+        if size > self.max_entry_bytes:
+            return False
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (frames, is_opus, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+        return True
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entradas': len(self._entries),
+                'bytes': self.total_bytes,
+                'limite_bytes': self.max_bytes,
+                'acertos': self.hits,
+                'falhas': self.misses,
+                'taxa_acerto': self.hits / lookups if lookups else 0.0
+            }
+
+class CachedAudio(discord.AudioSource):
+    """Reproduz quadros já decodificados da memória, sem processos externos"""
+
+    def __init__(self, frames, is_opus):
+        self._frames = frames
+        self._is_opus = is_opus
+        self._position = 0
+
+    def read(self):
+        if self._position >= len(self._frames):
+            return b''
+        frame = self._frames[self._position]
+        self._position += 1
+        return frame
+
+    def is_opus(self):
+        return self._is_opus
+
+class PrebufferedAudio(discord.AudioSource):
+    """Envolve uma fonte e lê antecipadamente os primeiros quadros.
+
+    Usada para preparar a próxima faixa da fila enquanto a atual toca: o
+    processo do FFmpeg já foi iniciado e os primeiros quadros já estão em
+    memória quando a reprodução começa.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._buffer = deque()
+
+    def fill(self, count):
+        """Lê até `count` quadros da fonte (bloqueante; rodar fora do loop)"""
+        for _ in range(count):
+            frame = self.source.read()
+            if not frame:
+                break
+            self._buffer.append(frame)
+        return len(self._buffer)
+
+    def read(self):
+        if self._buffer:
+            return self._buffer.popleft()
+        return self.source.read()
+
+    def is_opus(self):
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.source.cleanup()
+
+class OpusDecodedAudio(discord.AudioSource):
+    """Decodifica para PCM uma fonte que entrega pacotes Opus"""
+
+    def __init__(self, source):
+        self.source = source
+        self._decoder = discord.opus.Decoder()
+
+    def read(self):
+        packet = self.source.read()
+        if not packet:
+            return b''
+        return self._decoder.decode(packet)
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self.source.cleanup()
+
+# Amostras (por canal) de uma rampa de ganho: um quadro de 20 ms
+RAMP_SAMPLES = FRAME_SIZE // 4
+
+def _quantize_gain(gain):
+    """Arredonda o ganho para reaproveitar as tabelas (passos de 0,1%)"""
+    return round(max(0.0, gain), 3)
+
+@lru_cache(maxsize=32)
+def _gain_table(gain):
+    """Tabela de 65536 posições: amostra de 16 bits -> amostra com ganho e saturação"""
+    if np is not None:
+        samples = np.arange(-32768, 32768, dtype=np.float64) * gain
+        return np.clip(np.rint(samples), -32768, 32767).astype('<i2')
+    return array('h', (max(-32768, min(32767, round(value * gain))) for value in range(-32768, 32768)))
+
+def _apply_gain_numpy(frame, gain):
+    samples = np.frombuffer(frame, dtype='<i2')
+    return _gain_table(gain)[samples.astype(np.int32) + 32768].tobytes()
+
+def _apply_gain_array(frame, gain):
+    samples = array('h', frame)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    table = _gain_table(gain)
+    scaled = array('h', [table[value + 32768] for value in samples])
+    if sys.byteorder == 'big':
+        scaled.byteswap()
+    return scaled.tobytes()
+
+def _ramp_numpy(frame, start, end):
+    samples = np.frombuffer(frame, dtype='<i2').reshape(-1, 2).astype(np.float64)
+    ramp = np.linspace(start, end, len(samples), endpoint=False)[:, None]
+    return np.clip(np.rint(samples * ramp), -32768, 32767).astype('<i2').tobytes()
+
+def _ramp_array(frame, start, end):
+    samples = array('h', frame)
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    frames = len(samples) // 2
+    step = (end - start) / frames if frames else 0.0
+    scaled = array('h', (
+        max(-32768, min(32767, round(value * (start + step * (i // 2)))))
+        for i, value in enumerate(samples)
+    ))
+    if sys.byteorder == 'big':
+        scaled.byteswap()
+    return scaled.tobytes()
+
+def apply_gain(frame, gain):
+    """Aplica um ganho fixo a um quadro PCM s16le usando uma tabela pré-calculada"""
+    if gain == 1.0:
+        return frame
+    if gain == 0.0:
+        return bytes(len(frame))
+    gain = _quantize_gain(gain)
+    return _apply_gain_numpy(frame, gain) if np is not None else _apply_gain_array(frame, gain)
+
+def apply_ramp(frame, start, end):
+    """Aplica um ganho que varia linearmente de `start` a `end` ao longo do quadro"""
+    return _ramp_numpy(frame, start, end) if np is not None else _ramp_array(frame, start, end)
+
+class GainTransformer(discord.AudioSource):
+    """Aplica ganho a uma fonte PCM, substituindo o PCMVolumeTransformer.
+
+    O ganho final é `base_gain * volume`: o ganho base vem do clipe e o
+    volume do servidor. Mudanças de volume durante a reprodução são
+    aplicadas com uma rampa de um quadro para evitar estalos.
+    """
+
+    def __init__(self, source, base_gain=1.0, volume=1.0):
+        if source.is_opus():
+            raise discord.ClientException('GainTransformer precisa de uma fonte PCM')
+        self.source = source
+        self.base_gain = base_gain
+        self.volume = volume
+        self._current = base_gain * volume
+        self._target = self._current
+
+    def set_volume(self, volume, ramp=True):
+        self.volume = volume
+        self._target = self.base_gain * volume
+        if not ramp:
+            self._current = self._target
+
+    def read(self):
+        frame = self.source.read()
+        if not frame:
+            return frame
+        if self._current != self._target:
+            start, self._current = self._current, self._target
+            if len(frame) == FRAME_SIZE:
+                return apply_ramp(frame, start, self._target)
+        return apply_gain(frame, self._current)
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self.source.cleanup()
+
+def ensure_encoder(voice_client):
+    """Garante que o voice client tenha um codificador Opus.
+
+    VoiceClient.play só cria o codificador para fontes PCM. Se a reprodução
+    começou em Opus direto (versão pré-codificada), trocar a fonte por uma
+    PCM durante a reprodução falharia no primeiro pacote sem ele.
+    """
+    encoder = getattr(voice_client, 'encoder', None)
+    if encoder is None or encoder is discord.utils.MISSING:
+        voice_client.encoder = discord.opus.Encoder()
+    return voice_client.encoder
+
+def iter_sources(source):
+    """Percorre uma fonte e todas as fontes que ela envolve (incluindo vozes de mixers)"""
+    while source is not None:
+        yield source
+        if isinstance(source, MixerSource):
+            for voice in source.voices():
+                yield from iter_sources(voice)
+            return
+        source = getattr(source, 'source', getattr(source, 'original', None))
+
+def _mix_numpy(frames):
+    mixed = np.frombuffer(frames[0], dtype='<i2').astype(np.int32)
+    for frame in frames[1:]:
+        mixed += np.frombuffer(frame, dtype='<i2')
+    np.clip(mixed, -32768, 32767, out=mixed)
+    return mixed.astype('<i2').tobytes()
+
+def _mix_array(frames):
+    buffers = []
+    for frame in frames:
+        samples = array('h', frame)
+        if sys.byteorder == 'big':
+            samples.byteswap()
+        buffers.append(samples)
+    mixed = array('h', (max(-32768, min(32767, sum(values))) for values in zip(*buffers)))
+    if sys.byteorder == 'big':
+        mixed.byteswap()
+    return mixed.tobytes()
+
+def mix_frames(frames):
+    """Soma quadros PCM s16le, limitando o resultado à faixa de 16 bits"""
+    if len(frames) == 1:
+        return frames[0]
+    return _mix_numpy(frames) if np is not None else _mix_array(frames)
+
+class MixerSource(discord.AudioSource):
+    """Mistura vários áudios PCM em uma única fonte.
+
+    Cada quadro de 20 ms é a soma dos quadros de todas as vozes ativas, com
+    saturação em vez de estouro. Vozes Opus são decodificadas antes da
+    mistura. A fonte termina quando a última voz termina; depois disso não
+    aceita novas vozes.
+    """
+
+    def __init__(self, max_voices=MIXER_MAX_VOICES):
+        self.max_voices = max_voices
+        self._voices = []
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def add(self, source):
+        """Adiciona uma voz; retorna False se o limite foi atingido ou a mistura terminou"""
+        if source.is_opus():
+            source = OpusDecodedAudio(source)
+        with self._lock:
+            if self._finished or len(self._voices) >= self.max_voices:
+                return False
+            self._voices.append(source)
+            return True
+
+    def voices(self):
+        with self._lock:
+            return list(self._voices)
+
+    @property
+    def voice_count(self):
+        with self._lock:
+            return len(self._voices)
+
+    def read(self):
+        with self._lock:
+            voices = list(self._voices)
+
+        frames = []
+        finished = []
+        for voice in voices:
+            frame = voice.read()
+            if not frame:
+                finished.append(voice)
+                continue
+            if len(frame) < FRAME_SIZE:
+                frame = frame.ljust(FRAME_SIZE, b'\x00')
+            frames.append(frame)
+
+        with self._lock:
+            for voice in finished:
+                self._voices.remove(voice)
+            if not frames and not self._voices:
+                self._finished = True
+        for voice in finished:
+            voice.cleanup()
+
+        if frames:
+            return mix_frames(frames)
+        # Uma voz pode ter sido adicionada durante a leitura
+        return b'' if self._finished else SILENCE
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        with self._lock:
+            voices = self._voices
+            self._voices = []
+            self._finished = True
+        for voice in voices:
+            voice.cleanup()
+
+def file_key(path):
+    """Chave de cache de um arquivo: muda se ele for substituído"""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+def read_ogg_packets(path):
+    """Lê todos os pacotes Opus de um arquivo Ogg"""
+    with open(path, 'rb') as f:
+        return [
+            packet for packet in iter_ogg_packets(f)
+            if not packet.startswith((b'OpusHead', b'OpusTags'))
+        ]
+
+def decode_pcm_frames(path):
+    """Decodifica um arquivo para quadros PCM de 20 ms usando FFmpeg"""
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", str(path),
+        "-vn", "-f", "s16le", "-ar", "48000", "-ac", "2", "pipe:1"
+    ]
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr.decode(errors='replace'))
+    
+    pcm = process.stdout
+    frames = [pcm[i:i + FRAME_SIZE] for i in range(0, len(pcm), FRAME_SIZE)]
+    # Completar o último quadro com silêncio
+    if frames and len(frames[-1]) < FRAME_SIZE:
+        frames[-1] = frames[-1].ljust(FRAME_SIZE, b'\x00')
+    return frames
+
+
+# Cache compartilhado por todos os servidores
+frame_cache = FrameCache()
+
+_decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='frame-decoder')
+_decoding = set()
+_decoding_lock = threading.Lock()
+
+def _decode_into_cache(path, key):
+    try:
+        frame_cache.put(key, decode_pcm_frames(path), is_opus=False)
+        logger.info(f"Quadros PCM de {path} adicionados ao cache")
+    except Exception as e:
+        logger.error(f"Erro ao decodificar {path} para o cache: {e}")
+    finally:
+        with _decoding_lock:
+            _decoding.discard(key)
+
+def schedule_pcm_decode(path, duration_ms=None):
+    """Decodifica um clipe curto para o cache de PCM em segundo plano"""
+    if duration_ms and duration_ms > MAX_CACHED_CLIP_MS:
+        return
+    if shutil.which('ffmpeg') is None:
+        return
+    try:
+        key = file_key(path)
+    except OSError:
+        return
+    with _decoding_lock:
+        if key in _decoding or key in frame_cache:
+            return
+        _decoding.add(key)
+    _decoder.submit(_decode_into_cache, str(path), key)
+
+def _read_into_cache(path, key):
+    try:
+        frame_cache.put(key, read_ogg_packets(path), is_opus=True)
+        logger.info(f"Pacotes Opus de {path} adicionados ao cache")
+    except Exception as e:
+        logger.error(f"Erro ao ler {path} para o cache: {e}")
+    finally:
+        with _decoding_lock:
+            _decoding.discard(key)
+
+def cached_opus_source(path, duration_ms=None):
+    """Fonte a partir de uma versão Ogg/Opus, servida da memória quando possível.
+
+    Na falta do cache o arquivo é lido em streaming e, se for um clipe curto,
+    os pacotes são carregados em segundo plano para as próximas reproduções
+    (como em schedule_pcm_decode); o loop de eventos nunca lê o arquivo inteiro.
+    """
+    key = file_key(path)
+    cached = frame_cache.get(key)
+    if cached is not None:
+        return CachedAudio(*cached)
+    
+    # Faixas longas ou grandes tocam sempre do disco
+    if (duration_ms and duration_ms > MAX_CACHED_CLIP_MS) or key[2] > frame_cache.max_entry_bytes:
+        return OggOpusAudio(path)
+    with _decoding_lock:
+        if key not in _decoding:
+            _decoding.add(key)
+            _decoder.submit(_read_into_cache, str(path), key)
+    return OggOpusAudio(path)
+
+def cached_pcm_source(path):
+    """Fonte PCM servida da memória, ou None se o clipe ainda não estiver no cache"""
+    try:
+        cached = frame_cache.get(file_key(path))
+    except OSError:
+        return None
+    return CachedAudio(*cached) if cached is not None else None
+
+
+if __name__ == '__main__':
+    # Comparação do custo por quadro entre as implementações de ganho:
+    #   python audio_sources.py
+    import random
+    import timeit
+    import warnings
+
+    frame = array('h', (random.randint(-20000, 20000) for _ in range(FRAME_SIZE // 2))).tobytes()
+    runs = 2000
+    candidates = {'array (tabela)': lambda: _apply_gain_array(frame, 0.5)}
+    if np is not None:
+        candidates['numpy (tabela)'] = lambda: _apply_gain_numpy(frame, 0.5)
+        candidates['numpy (rampa)'] = lambda: _ramp_numpy(frame, 0.5, 0.75)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            import audioop
+        candidates['audioop.mul'] = lambda: audioop.mul(frame, 2, 0.5)
+    except ImportError:
+        pass
+
+    for name, function in candidates.items():
+        function()
+        elapsed = timeit.timeit(function, number=runs)
+        print(f"{name:>16}: {elapsed / runs * 1e6:8.1f} µs por quadro de 20 ms")
@@ -0,0 +1,75 @@
+"""Benchmark da rota /audio/<nome> com o cliente de teste do Flask.
+
+Compara o download completo (como era feito a cada visualização da
+página), a revalidação por ETag (304), os pedidos parciais com Range
+(206, usados pelo player ao avançar) e a URL versionada, medindo tempo e
+bytes transferidos por requisição.
+
+Uso: python bench_audio_route.py [--tamanho-mb 5] [--repeticoes 200]
+"""
+import os
+import time
+import random
+import logging
+import argparse
+import tempfile
+
+def run(label, repetitions, make_request, expected_status):
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        response = make_request()
+        assert response.status_code == expected_status, f"{label}: status {response.status_code}"
+        total_bytes += len(response.get_data())
+        response.close()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / repetitions * 1000:>8.3f} ms {total_bytes / repetitions / 1024:>10.1f} KiB  ({expected_status})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tamanho-mb', type=float, default=5.0, help="tamanho do arquivo de teste")
+    parser.add_argument('--repeticoes', type=int, default=200, help="requisições por cenário")
+    args = parser.parse_args()
+
+    # O catálogo e o app usam caminhos relativos (audios/...): trabalhar em um diretório temporário
+    os.chdir(tempfile.mkdtemp(prefix='bench_audio_'))
+    import app as web
+    import database
+    import utils
+    logging.getLogger().setLevel(logging.WARNING)
+
+    path = os.path.join('audios', 'originais', 'bench.mp3')
+    size = int(args.tamanho_mb * 1024 * 1024)
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size))
+    database.init_db()
+    success, audio = database.add_audio('bench', path, 'original', duracao=0, sha256=utils.file_sha256(path))
+    assert success, audio
+
+    client = web.app.test_client()
+    first = client.get('/audio/bench')
+    etag = first.headers['ETag']
+    first.close()
+    with web.app.test_request_context():
+        versioned_url = web.audio_url(audio)
+
+    print(f"Arquivo de {args.tamanho_mb:g} MB, {args.repeticoes} requisições por cenário\n")
+    print(f"{'cenário':<28} {'tempo/req':>11} {'bytes/req':>14}")
+    run("GET completo", args.repeticoes,
+        lambda: client.get('/audio/bench'), 200)
+    run("If-None-Match (ETag)", args.repeticoes,
+        lambda: client.get('/audio/bench', headers={'If-None-Match': etag}), 304)
+
+    def seek():
+        offset = random.randrange(0, max(1, size - 65536))
+        return client.get('/audio/bench', headers={'Range': f'bytes={offset}-{offset + 65535}'})
+    run("Range de 64 KiB (seek)", args.repeticoes, seek, 206)
+
+    response = client.get(versioned_url)
+    print(f"\nURL versionada {versioned_url}")
+    print(f"  Cache-Control: {response.headers['Cache-Control']}")
+    print(f"  (o navegador não repete a requisição enquanto o conteúdo não mudar)")
+    response.close()
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,127 @@
 import os
+import asyncio
 import logging
 import tempfile
+import threading
+import uuid
 import discord
 from discord.ext import commands
+from discord import app_commands
 import database
+import edit_cache
+import jobs
+import transcoder
 import utils
 from pathlib import Path
 
+# Protege a escolha de nomes das edições que terminam ao mesmo tempo
+_edit_names_lock = threading.Lock()
+
 class Editor(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger('discord_bot.editor')
         self.originals_dir, self.edited_dir = utils.get_audio_paths()
     
+    def _progress_text(self, label, job):
+        """Texto da mensagem de progresso de uma edição"""
+        if job.cached:
+            status = "♻️ Reaproveitado de uma edição anterior"
+        elif job.status == jobs.RUNNING and job.expected_ms:
+            status = f"{jobs.progress_bar(job.progress)} {job.progress:.0%}"
+        else:
+            status = job.status.capitalize()
+        text = f"{label}\n`#{job.id}` {status}"
+        if job.active:
+            text += f" — use `!cancelar {job.id}` para cancelar"
+        return text
+    
+    def _unique_output(self, base_name):
+        """Nome e caminho livres para um áudio editado (não sobrescreve edições anteriores)"""
+        new_name = base_name
+        count = 1
+        while database.get_audio_by_name(new_name) or (self.edited_dir / f"{new_name}.mp3").exists():
+            new_name = f"{base_name}_{count}"
+            count += 1
+        return new_name, self.edited_dir / f"{new_name}.mp3"
+    
+    def _temp_output(self):
+        """Arquivo temporário de uma edição; recebe o nome definitivo em _register_output"""
+        return self.edited_dir / f".job_{uuid.uuid4().hex}.mp3"
+    
+    def _register_output(self, base_name, temp_path):
+        """Move o resultado de uma edição para um nome livre e registra o novo áudio.
+
+        O nome é escolhido e registrado sob o lock, já que outra edição pode
+        terminar ao mesmo tempo. Executado fora do loop de eventos. Retorna
+        (sucesso, (nome, duração, áudio registrado) ou mensagem de erro).
+        """
+        with _edit_names_lock:
+            new_name, new_filepath = self._unique_output(base_name)
+            os.replace(temp_path, new_filepath)
+            
+            # Obter duração do novo áudio (lida do cabeçalho)
+            duracao = utils.get_audio_duration(new_filepath)
+            success, result = database.add_audio(
+                nome=new_name,
+                caminho=str(new_filepath),
+                tipo='editado',
+                duracao=duracao
+            )
+        
+        if not success:
+            # Remover o arquivo se houve erro no registro
+            os.remove(new_filepath)
+            return False, result
+        return True, (new_name, duracao, result)
+    
+    async def _run_edit(self, ctx, label, source_path, operations, output_path):
+        """Executa uma edição no pool de jobs, fora do loop de eventos.
+
+        Envia uma mensagem de progresso que é atualizada enquanto o FFmpeg
+        trabalha. A mesma edição de um mesmo conteúdo é reaproveitada do
+        cache de edições. Retorna (sucesso, caminho de saída ou mensagem de erro).
+        """
+        def prepare():
+            # Lê o conteúdo (hash) e os cabeçalhos do arquivo (ffprobe)
+            key = edit_cache.cache_key(source_path, operations)
+            command, expected_ms = utils.build_edit_command(source_path, output_path, operations)
+            return key, command, expected_ms
+        
+        try:
+            key, command, expected_ms = await asyncio.to_thread(prepare)
+        except ValueError as e:
+            return False, str(e)
+        
+        job = jobs.runner.submit(ctx.guild.id, label, command, output_path, expected_ms, cache_key=key)
+        message = await ctx.send(self._progress_text(label, job))
+        
+        async def update(job):
+            if message:
+                await message.edit(content=self._progress_text(label, job))
+        
+        success, result = await jobs.runner.run(job, on_progress=update)
+        try:
+            await update(job)
+        except Exception as e:
+            self.logger.warning(f"Erro ao atualizar mensagem de progresso: {e}")
+        return success, result
+    
+    @commands.command(name="cancelar")
+    async def cancel_edit(self, ctx, job_id: int = None):
+        """Cancela uma edição em andamento (ou todas as do servidor)"""
+        active = jobs.runner.guild_jobs(ctx.guild.id)
+        if job_id is not None:
+            active = [job for job in active if job.id == job_id]
+        
+        if not active:
+            await ctx.send("❌ Nenhuma edição em andamento para cancelar.")
+            return
+        
+        for job in active:
+            job.cancel()
+        await ctx.send(f"🛑 {len(active)} edição(ões) cancelada(s).")
+    
     @commands.command(name="cortar")
     async def cut_audio(self, ctx, audio_name: str, inicio: str, fim: str):
         """Corta um arquivo de áudio (formato de tempo: HH:MM:SS)"""
@@ -27,46 +136,42 @@ class Editor(commands.Cog):
             await ctx.send(f"❌ Arquivo de áudio não encontrado em '{audio['caminho']}'.")
             return
         
-        # Iniciar processo de corte
-        await ctx.send(f"✂️ Cortando áudio '{audio_name}' de {inicio} até {fim}...")
-        
         try:
-            # Determinar novo nome de arquivo
-            new_filename = f"{audio_name}_cortado_{inicio.replace(':', '')}_{fim.replace(':', '')}.mp3"
-            new_filepath = self.edited_dir / new_filename
+            # Nome base do novo áudio (o definitivo é escolhido ao registrar)
+            base_name = f"{audio_name}_cortado_{inicio.replace(':', '')}_{fim.replace(':', '')}"
+            operations = [('cortar', utils.parse_time(inicio), utils.parse_time(fim))]
             
-            # Cortar o áudio
-            success, result = utils.cut_audio(audio['caminho'], new_filepath, inicio, fim)
+            # Cortar o áudio no pool de jobs
+            success, result = await self._run_edit(
+                ctx,
+                f"✂️ Cortando áudio '{audio_name}' de {inicio} até {fim}...",
+                audio['caminho'],
+                operations,
+                self._temp_output()
+            )
             
             if not success:
                 await ctx.send(f"❌ Erro ao cortar áudio: {result}")
                 return
             
-            # Obter duração do novo áudio
-            duracao = utils.get_audio_duration(new_filepath)
-            
-            # Adicionar ao banco de dados
-            success, db_result = database.add_audio(
-                nome=new_filename.split('.')[0],  # Nome sem extensão
-                caminho=str(new_filepath),
-                tipo='editado',
-                duracao=duracao
-            )
+            # Escolher o nome definitivo e registrar no banco de dados
+            success, result = await asyncio.to_thread(self._register_output, base_name, result)
             
             if success:
+                new_name, duracao, db_result = result
+                # Analisar o loudness e pré-codificar em Opus em segundo plano
+                transcoder.schedule_ingest(db_result)
+                
                 embed = discord.Embed(
                     title="✅ Áudio cortado com sucesso!",
-                    description=f"**Nome:** {new_filename.split('.')[0]}\n**Duração:** {utils.format_duration(duracao)}",
+                    description=f"**Nome:** {new_name}\n**Duração:** {utils.format_duration(duracao)}",
                     color=discord.Color.green()
                 )
                 embed.add_field(name="Corte", value=f"De {inicio} até {fim}", inline=False)
-                embed.set_footer(text=f"Use !tocar {new_filename.split('.')[0]} para reproduzir este áudio")
+                embed.set_footer(text=f"Use !tocar {new_name} para reproduzir este áudio")
                 await ctx.send(embed=embed)
             else:
-                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {db_result}")
-                
-                # Remover o arquivo se houve erro no registro
-                os.remove(new_filepath)
+                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {result}")
         
         except Exception as e:
             self.logger.error(f"Erro ao cortar áudio: {e}")
@@ -86,45 +191,40 @@ class Editor(commands.Cog):
             await ctx.send(f"❌ Arquivo de áudio não encontrado em '{audio['caminho']}'.")
             return
         
-        # Iniciar processo de inversão
-        await ctx.send(f"🔄 Invertendo áudio '{audio_name}'...")
-        
         try:
-            # Determinar novo nome de arquivo
-            new_filename = f"{audio_name}_invertido.mp3"
-            new_filepath = self.edited_dir / new_filename
+            # Nome base do novo áudio (o definitivo é escolhido ao registrar)
+            base_name = f"{audio_name}_invertido"
             
-            # Inverter o áudio
-            success, result = utils.reverse_audio(audio['caminho'], new_filepath)
+            # Inverter o áudio no pool de jobs
+            success, result = await self._run_edit(
+                ctx,
+                f"🔄 Invertendo áudio '{audio_name}'...",
+                audio['caminho'],
+                [('inverter',)],
+                self._temp_output()
+            )
             
             if not success:
                 await ctx.send(f"❌ Erro ao inverter áudio: {result}")
                 return
             
-            # Obter duração do novo áudio
-            duracao = utils.get_audio_duration(new_filepath)
-            
-            # Adicionar ao banco de dados
-            success, db_result = database.add_audio(
-                nome=new_filename.split('.')[0],  # Nome sem extensão
-                caminho=str(new_filepath),
-                tipo='editado',
-                duracao=duracao
-            )
+            # Escolher o nome definitivo e registrar no banco de dados
+            success, result = await asyncio.to_thread(self._register_output, base_name, result)
             
             if success:
+                new_name, duracao, db_result = result
+                # Analisar o loudness e pré-codificar em Opus em segundo plano
+                transcoder.schedule_ingest(db_result)
+                
                 embed = discord.Embed(
                     title="✅ Áudio invertido com sucesso!",
-                    description=f"**Nome:** {new_filename.split('.')[0]}\n**Duração:** {utils.format_duration(duracao)}",
+                    description=f"**Nome:** {new_name}\n**Duração:** {utils.format_duration(duracao)}",
                     color=discord.Color.green()
                 )
-                embed.set_footer(text=f"Use !tocar {new_filename.split('.')[0]} para reproduzir este áudio")
+                embed.set_footer(text=f"Use !tocar {new_name} para reproduzir este áudio")
                 await ctx.send(embed=embed)
             else:
-                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {db_result}")
-                
-                # Remover o arquivo se houve erro no registro
-                os.remove(new_filepath)
+                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {result}")
         
         except Exception as e:
             self.logger.error(f"Erro ao inverter áudio: {e}")
@@ -149,51 +249,146 @@ class Editor(commands.Cog):
             await ctx.send(f"❌ Arquivo de áudio não encontrado em '{audio['caminho']}'.")
             return
         
-        # Iniciar processo de alteração de velocidade
-        await ctx.send(f"⏩ Alterando velocidade do áudio '{audio_name}' (fator: {speed_factor})...")
-        
         try:
-            # Determinar novo nome de arquivo
+            # Nome base do novo áudio (o definitivo é escolhido ao registrar)
             speed_text = "rapido" if speed_factor > 1 else "lento"
-            new_filename = f"{audio_name}_{speed_text}_{str(speed_factor).replace('.', '_')}.mp3"
-            new_filepath = self.edited_dir / new_filename
+            base_name = f"{audio_name}_{speed_text}_{str(speed_factor).replace('.', '_')}"
             
-            # Usar a função assíncrona do utils para alterar a velocidade
-            success, result = await utils.change_speed_async(audio['caminho'], new_filepath, speed_factor)
+            # Alterar a velocidade no pool de jobs
+            success, result = await self._run_edit(
+                ctx,
+                f"⏩ Alterando velocidade do áudio '{audio_name}' (fator: {speed_factor})...",
+                audio['caminho'],
+                [('velocidade', float(speed_factor))],
+                self._temp_output()
+            )
             
             if not success:
                 await ctx.send(f"❌ Erro ao alterar velocidade do áudio: {result}")
                 return
             
-            # Obter duração do novo áudio
-            duracao = utils.get_audio_duration(new_filepath)
-            
-            # Adicionar ao banco de dados
-            success, db_result = database.add_audio(
-                nome=new_filename.split('.')[0],  # Nome sem extensão
-                caminho=str(new_filepath),
-                tipo='editado',
-                duracao=duracao
-            )
+            # Escolher o nome definitivo e registrar no banco de dados
+            success, result = await asyncio.to_thread(self._register_output, base_name, result)
             
             if success:
+                new_name, duracao, db_result = result
+                # Analisar o loudness e pré-codificar em Opus em segundo plano
+                transcoder.schedule_ingest(db_result)
+                
                 embed = discord.Embed(
                     title="✅ Velocidade alterada com sucesso!",
-                    description=f"**Nome:** {new_filename.split('.')[0]}\n**Duração:** {utils.format_duration(duracao)}",
+                    description=f"**Nome:** {new_name}\n**Duração:** {utils.format_duration(duracao)}",
                     color=discord.Color.green()
                 )
                 embed.add_field(name="Fator de velocidade", value=str(speed_factor), inline=False)
-                embed.set_footer(text=f"Use !tocar {new_filename.split('.')[0]} para reproduzir este áudio")
+                embed.set_footer(text=f"Use !tocar {new_name} para reproduzir este áudio")
                 await ctx.send(embed=embed)
             else:
-                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {db_result}")
-                
-                # Remover o arquivo se houve erro no registro
-                os.remove(new_filepath)
+                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {result}")
         
         except Exception as e:
             self.logger.error(f"Erro ao alterar velocidade do áudio: {e}")
             await ctx.send(f"❌ Erro ao alterar velocidade do áudio: {e}")
 
+    @commands.command(name="editar")
+    async def edit_audio(self, ctx, audio_name: str, *operacoes: str):
+        """Aplica várias edições de uma vez (ex.: !editar nome cortar 0:01 0:04 velocidade 1.5 inverter)"""
+        try:
+            operations = utils.parse_edit_operations(list(operacoes))
+        except ValueError as e:
+            await ctx.send(f"❌ {e}")
+            return
+        
+        # Buscar o áudio no banco de dados
+        audio = database.get_audio_by_name(audio_name)
+        if not audio:
+            await ctx.send(f"❌ Áudio '{audio_name}' não encontrado. Use !listar para ver os áudios disponíveis.")
+            return
+        
+        # Verificar se o arquivo existe
+        if not os.path.isfile(audio['caminho']):
+            await ctx.send(f"❌ Arquivo de áudio não encontrado em '{audio['caminho']}'.")
+            return
+        
+        description = utils.describe_edit_operations(operations)
+        try:
+            base_name = f"{audio_name}_editado"
+            
+            # Todas as operações em um único processo FFmpeg
+            success, result = await self._run_edit(
+                ctx,
+                f"🎛️ Editando áudio '{audio_name}' ({description})...",
+                audio['caminho'],
+                operations,
+                self._temp_output()
+            )
+            
+            if not success:
+                await ctx.send(f"❌ Erro ao editar áudio: {result}")
+                return
+            
+            # Escolher o nome definitivo e registrar no banco de dados
+            success, result = await asyncio.to_thread(self._register_output, base_name, result)
+            
+            if success:
+                new_name, duracao, db_result = result
+                # Analisar o loudness e pré-codificar em Opus em segundo plano
+                transcoder.schedule_ingest(db_result)
+                
+                embed = discord.Embed(
+                    title="✅ Áudio editado com sucesso!",
+                    description=f"**Nome:** {new_name}\n**Duração:** {utils.format_duration(duracao)}",
+                    color=discord.Color.green()
+                )
+                embed.add_field(name="Operações", value=description, inline=False)
+                embed.set_footer(text=f"Use !tocar {new_name} para reproduzir este áudio")
+                await ctx.send(embed=embed)
+            else:
+                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {result}")
+        
+        except Exception as e:
+            self.logger.error(f"Erro ao editar áudio: {e}")
+            await ctx.send(f"❌ Erro ao editar áudio: {e}")
+
+    @app_commands.command(name="cortar", description="Corta um áudio (formato de tempo: HH:MM:SS, MM:SS ou SS)")
+    @app_commands.describe(nome="Nome do áudio", inicio="Tempo inicial", fim="Tempo final")
+    @app_commands.autocomplete(nome=utils.audio_name_autocomplete)
+    async def slash_cut_audio(self, interaction: discord.Interaction, nome: str, inicio: str, fim: str):
+        """Versão slash do comando !cortar"""
+        if not await utils.ensure_slash_active(interaction):
+            return
+        await interaction.response.defer(thinking=True)
+        await self.cut_audio(utils.InteractionContext(interaction), nome, inicio, fim)
+    
+    @app_commands.command(name="inverter", description="Inverte um áudio")
+    @app_commands.describe(nome="Nome do áudio")
+    @app_commands.autocomplete(nome=utils.audio_name_autocomplete)
+    async def slash_reverse_audio(self, interaction: discord.Interaction, nome: str):
+        """Versão slash do comando !inverter"""
+        if not await utils.ensure_slash_active(interaction):
+            return
+        await interaction.response.defer(thinking=True)
+        await self.reverse_audio(utils.InteractionContext(interaction), nome)
+    
+    @app_commands.command(name="velocidade", description="Altera a velocidade de um áudio (0.5=lento, 2.0=rápido)")
+    @app_commands.describe(nome="Nome do áudio", fator="Fator de velocidade")
+    @app_commands.autocomplete(nome=utils.audio_name_autocomplete)
+    async def slash_change_speed(self, interaction: discord.Interaction, nome: str, fator: float):
+        """Versão slash do comando !velocidade"""
+        if not await utils.ensure_slash_active(interaction):
+            return
+        await interaction.response.defer(thinking=True)
+        await self.change_speed(utils.InteractionContext(interaction), nome, fator)
+
+    @app_commands.command(name="editar", description="Aplica várias edições de uma vez (cortar, velocidade, inverter, fadein, fadeout)")
+    @app_commands.describe(nome="Nome do áudio", operacoes="Ex.: cortar 0:01 0:04 velocidade 1.5 inverter")
+    @app_commands.autocomplete(nome=utils.audio_name_autocomplete)
+    async def slash_edit_audio(self, interaction: discord.Interaction, nome: str, operacoes: str):
+        """Versão slash do comando !editar"""
+        if not await utils.ensure_slash_active(interaction):
+            return
+        await interaction.response.defer(thinking=True)
+        await self.edit_audio(utils.InteractionContext(interaction), nome, *operacoes.split())
+
 async def setup(bot):
     await bot.add_cog(Editor(bot))
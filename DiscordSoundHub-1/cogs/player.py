@@ -1,14 +1,28 @@
 import os
+import json
 import logging
 import asyncio
 import traceback
 import shutil
+import time
 from collections import deque
 import discord
 from discord.ext import commands
-from discord import FFmpegPCMAudio, PCMVolumeTransformer
+from discord import app_commands
+from discord import FFmpegPCMAudio
+import audio_sources
 import database
+import edit_cache
+import search
+import transcoder
 import utils
+import voice_manager
+
+# Quadros de 20 ms lidos antecipadamente da próxima faixa da fila
+PREFETCH_FRAMES = 10
+
+# Volume de cada servidor, mantido entre reinícios do bot
+VOLUMES_FILE = 'audios/volumes.json'
 
 class Player(commands.Cog):
     def __init__(self, bot):
@@ -17,11 +31,160 @@ class Player(commands.Cog):
         self.currently_playing = {}  # {guild_id: audio_name}
         self.queues = {}  # {guild_id: deque([audio1, audio2, ...])}
         self.is_loop = {}  # {guild_id: bool} - Se a fila está em loop
+        self.advance_events = {}  # {guild_id: asyncio.Event} - Sinaliza o fim de uma faixa
+        self.playback_tasks = {}  # {guild_id: asyncio.Task} - Avança a fila do servidor
+        self.track_ended_at = {}  # {guild_id: float} - Momento em que a última faixa terminou
+        self.gaps = {}  # {guild_id: deque([segundos, ...])} - Intervalos entre faixas
+        self.prefetched = {}  # {guild_id: (audio_name, fonte)} - Próxima faixa já preparada
+        self.volumes = {}  # {guild_id: float} - Volume do servidor (1.0 = padrão)
+        self.load_volumes()
+        
+        # Construir em segundo plano o índice de nomes usado pelo autocomplete
+        search.current_index()
+        
+        # Gerar em segundo plano as versões Opus que ainda não existem
+        transcoder.schedule_catalog()
         
         # Log de inicialização
         self.logger.info("Sistema de fila de reprodução inicializado")
         self.logger.info(f"FFmpeg disponível: {shutil.which('ffmpeg') is not None}")
     
+    def _create_audio_source(self, audio, ffmpeg_options, volume=1.0):
+        """Cria a fonte de áudio de um registro do catálogo.
+
+        Usa a versão Ogg/Opus pré-codificada quando existir (clipes curtos servidos
+        do cache em memória, sem FFmpeg). O ganho do clipe já está gravado
+        nela: com o volume do servidor no padrão os pacotes são enviados sem
+        recodificação; com outro volume são decodificados em memória e
+        escalados. Sem a versão Opus, usa os quadros PCM do cache ou, na
+        falta deles, decodifica o original com FFmpeg e agenda a versão Opus
+        e o cache para as próximas reproduções.
+        """
+        ganho = transcoder.playback_gain(audio)
+        sidecar = transcoder.get_sidecar(audio['caminho'], ganho)
+        if sidecar:
+            self.logger.info(f"Usando versão Opus pré-codificada: {sidecar}")
+            audio_source = audio_sources.cached_opus_source(sidecar, audio.get('duracao'))
+            if volume == 1.0:
+                return audio_source
+            return audio_sources.GainTransformer(audio_sources.OpusDecodedAudio(audio_source), volume=volume)
+        
+        if 'loudness_lufs' in audio:
+            transcoder.schedule(audio['caminho'], ganho)
+        else:
+            transcoder.schedule_ingest(audio)
+        audio_source = audio_sources.cached_pcm_source(audio['caminho'])
+        if audio_source is None:
+            audio_sources.schedule_pcm_decode(audio['caminho'], audio.get('duracao'))
+            audio_source = FFmpegPCMAudio(audio['caminho'], **ffmpeg_options)
+        
+        # Aplicar o ganho do clipe e o volume do servidor
+        return audio_sources.GainTransformer(audio_source, base_gain=ganho, volume=volume)
+    
+    def cog_unload(self):
+        """Cancela as tarefas de reprodução ao descarregar o cog"""
+        for task in self.playback_tasks.values():
+            task.cancel()
+    
+    def _signal_advance(self, guild_id):
+        """Acorda a tarefa de reprodução do servidor (executado no loop do bot)"""
+        task = self.playback_tasks.get(guild_id)
+        if task is None or task.done():
+            self.advance_events[guild_id] = asyncio.Event()
+            self.playback_tasks[guild_id] = self.bot.loop.create_task(self._playback_loop(guild_id))
+        self.advance_events[guild_id].set()
+    
+    async def _playback_loop(self, guild_id):
+        """Tarefa de cada servidor que inicia a próxima faixa quando a atual termina"""
+        event = self.advance_events[guild_id]
+        while True:
+            await event.wait()
+            event.clear()
+            try:
+                if guild_id in self.queues and self.queues[guild_id]:
+                    await self._play_from_queue(guild_id)
+                else:
+                    self.track_ended_at.pop(guild_id, None)
+                    self.logger.info(f"Fila do servidor {guild_id} concluída")
+            except Exception as e:
+                self.logger.error(f"Erro ao reproduzir próximo áudio da fila: {e}")
+    
+    async def _prefetch_next(self, guild_id):
+        """Prepara a fonte da próxima faixa da fila enquanto a atual toca"""
+        queue = self.queues.get(guild_id)
+        if not queue:
+            return
+        audio_name = queue[0]
+        current = self.prefetched.get(guild_id)
+        if current and current[0] == audio_name:
+            return
+        self._discard_prefetch(guild_id)
+        
+        audio = database.get_audio_by_name(audio_name)
+        if not audio or not os.path.isfile(audio['caminho']):
+            return
+        
+        ffmpeg_options = {
+            'options': '-vn -loglevel warning -nostats',
+            'before_options': '-nostdin -y'
+        }
+        try:
+            source = audio_sources.PrebufferedAudio(
+                self._create_audio_source(audio, ffmpeg_options, self.volumes.get(guild_id, 1.0))
+            )
+            await asyncio.to_thread(source.fill, PREFETCH_FRAMES)
+        except Exception as e:
+            self.logger.warning(f"Não foi possível preparar '{audio_name}' antecipadamente: {e}")
+            return
+        
+        # A fila pode ter mudado enquanto a fonte era preparada
+        queue = self.queues.get(guild_id)
+        if not queue or queue[0] != audio_name or guild_id in self.prefetched:
+            source.cleanup()
+            return
+        self.prefetched[guild_id] = (audio_name, source)
+        self.logger.debug(f"Próxima faixa preparada no servidor {guild_id}: {audio_name}")
+    
+    def _schedule_prefetch(self, guild_id):
+        self.bot.loop.create_task(self._prefetch_next(guild_id))
+    
+    def _take_prefetched(self, guild_id, audio_name):
+        """Retorna a fonte preparada para a faixa, se houver"""
+        prefetched = self.prefetched.pop(guild_id, None)
+        if prefetched is None:
+            return None
+        if prefetched[0] != audio_name:
+            prefetched[1].cleanup()
+            return None
+        return prefetched[1]
+    
+    def _discard_prefetch(self, guild_id):
+        """Descarta a faixa preparada (por exemplo, quando a fila muda)"""
+        prefetched = self.prefetched.pop(guild_id, None)
+        if prefetched:
+            prefetched[1].cleanup()
+    
+    def _record_gap(self, guild_id):
+        """Registra o intervalo entre o fim da faixa anterior e o início desta"""
+        ended_at = self.track_ended_at.pop(guild_id, None)
+        if ended_at is None:
+            return
+        gap = time.perf_counter() - ended_at
+        self.gaps.setdefault(guild_id, deque(maxlen=200)).append(gap)
+        self.logger.debug(f"Intervalo entre faixas no servidor {guild_id}: {gap * 1000:.1f} ms")
+    
+    async def _announce(self, guild, audio):
+        """Envia a mensagem de 'reproduzindo da fila' sem atrasar a reprodução"""
+        try:
+            # Encontrar um canal para enviar a mensagem
+            for channel in guild.text_channels:
+                if channel.permissions_for(guild.me).send_messages:
+                    embed = utils.create_embed_for_audio(audio, is_playing=True)
+                    await channel.send(f"🎵 **Reproduzindo da fila:**", embed=embed)
+                    break
+        except Exception as channel_error:
+            self.logger.error(f"Erro ao enviar mensagem de reprodução: {channel_error}")
+    
     async def _play_from_queue(self, guild_id):
         """Reproduz o próximo áudio da fila"""
         if guild_id not in self.queues or not self.queues[guild_id]:
@@ -39,6 +202,10 @@ class Player(commands.Cog):
             self.logger.error(f"Voice client não encontrado para o servidor {guild_id}")
             return False
         
+        # Outra faixa já foi iniciada (por um comando) antes desta tarefa
+        if voice_client.is_playing() or voice_client.is_paused():
+            return False
+        
         # Obter o próximo áudio da fila
         audio_name = self.queues[guild_id].popleft()
         audio = database.get_audio_by_name(audio_name)
@@ -67,12 +234,10 @@ class Player(commands.Cog):
                 opus_loaded = discord.opus.is_loaded()
                 self.logger.info(f"Status Opus: {'Carregado' if opus_loaded else 'Não carregado'}")
                 
-                # Criar o player de áudio e aplicar controle de volume
-                audio_source = FFmpegPCMAudio(audio['caminho'], **ffmpeg_options)
-                
-                # Aplicar transformador de volume apenas se Opus estiver disponível
-                if opus_loaded:
-                    audio_source = PCMVolumeTransformer(audio_source, volume=0.5)
+                # Usar a fonte preparada enquanto a faixa anterior tocava, ou criar uma
+                audio_source = self._take_prefetched(guild_id, audio_name)
+                if audio_source is None:
+                    audio_source = self._create_audio_source(audio, ffmpeg_options, self.volumes.get(guild_id, 1.0))
                 
                 # Reproduzir o áudio
                 voice_client.play(
@@ -105,17 +270,11 @@ class Player(commands.Cog):
             
             # Registrar que está tocando
             self.currently_playing[guild_id] = audio_name
+            self._record_gap(guild_id)
             
-            # Enviar confirmação se possível
-            try:
-                # Encontrar um canal para enviar a mensagem
-                for channel in guild.text_channels:
-                    if channel.permissions_for(guild.me).send_messages:
-                        embed = utils.create_embed_for_audio(audio, is_playing=True)
-                        await channel.send(f"🎵 **Reproduzindo da fila:**", embed=embed)
-                        break
-            except Exception as channel_error:
-                self.logger.error(f"Erro ao enviar mensagem de reprodução: {channel_error}")
+            # Preparar a próxima faixa e enviar a confirmação em segundo plano
+            self._schedule_prefetch(guild_id)
+            self.bot.loop.create_task(self._announce(guild, audio))
             
             return True
             
@@ -125,27 +284,24 @@ class Player(commands.Cog):
             return False
     
     def _queue_callback(self, guild_id, audio_name, error):
-        """Callback para reprodução de áudios da fila"""
+        """Callback para reprodução de áudios da fila.
+
+        Roda na thread de áudio do discord.py: apenas registra o fim da faixa
+        e sinaliza a tarefa de reprodução do servidor, sem esperar por ela.
+        """
+        self.track_ended_at[guild_id] = time.perf_counter()
         if error:
             self.logger.error(f"Erro ao reproduzir áudio '{audio_name}' da fila: {error}")
             self.logger.error(f"Traceback: {traceback.format_exception(type(error), error, error.__traceback__)}")
         
         # Remover do registro de reprodução
-        if guild_id in self.currently_playing:
-            del self.currently_playing[guild_id]
-        
-        # Verificar se há mais áudios na fila
-        if guild_id in self.queues and self.queues[guild_id]:
-            # Usar asyncio.run_coroutine_threadsafe para executar a corotina de forma segura
-            # a partir deste callback que não é uma corotina
-            coro = self._play_from_queue(guild_id)
-            fut = asyncio.run_coroutine_threadsafe(coro, self.bot.loop)
-            try:
-                fut.result()
-            except Exception as e:
-                self.logger.error(f"Erro ao reproduzir próximo áudio da fila: {e}")
-        else:
-            self.logger.info(f"Fila do servidor {guild_id} concluída")
+        self.currently_playing.pop(guild_id, None)
+        
+        # Adiar a desconexão por ociosidade a partir do fim da reprodução
+        voice_manager.manager.touch(guild_id)
+        
+        # Acordar a tarefa do servidor no loop do bot
+        self.bot.loop.call_soon_threadsafe(self._signal_advance, guild_id)
     
     @commands.command(name="tocar")
     async def play_audio(self, ctx, *, audio_name: str):
@@ -153,7 +309,12 @@ class Player(commands.Cog):
         # Buscar o áudio no banco de dados
         audio = database.get_audio_by_name(audio_name)
         if not audio:
-            await ctx.send(f"❌ Áudio '{audio_name}' não encontrado. Use !listar para ver os áudios disponíveis.")
+            sugestoes = search.suggest(audio_name)
+            if sugestoes:
+                opcoes = ", ".join(f"`{nome}`" for nome in sugestoes)
+                await ctx.send(f"❌ Áudio '{audio_name}' não encontrado. Você quis dizer: {opcoes}?")
+            else:
+                await ctx.send(f"❌ Áudio '{audio_name}' não encontrado. Use !listar para ver os áudios disponíveis.")
             return
         
         # Verificar se o arquivo existe
@@ -181,6 +342,7 @@ class Player(commands.Cog):
             embed.title = f"🎵 Adicionado à fila: {audio['nome']}"
             embed.add_field(name="Posição na fila", value=f"{position}", inline=True)
             
+            self._schedule_prefetch(guild_id)
             await ctx.send(embed=embed)
             return
         
@@ -206,11 +368,7 @@ class Player(commands.Cog):
                 self.logger.info(f"Status Opus: {'Carregado' if opus_loaded else 'Não carregado'}")
                 
                 # Criar o player de áudio e aplicar controle de volume
-                audio_source = FFmpegPCMAudio(audio['caminho'], **ffmpeg_options)
-                
-                # Aplicar transformador de volume apenas se Opus estiver disponível
-                if opus_loaded:
-                    audio_source = PCMVolumeTransformer(audio_source, volume=0.5)
+                audio_source = self._create_audio_source(audio, ffmpeg_options, self.volumes.get(guild_id, 1.0))
                 
                 # Reproduzir o áudio
                 voice_client.play(
@@ -242,8 +400,9 @@ class Player(commands.Cog):
                     await ctx.send(f"❌ Não foi possível reproduzir o áudio: {audio_name}")
                     return
             
-            # Registrar que está tocando
+            # Registrar que está tocando e preparar a próxima faixa da fila
             self.currently_playing[ctx.guild.id] = audio['nome']
+            self._schedule_prefetch(ctx.guild.id)
             
             # Enviar confirmação com embed
             embed = utils.create_embed_for_audio(audio, is_playing=True)
@@ -256,6 +415,116 @@ class Player(commands.Cog):
             self.logger.error(f"Traceback: {traceback.format_exc()}")
             await ctx.send(f"❌ Erro ao reproduzir áudio: {e}")
     
+    async def play_overlay(self, ctx, audio_name):
+        """Toca um áudio junto com o que já está tocando (emojis e botões).
+
+        O áudio atual passa a ser uma voz de um MixerSource e o novo áudio é
+        misturado a ele, em vez de ir para o fim da fila. Sem nada tocando,
+        funciona como !tocar.
+        """
+        audio = database.get_audio_by_name(audio_name)
+        if not audio or not os.path.isfile(audio['caminho']):
+            # Deixar o !tocar informar o erro
+            await self.play_audio(ctx, audio_name=audio_name)
+            return
+        
+        voice_client = await utils.ensure_voice_client(ctx)
+        if not voice_client:
+            return
+        
+        if not voice_client.is_playing():
+            await self.play_audio(ctx, audio_name=audio_name)
+            return
+        
+        ffmpeg_options = {
+            'options': '-vn -loglevel warning -nostats',
+            'before_options': '-nostdin -y'
+        }
+        try:
+            audio_source = self._create_audio_source(audio, ffmpeg_options, self.volumes.get(ctx.guild.id, 1.0))
+        except Exception as e:
+            self.logger.error(f"Erro ao criar fonte de áudio para mistura: {e}")
+            await ctx.send(f"❌ Não foi possível reproduzir o áudio: {audio_name}")
+            return
+        
+        # Transformar a reprodução atual em uma mistura, se ainda não for
+        mixer = voice_client.source
+        if not isinstance(mixer, audio_sources.MixerSource):
+            mixer = audio_sources.MixerSource()
+            mixer.add(voice_client.source)
+            # A mistura é PCM: a reprodução em Opus direto começou sem codificador
+            audio_sources.ensure_encoder(voice_client)
+            voice_client.source = mixer
+        
+        if not mixer.add(audio_source):
+            audio_source.cleanup()
+            if mixer.voice_count >= mixer.max_voices:
+                await ctx.send(f"❌ Limite de {mixer.max_voices} áudios simultâneos atingido.")
+            else:
+                # A mistura terminou enquanto a fonte era criada
+                await self.play_audio(ctx, audio_name=audio_name)
+            return
+        
+        voice_manager.manager.touch(ctx.guild.id)
+        self.logger.info(f"Áudio '{audio['nome']}' misturado ({mixer.voice_count} vozes) no servidor {ctx.guild.id}")
+        await ctx.send(f"🔊 {audio.get('emoji') or '🎵'} **{audio['nome']}** tocando junto ({mixer.voice_count} áudios)")
+    
+    def load_volumes(self):
+        """Carrega o volume salvo de cada servidor"""
+        try:
+            with open(VOLUMES_FILE, 'r', encoding='utf-8') as f:
+                volumes = json.load(f)
+            self.volumes = {int(guild_id): float(volume) for guild_id, volume in volumes.items()}
+        except FileNotFoundError:
+            return
+        except (ValueError, AttributeError) as e:
+            self.logger.error(f"Erro ao carregar volumes de {VOLUMES_FILE}: {e}")
+    
+    def save_volumes(self):
+        """Salva o volume de cada servidor (arquivo temporário + os.replace)"""
+        tmp_path = f"{VOLUMES_FILE}.tmp"
+        try:
+            os.makedirs(os.path.dirname(VOLUMES_FILE), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({str(guild_id): volume for guild_id, volume in self.volumes.items()}, f, indent=2)
+            os.replace(tmp_path, VOLUMES_FILE)
+        except OSError as e:
+            self.logger.error(f"Erro ao salvar volumes em {VOLUMES_FILE}: {e}")
+    
+    @commands.command(name="volume")
+    async def set_volume(self, ctx, porcentagem: int = None):
+        """Mostra ou define o volume do servidor (0 a 200%, 100% é o padrão)"""
+        guild_id = ctx.guild.id
+        if porcentagem is None:
+            await ctx.send(f"🔊 Volume atual: {round(self.volumes.get(guild_id, 1.0) * 100)}%")
+            return
+        
+        if porcentagem < 0 or porcentagem > 200:
+            await ctx.send("❌ O volume deve estar entre 0 e 200%.")
+            return
+        
+        volume = porcentagem / 100
+        self.volumes[guild_id] = volume
+        self.save_volumes()
+        
+        # Ajustar com rampa o que já está tocando
+        adjusted = False
+        voice_client = ctx.guild.voice_client
+        if voice_client and voice_client.source:
+            for source in audio_sources.iter_sources(voice_client.source):
+                if isinstance(source, audio_sources.GainTransformer):
+                    source.set_volume(volume)
+                    adjusted = True
+        
+        # A próxima faixa foi preparada com o volume anterior
+        self._discard_prefetch(guild_id)
+        self._schedule_prefetch(guild_id)
+        
+        message = f"🔊 Volume definido para {porcentagem}%."
+        if voice_client and voice_client.is_playing() and not adjusted:
+            message += " O novo volume vale a partir do próximo áudio."
+        await ctx.send(message)
+    
     @commands.command(name="pausar")
     async def pause_audio(self, ctx):
         """Pausa a reprodução atual"""
@@ -282,19 +551,25 @@ class Player(commands.Cog):
         guild_id = ctx.guild.id
         voice_client = ctx.guild.voice_client
         if voice_client:
+            # Esvaziar a fila antes de parar, para que a tarefa de reprodução
+            # não inicie a próxima faixa
+            queue_cleared = bool(self.queues.get(guild_id))
+            if guild_id in self.queues:
+                self.queues[guild_id].clear()
+            self._discard_prefetch(guild_id)
+            
             if voice_client.is_playing() or voice_client.is_paused():
                 voice_client.stop()
                 await ctx.send("⏹️ Reprodução interrompida.")
             
-            await voice_client.disconnect()
+            await voice_manager.manager.disconnect(ctx.guild)
             await ctx.send("👋 Desconectado do canal de voz.")
             
-            # Limpar o registro de reprodução e fila
+            # Limpar o registro de reprodução
             if guild_id in self.currently_playing:
                 del self.currently_playing[guild_id]
             
-            if guild_id in self.queues:
-                self.queues[guild_id].clear()
+            if queue_cleared:
                 await ctx.send("🗑️ Fila de reprodução limpa.")
         else:
             await ctx.send("❌ O bot não está conectado a um canal de voz.")
@@ -397,6 +672,7 @@ class Player(commands.Cog):
         # Limpar a fila
         queue_size = len(self.queues[guild_id])
         self.queues[guild_id].clear()
+        self._discard_prefetch(guild_id)
         
         await ctx.send(f"🗑️ Fila limpa! {queue_size} áudios foram removidos.")
     
@@ -431,6 +707,7 @@ class Player(commands.Cog):
         import random
         random.shuffle(queue_list)
         self.queues[guild_id] = deque(queue_list)
+        self._schedule_prefetch(guild_id)
         
         await ctx.send("🔀 Fila embaralhada com sucesso!")
         # Mostrar a nova fila
@@ -478,13 +755,18 @@ class Player(commands.Cog):
             added_count += 1
         
         # Se não houver nada tocando, iniciar a reprodução
+        started = False
         if added_count > 0 and not voice_client.is_playing():
             await self._play_from_queue(guild_id)
-            return
+            started = True
+        elif added_count > 0:
+            self._schedule_prefetch(guild_id)
         
-        # Mensagem de confirmação
+        # Mensagem de confirmação (o /adicionar adiado sempre precisa de uma resposta)
         if added_count > 0:
             message = f"✅ {added_count} áudio(s) adicionado(s) à fila."
+            if started:
+                message = f"✅ {added_count} áudio(s) adicionado(s), tocando agora."
             if not_found:
                 message += f"\n❌ Não encontrado(s): {', '.join(not_found)}"
             await ctx.send(message)
@@ -512,6 +794,7 @@ class Player(commands.Cog):
         # Remover o áudio
         del queue_list[position - 1]
         self.queues[guild_id] = deque(queue_list)
+        self._schedule_prefetch(guild_id)
         
         # Enviar confirmação
         if audio:
@@ -540,6 +823,118 @@ class Player(commands.Cog):
         else:
             await ctx.send("❌ Não há nada tocando no momento.")
     
+    @app_commands.command(name="tocar", description="Reproduz um áudio ou o adiciona à fila")
+    @app_commands.describe(nome="Nome do áudio")
+    @app_commands.autocomplete(nome=utils.audio_name_autocomplete)
+    async def slash_play_audio(self, interaction: discord.Interaction, nome: str):
+        """Versão slash do comando !tocar"""
+        if not await utils.ensure_slash_active(interaction):
+            return
+        await interaction.response.defer(thinking=True)
+        await self.play_audio(utils.InteractionContext(interaction), audio_name=nome)
+    
+    @app_commands.command(name="adicionar", description="Adiciona um áudio à fila de reprodução")
+    @app_commands.describe(nome="Nome do áudio")
+    @app_commands.autocomplete(nome=utils.audio_name_autocomplete)
+    async def slash_add_to_queue(self, interaction: discord.Interaction, nome: str):
+        """Versão slash do comando !adicionar"""
+        if not await utils.ensure_slash_active(interaction):
+            return
+        await interaction.response.defer(thinking=True)
+        await self.add_to_queue(utils.InteractionContext(interaction), audio_names=nome)
+    
+    @commands.command(name="cache")
+    async def cache_stats(self, ctx):
+        """Mostra as estatísticas do cache de quadros de áudio"""
+        stats = audio_sources.frame_cache.stats()
+        embed = discord.Embed(
+            title="🧠 Cache de Áudio",
+            description=f"{stats['entradas']} clipes em memória",
+            color=discord.Color.blue()
+        )
+        embed.add_field(
+            name="Memória",
+            value=f"{stats['bytes'] / 1024 / 1024:.1f} MB de {stats['limite_bytes'] / 1024 / 1024:.0f} MB",
+            inline=True
+        )
+        embed.add_field(
+            name="Acertos / Falhas",
+            value=f"{stats['acertos']} / {stats['falhas']} ({stats['taxa_acerto']:.0%})",
+            inline=True
+        )
+        edits = edit_cache.stats()
+        embed.add_field(
+            name="Edições reaproveitadas",
+            value=f"{edits['acertos']} de {edits['acertos'] + edits['falhas']} ({edits['removidos']} removidas do cache)",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+    
+    @commands.command(name="conexao")
+    async def connection_stats(self, ctx):
+        """Mostra o estado e as métricas da conexão de voz do servidor"""
+        stats = voice_manager.manager.stats(ctx.guild.id)
+        if stats is None:
+            await ctx.send("❌ O bot ainda não se conectou a um canal de voz neste servidor.")
+            return
+        
+        def format_latency(summary):
+            if not summary['amostras']:
+                return "sem medições"
+            return f"p50 {summary['p50_ms']:.0f} ms / p95 {summary['p95_ms']:.0f} ms ({summary['amostras']} medições)"
+        
+        status = f"✅ Conectado em **{stats['canal']}**" if stats['conectado'] else "❌ Desconectado"
+        embed = discord.Embed(
+            title="🔌 Conexão de Voz",
+            description=status,
+            color=discord.Color.green() if stats['conectado'] else discord.Color.red()
+        )
+        if stats['latencia_ws_ms'] is not None:
+            embed.add_field(name="Latência do gateway de voz", value=f"{stats['latencia_ws_ms']:.0f} ms", inline=True)
+        embed.add_field(name="Ocioso há", value=utils.format_duration(int(stats['ocioso_s'] * 1000)), inline=True)
+        embed.add_field(name="Tempo para conectar", value=format_latency(stats['conectar']), inline=False)
+        embed.add_field(name="Tempo para trocar de canal", value=format_latency(stats['mover']), inline=False)
+        embed.add_field(
+            name="Contadores",
+            value=(
+                f"Conexões: {stats['conexoes']} • Reaproveitadas: {stats['reaproveitadas']} • "
+                f"Trocas de canal: {stats['movimentos']}\n"
+                f"Falhas: {stats['falhas']} • Descartadas: {stats['descartadas']} • "
+                f"Desconexões por ociosidade: {stats['desconexoes_ociosidade']}"
+            ),
+            inline=False
+        )
+        if stats['ultimo_erro']:
+            embed.set_footer(text=f"Último erro: {stats['ultimo_erro']}")
+        await ctx.send(embed=embed)
+    
+    @commands.command(name="intervalos")
+    async def gap_stats(self, ctx):
+        """Mostra a distribuição dos intervalos entre faixas da fila neste servidor"""
+        gaps = sorted(self.gaps.get(ctx.guild.id, ()))
+        if not gaps:
+            await ctx.send("❌ Ainda não há transições entre faixas medidas neste servidor.")
+            return
+        
+        def percentile(fraction):
+            return gaps[min(len(gaps) - 1, int(fraction * len(gaps)))] * 1000
+        
+        within_frame = sum(1 for gap in gaps if gap <= 0.02)
+        embed = discord.Embed(
+            title="⏱️ Intervalos entre Faixas",
+            description=f"Últimas {len(gaps)} transições da fila",
+            color=discord.Color.blue()
+        )
+        embed.add_field(name="Mediana", value=f"{percentile(0.5):.1f} ms", inline=True)
+        embed.add_field(name="p95", value=f"{percentile(0.95):.1f} ms", inline=True)
+        embed.add_field(name="Máximo", value=f"{gaps[-1] * 1000:.1f} ms", inline=True)
+        embed.add_field(
+            name="Dentro de um quadro (≤ 20 ms)",
+            value=f"{within_frame} de {len(gaps)} ({within_frame / len(gaps):.0%})",
+            inline=False
+        )
+        await ctx.send(embed=embed)
+    
     # Lidar com reações de emoji (para tocar via emoji)
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload):
@@ -571,8 +966,8 @@ class Player(commands.Cog):
             'author': user
         })
         
-        # Tocar o áudio
-        await self.play_audio(ctx, audio_name=audio['nome'])
+        # Tocar o áudio junto com o que já estiver tocando
+        await self.play_overlay(ctx, audio['nome'])
 
 async def setup(bot):
     await bot.add_cog(Player(bot))
@@ -1,76 +1,202 @@
 import os
+import math
+import asyncio
 import logging
+import aiohttp
 import discord
 from discord.ext import commands
 from discord import app_commands
 import database
+import transcoder
 import utils
 from pathlib import Path
 
+# Anexos baixados e analisados ao mesmo tempo (em todos os servidores)
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '3'))
+
+# Formatos aceitos no upload
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.m4a')
+
+# Tamanho dos blocos gravados em disco durante o download
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
 class Storage(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.logger = logging.getLogger('discord_bot.storage')
         self.originals_dir, self.edited_dir = utils.get_audio_paths()
+        self._upload_slots = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+        self._session = None
+    
+    async def cog_unload(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+    
+    async def _download(self, attachment, file_path):
+        """Baixa um anexo em blocos direto para o disco; retorna o SHA-256 do conteúdo"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        
+        async with self._session.get(attachment.url) as response:
+            response.raise_for_status()
+            with open(file_path, 'wb') as f:
+                writer = utils.HashingWriter(f, max_bytes=utils.UPLOAD_MAX_BYTES)
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    writer.write(chunk)
+        return writer.hexdigest()
+    
+    async def _ingest_attachment(self, attachment, filename, file_path):
+        """Baixa e analisa um anexo, sem registrá-lo.
+
+        Retorna (True, (registro, nome do áudio duplicado ou None)) ou
+        (False, mensagem de erro).
+        """
+        async with self._upload_slots:
+            try:
+                sha256 = await self._download(attachment, file_path)
+                
+                # Mesmo conteúdo de um áudio existente: compartilhar o arquivo
+                duplicate_of, shared = utils.reuse_duplicate(file_path, sha256)
+                caminho = shared.pop('caminho', str(file_path))
+                
+                # Obter duração dos cabeçalhos (ffprobe), fora do loop de eventos
+                duracao = shared.pop('duracao', None)
+                if duracao is None:
+                    metadata = await asyncio.to_thread(utils.probe_audio, caminho)
+                    if metadata is None:
+                        raise ValueError("o arquivo não contém áudio reconhecível")
+                    duracao = metadata['duracao']
+                    if duracao is None:
+                        duracao = await asyncio.to_thread(utils.get_audio_duration, caminho)
+            except Exception as e:
+                self.logger.error(f"Erro ao salvar arquivo {attachment.filename}: {e}")
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                return False, str(e)
+        
+        self.logger.info(f"Arquivo salvo em {caminho}")
+        record = {
+            'nome': filename,
+            'caminho': caminho,
+            'tipo': 'original',
+            'duracao': duracao,
+            'sha256': sha256,
+            **shared
+        }
+        return True, (record, duplicate_of)
     
     @commands.command(name="upload")
     async def upload_audio(self, ctx):
-        """Faz upload de um arquivo de áudio"""
+        """Faz upload de um ou mais arquivos de áudio"""
         if not ctx.message.attachments:
-            await ctx.send("❌ Nenhum arquivo anexado. Use !upload e adicione um arquivo de áudio como anexo.")
+            await ctx.send("❌ Nenhum arquivo anexado. Use !upload e adicione um ou mais arquivos de áudio como anexo.")
             return
         
-        attachment = ctx.message.attachments[0]
-        # Verificar se é um arquivo de áudio
-        if not any(attachment.filename.lower().endswith(ext) for ext in ['.mp3', '.wav', '.ogg', '.m4a']):
-            await ctx.send("❌ O arquivo anexado não é um arquivo de áudio suportado. Formatos aceitos: .mp3, .wav, .ogg, .m4a")
-            return
+        accepted = []  # [(anexo, nome, caminho)]
+        failures = []  # [(arquivo, motivo)]
+        names = set()
+        for attachment in ctx.message.attachments:
+            # Verificar se é um arquivo de áudio
+            file_extension = os.path.splitext(attachment.filename)[1].lower()
+            if file_extension not in AUDIO_EXTENSIONS:
+                failures.append((attachment.filename, f"formato não suportado (aceitos: {', '.join(AUDIO_EXTENSIONS)})"))
+                continue
+            if attachment.size > utils.UPLOAD_MAX_BYTES:
+                failures.append((attachment.filename, f"maior que o limite de {utils.UPLOAD_MAX_MB:g} MB"))
+                continue
+            
+            # Sanitizar o nome do arquivo
+            filename = utils.sanitize_filename(attachment.filename)
+            file_path = self.originals_dir / f"{filename}{file_extension}"
+            
+            # Verificar se já existe um arquivo ou áudio com este nome
+            if filename.casefold() in names or os.path.exists(file_path) or database.get_audio_by_name(filename):
+                failures.append((attachment.filename, f"já existe um áudio com o nome '{filename}'"))
+                continue
+            names.add(filename.casefold())
+            accepted.append((attachment, filename, file_path))
         
-        # Sanitizar o nome do arquivo
-        filename = utils.sanitize_filename(attachment.filename)
-        file_extension = os.path.splitext(attachment.filename)[1].lower()
+        status_message = None
+        if len(accepted) > 1:
+            status_message = await ctx.send(f"📥 Processando {len(accepted)} arquivos...")
         
-        # Definir o caminho do arquivo
-        file_path = self.originals_dir / f"{filename}{file_extension}"
+        # Baixar e analisar os anexos ao mesmo tempo (limitado por UPLOAD_CONCURRENCY)
+        results = await asyncio.gather(*(
+            self._ingest_attachment(attachment, filename, file_path)
+            for attachment, filename, file_path in accepted
+        ))
         
-        # Verificar se já existe um arquivo com este nome
-        if os.path.exists(file_path):
-            await ctx.send(f"❌ Já existe um arquivo com o nome '{filename}'. Por favor, use outro nome ou renomeie o arquivo.")
-            return
+        records = []
+        duplicates = {}  # {nome: áudio com o mesmo conteúdo}
+        by_hash = {}  # {sha256: primeiro registro deste upload}
+        for (attachment, filename, file_path), (success, result) in zip(accepted, results):
+            if success:
+                record, duplicate_of = result
+                first = by_hash.setdefault(record['sha256'], record)
+                if first is not record and not duplicate_of:
+                    # Mesmo conteúdo de outro anexo deste upload
+                    os.remove(record['caminho'])
+                    record['caminho'] = first['caminho']
+                    duplicate_of = first['nome']
+                records.append(record)
+                if duplicate_of:
+                    duplicates[filename] = duplicate_of
+            else:
+                failures.append((attachment.filename, result))
         
-        # Baixar o arquivo
-        try:
-            await attachment.save(file_path)
-            self.logger.info(f"Arquivo salvo em {file_path}")
-            
-            # Obter duração do áudio
-            duracao = utils.get_audio_duration(file_path)
-            
-            # Adicionar ao banco de dados
-            success, result = database.add_audio(
-                nome=filename,
-                caminho=str(file_path),
-                tipo='original',
-                duracao=duracao
-            )
-            
+        # Registrar todos de uma vez no banco de dados
+        added = []
+        if records:
+            success, result = database.add_audios(records)
             if success:
-                embed = discord.Embed(
-                    title="✅ Áudio adicionado com sucesso!",
-                    description=f"**Nome:** {filename}\n**Duração:** {utils.format_duration(duracao)}",
-                    color=discord.Color.green()
-                )
-                embed.set_footer(text=f"Use !tocar {filename} para reproduzir este áudio")
-                await ctx.send(embed=embed)
+                added = result
+                for audio in added:
+                    # Analisar o loudness e pré-codificar em Opus em segundo plano
+                    transcoder.schedule_ingest(audio)
             else:
-                await ctx.send(f"❌ Erro ao registrar áudio no banco de dados: {result}")
-                
-                # Remover o arquivo se houve erro no registro
-                os.remove(file_path)
+                for record in records:
+                    failures.append((record['nome'], f"erro ao registrar áudio no banco de dados: {result}"))
+                    # Remover o arquivo se houve erro no registro (se não for compartilhado)
+                    if record['nome'] not in duplicates and os.path.exists(record['caminho']):
+                        os.remove(record['caminho'])
+        
+        embed = self._upload_summary(added, duplicates, failures)
+        if status_message:
+            await status_message.edit(content=None, embed=embed)
+        else:
+            await ctx.send(embed=embed)
+    
+    def _upload_summary(self, added, duplicates, failures):
+        """Embed com o resultado de um upload (um ou vários arquivos)"""
+        if len(added) == 1:
+            audio = added[0]
+            title = "✅ Áudio adicionado com sucesso!"
+            lines = [f"**Nome:** {audio['nome']}", f"**Duração:** {utils.format_duration(audio['duracao'] or 0)}"]
+            if audio['nome'] in duplicates:
+                lines.append(f"♻️ Conteúdo idêntico a '{duplicates[audio['nome']]}': o arquivo foi reaproveitado")
+        else:
+            title = f"✅ {len(added)} áudios adicionados" if added else "❌ Nenhum áudio adicionado"
+            lines = []
+            for audio in added:
+                line = f"**{audio['nome']}** — {utils.format_duration(audio['duracao'] or 0)}"
+                if audio['nome'] in duplicates:
+                    line += f" ♻️ igual a '{duplicates[audio['nome']]}'"
+                lines.append(line)
         
-        except Exception as e:
-            self.logger.error(f"Erro ao salvar arquivo: {e}")
-            await ctx.send(f"❌ Erro ao salvar arquivo: {e}")
+        description = "\n".join(lines)
+        if len(description) > 4000:
+            description = description[:3997] + "..."
+        embed = discord.Embed(
+            title=title,
+            description=description,
+            color=discord.Color.green() if added and not failures else discord.Color.orange() if added else discord.Color.red()
+        )
+        if failures:
+            value = "\n".join(f"{name}: {reason}" for name, reason in failures)
+            embed.add_field(name="Não adicionados", value=value[:1021] + "..." if len(value) > 1024 else value, inline=False)
+        if added:
+            embed.set_footer(text=f"Use !tocar {added[0]['nome']} para reproduzir este áudio")
+        return embed
     
     @commands.command(name="renomear")
     async def rename_audio(self, ctx, old_name: str, new_name: str):
@@ -119,6 +245,38 @@ class Storage(commands.Cog):
         else:
             await ctx.send(f"❌ Erro ao associar emoji: {message}")
     
+    @commands.command(name="ganho")
+    async def set_gain(self, ctx, audio_name: str, porcentagem: int = None):
+        """Mostra ou define o ganho de um áudio (10 a 400%, 100% é o original)"""
+        # Buscar o áudio no banco de dados
+        audio = database.get_audio_by_name(audio_name)
+        if not audio:
+            await ctx.send(f"❌ Áudio '{audio_name}' não encontrado. Use !listar para ver os áudios disponíveis.")
+            return
+        
+        if porcentagem is None:
+            message = f"🎚️ Ganho de '{audio['nome']}': {round(float(audio.get('ganho', 1.0)) * 100)}%"
+            if audio.get('loudness_lufs') is not None:
+                normalizacao_db = 20 * math.log10(transcoder.normalization_gain(audio))
+                message += f" (loudness medido: {audio['loudness_lufs']:.1f} LUFS, normalização: {normalizacao_db:+.1f} dB)"
+            await ctx.send(message)
+            return
+        
+        if porcentagem < 10 or porcentagem > 400:
+            await ctx.send("❌ O ganho deve estar entre 10 e 400%.")
+            return
+        
+        # Atualizar no banco de dados
+        ganho = porcentagem / 100
+        success, message = database.update_audio(audio['nome'], {'ganho': ganho})
+        
+        if success:
+            # Gerar a versão Opus com o novo ganho
+            transcoder.schedule(audio['caminho'], transcoder.playback_gain(dict(audio, ganho=ganho)))
+            await ctx.send(f"✅ Ganho de '{audio['nome']}' definido para {porcentagem}%.")
+        else:
+            await ctx.send(f"❌ Erro ao definir ganho: {message}")
+    
     @commands.command(name="excluir")
     async def delete_audio(self, ctx, audio_name: str):
         """Remove um arquivo de áudio do sistema"""
@@ -154,9 +312,9 @@ class Storage(commands.Cog):
                 success, result = database.remove_audio(audio_name)
                 
                 if success:
-                    # Tentar excluir o arquivo
+                    # Tentar excluir o arquivo (mantido se outro áudio tiver o mesmo conteúdo)
                     try:
-                        os.remove(result['caminho'])
+                        utils.release_audio_file(result['caminho'])
                         await ctx.send(f"✅ Áudio '{audio_name}' removido com sucesso.")
                     except Exception as e:
                         self.logger.error(f"Erro ao excluir arquivo: {e}")
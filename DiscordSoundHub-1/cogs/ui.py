@@ -135,7 +135,7 @@ class AudioButton(Button):
         # Obter o cog de player
         player_cog = self.cog.bot.get_cog('Player')
         if player_cog:
-            await player_cog.play_audio(ctx, audio_name=self.audio['nome'])
+            await player_cog.play_overlay(ctx, self.audio['nome'])
             await interaction.response.defer()
         else:
             await interaction.response.send_message("❌ Sistema de player não disponível.", ephemeral=True)
@@ -525,8 +525,8 @@ class UI(commands.Cog):
                         # Adicionar um pequeno delay para garantir que o bot esteja ativo
                         await asyncio.sleep(1)
                     
-                    # Tocar o áudio
-                    await player_cog.play_audio(ctx, audio_name=audio_name)
+                    # Tocar o áudio junto com o que já estiver tocando
+                    await player_cog.play_overlay(ctx, audio_name)
                     await interaction.response.send_message(
                         f"▶️ Tocando `{audio_name}`...",
                         ephemeral=True
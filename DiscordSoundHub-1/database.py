@@ -1,21 +1,87 @@
+import atexit
 import json
 import os
 import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock consultivo entre processos
+    fcntl = None
+
 # Configuração do logger
 logger = logging.getLogger('discord_bot.database')
 
 # Caminho do arquivo de database (json)
 DB_FILE = 'audios/audios_db.json'
 
+# Backend de armazenamento do catálogo: 'json' (padrão) ou 'sqlite'
+DB_BACKEND = os.environ.get('AUDIO_DB_BACKEND', 'json').strip().lower()
+
+# Caminho do arquivo SQLite usado pelo backend 'sqlite'
+SQLITE_DB_FILE = os.environ.get('AUDIO_DB_SQLITE_FILE', 'audios/audios_db.sqlite3')
+
+# Arquivo usado como lock consultivo entre processos (bot + gunicorn)
+LOCK_FILE = DB_FILE + '.lock'
+
+# Journal (JSON lines) com as alterações ainda não consolidadas no snapshot
+JOURNAL_FILE = DB_FILE + '.journal'
+JOURNAL_ENABLED = os.environ.get('AUDIO_DB_JOURNAL', '1').strip().lower() not in ('0', 'false', 'nao', 'não')
+
+# Consolidar o journal ao atingir este número de entradas...
+JOURNAL_COMPACT_THRESHOLD = int(os.environ.get('AUDIO_DB_JOURNAL_MAX_ENTRIES', '500'))
+# ...ou periodicamente (segundos), se houver entradas pendentes
+JOURNAL_COMPACT_INTERVAL = float(os.environ.get('AUDIO_DB_JOURNAL_INTERVAL', '60'))
+
 # Estrutura do DB
 DB_STRUCTURE = {
+    'geracao': 0,  # Incrementada a cada escrita
     'audios': []  # Lista de objetos de áudio
 }
 
+@contextmanager
+def _file_lock(lock_path):
+    """Lock consultivo exclusivo entre processos baseado em flock"""
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def _atomic_write_json(path, data):
+    """Grava um JSON em arquivo temporário e o move sobre o destino com os.replace"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def init_db():
     """Inicializa o banco de dados se não existir"""
+    if DB_BACKEND == 'sqlite':
+        # O esquema e a migração do JSON são feitos na primeira conexão
+        catalog.connection()
+        logger.info(f"Banco de dados SQLite pronto em {SQLITE_DB_FILE}")
+        return
+    
     if os.path.exists(DB_FILE):
         logger.info(f"Banco de dados encontrado em {DB_FILE}")
         return
@@ -24,64 +90,750 @@ def init_db():
     os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
     
     # Cria o arquivo de banco de dados com a estrutura inicial
-    with open(DB_FILE, 'w', encoding='utf-8') as f:
-        json.dump(DB_STRUCTURE, f, ensure_ascii=False, indent=2)
+    with _file_lock(LOCK_FILE):
+        if not os.path.exists(DB_FILE):
+            _atomic_write_json(DB_FILE, DB_STRUCTURE)
     
     logger.info(f"Banco de dados inicializado em {DB_FILE}")
 
+def _validate_operations(operations, exists, name_key):
+    """Valida uma sequência de operações sobre o catálogo sem aplicá-la.
+
+    'exists' informa se um nome existe no estado atual; as operações
+    anteriores do mesmo lote são levadas em conta. Retorna a mensagem do
+    primeiro erro encontrado ou None.
+    """
+    present = {}  # {chave_do_nome: existe?} após as operações já validadas
+    
+    def name_exists(nome):
+        key = name_key(nome)
+        return present[key] if key in present else exists(nome)
+    
+    for operation in operations:
+        op = operation['op']
+        if op == 'add':
+            nome = operation['audio']['nome']
+            if name_exists(nome):
+                return f"Um áudio com o nome '{nome}' já existe"
+            present[name_key(nome)] = True
+            continue
+        
+        nome = operation['nome']
+        if not name_exists(nome):
+            return f"Áudio '{nome}' não encontrado"
+        if op == 'remove':
+            present[name_key(nome)] = False
+        elif op == 'update':
+            new_name = operation['updates'].get('nome')
+            if new_name is not None and name_key(new_name) != name_key(nome):
+                if name_exists(new_name):
+                    return f"Um áudio com o nome '{new_name}' já existe"
+                present[name_key(nome)] = False
+                present[name_key(new_name)] = True
+        else:
+            return f"Operação desconhecida: {op}"
+    return None
+
+def _operation_result(operation, audio):
+    """Resultado devolvido ao chamador para cada operação aplicada"""
+    if operation['op'] == 'update':
+        return "Áudio atualizado com sucesso"
+    return dict(audio)
+
+def _single(outcome):
+    """Adapta o retorno de apply() para uma única operação"""
+    success, result = outcome
+    return (True, result[0]) if success else (False, result)
+
+class AudioCatalog:
+    """Catálogo de áudios mantido em memória com índices por nome e emoji.
+
+    O estado é formado pelo snapshot JSON mais um journal append-only (uma
+    alteração por linha). Cada escrita só acrescenta uma linha ao journal,
+    que é reaplicado na carga e consolidado no snapshot em segundo plano,
+    ao atingir JOURNAL_COMPACT_THRESHOLD entradas ou ao encerrar o processo.
+
+    Os arquivos só são relidos quando suas assinaturas (inode/mtime/tamanho)
+    mudam; se apenas o journal cresceu, só as linhas novas são lidas. As
+    escritas são feitas sob um lock de arquivo compartilhado com outros
+    processos, e o snapshot é gravado atomicamente (arquivo temporário +
+    os.replace). Cada alteração incrementa o contador 'geracao'.
+    """
+
+    # Intervalo mínimo (segundos) entre verificações da assinatura do arquivo
+    STAT_INTERVAL = 1.0
+
+    def __init__(self, db_file, lock_file=None, journal_file=None):
+        self.db_file = db_file
+        self.lock_file = lock_file or db_file + '.lock'
+        self.journal_file = journal_file
+        self._lock = threading.RLock()
+        self._audios = []
+        self._by_name = {}
+        self._by_emoji = {}  # {emoji: [audio, ...]} na ordem do catálogo
+        self._by_hash = {}  # {sha256: [audio, ...]} áudios com o mesmo conteúdo
+        self._generation = 0
+        self._signature = None
+        self._journal_signature = None
+        self._journal_offset = 0  # Bytes do journal já aplicados
+        self._journal_entries = 0
+        self._journal_partial = False  # Última linha incompleta (escrita interrompida)
+        self._last_check = 0.0
+        self._compact_event = threading.Event()
+        self._compactor = None
+
+    @staticmethod
+    def _name_key(name):
+        return name.casefold()
+
+    @staticmethod
+    def _stat_signature(st):
+        # os.replace troca o inode, então escritas de outros processos são
+        # detectadas mesmo quando mtime e tamanho coincidem
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _file_signature(self, path):
+        try:
+            return self._stat_signature(os.stat(path))
+        except FileNotFoundError:
+            return None
+
+    def _index(self, audio):
+        self._by_name.setdefault(self._name_key(audio['nome']), audio)
+        if audio.get('emoji'):
+            self._by_emoji.setdefault(audio['emoji'], []).append(audio)
+        if audio.get('sha256'):
+            self._by_hash.setdefault(audio['sha256'], []).append(audio)
+
+    def _unindex(self, audio):
+        key = self._name_key(audio['nome'])
+        if self._by_name.get(key) is audio:
+            del self._by_name[key]
+        same_emoji = self._by_emoji.get(audio.get('emoji'))
+        if same_emoji:
+            same_emoji[:] = [a for a in same_emoji if a is not audio]
+            if not same_emoji:
+                del self._by_emoji[audio['emoji']]
+        same_hash = self._by_hash.get(audio.get('sha256'))
+        if same_hash:
+            same_hash[:] = [a for a in same_hash if a is not audio]
+            if not same_hash:
+                del self._by_hash[audio['sha256']]
+
+    def _rebuild_indexes(self):
+        self._by_name = {}
+        self._by_emoji = {}
+        self._by_hash = {}
+        for audio in self._audios:
+            self._index(audio)
+
+    def _apply_entry(self, entry):
+        """Aplica uma entrada do journal ao estado em memória e retorna o áudio afetado"""
+        op = entry['op']
+        if op == 'add':
+            audio = dict(entry['audio'])
+            self._audios.append(audio)
+            self._index(audio)
+        else:
+            audio = self._by_name.get(self._name_key(entry['nome']))
+            if audio is None:
+                logger.warning(f"Entrada do journal ignorada, áudio '{entry['nome']}' não existe: {op}")
+            elif op == 'update':
+                self._unindex(audio)
+                audio.update(entry['updates'])
+                self._index(audio)
+            elif op == 'remove':
+                self._unindex(audio)
+                self._audios = [a for a in self._audios if a is not audio]
+        self._generation = entry['geracao']
+        return audio
+
+    def _load(self, strict=False):
+        try:
+            with open(self.db_file, 'r', encoding='utf-8') as f:
+                signature = self._stat_signature(os.fstat(f.fileno()))
+                db = json.load(f)
+            self._audios = db.get('audios', [])
+            self._generation = db.get('geracao', 0)
+        except FileNotFoundError:
+            signature = None
+            self._audios = []
+            self._generation = 0
+        except json.JSONDecodeError as e:
+            logger.error(f"Erro ao ler banco de dados: {e}")
+            # Nunca sobrescrever um arquivo ilegível a partir de dados incompletos
+            if strict:
+                raise
+            # Para leituras, manter a última versão válida conhecida
+            return
+        self._signature = signature
+        self._rebuild_indexes()
+        self._journal_signature = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._journal_partial = False
+        self._replay_journal()
+        logger.debug(f"Catálogo recarregado com {len(self._audios)} áudios (geração {self._generation})")
+
+    def _replay_journal(self):
+        """Aplica as linhas do journal ainda não lidas por este processo"""
+        if not self.journal_file:
+            return
+        try:
+            with open(self.journal_file, 'rb') as f:
+                st = os.fstat(f.fileno())
+                f.seek(self._journal_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        
+        *lines, tail = data.split(b'\n')
+        for line in lines:
+            self._journal_offset += len(line) + 1
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line.decode('utf-8'))
+            except (UnicodeDecodeError, json.JSONDecodeError) as e:
+                logger.error(f"Linha inválida no journal ignorada: {e}")
+                continue
+            self._journal_entries += 1
+            # Entradas já consolidadas no snapshot (consolidação interrompida)
+            if entry.get('geracao', 0) <= self._generation:
+                continue
+            self._apply_entry(entry)
+        
+        # Linha final sem '\n': escrita interrompida, não é aplicada
+        self._journal_partial = bool(tail)
+        self._journal_signature = (st.st_ino, st.st_size)
+
+    def refresh(self, force=False, strict=False):
+        """Recarrega o catálogo se os arquivos tiverem mudado desde a última leitura.
+
+        Com force=True a verificação ignora o intervalo mínimo entre stats.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._signature is not None and now - self._last_check < self.STAT_INTERVAL:
+                return
+            self._last_check = now
+            if self._file_signature(self.db_file) != self._signature:
+                self._load(strict)
+                return
+            if not self.journal_file:
+                return
+            try:
+                st = os.stat(self.journal_file)
+                journal_signature = (st.st_ino, st.st_size)
+            except FileNotFoundError:
+                journal_signature = None
+            if journal_signature == self._journal_signature:
+                return
+            if (journal_signature is None or self._journal_signature is None
+                    or journal_signature[0] != self._journal_signature[0]
+                    or journal_signature[1] < self._journal_offset):
+                # Journal consolidado ou substituído por outro processo
+                self._load(strict)
+            else:
+                self._replay_journal()
+
+    def generation(self):
+        """Contador de escritas; muda sempre que o catálogo é alterado"""
+        self.refresh()
+        with self._lock:
+            return self._generation
+
+    def all(self):
+        self.refresh()
+        with self._lock:
+            return [dict(audio) for audio in self._audios]
+
+    def by_name(self, name):
+        self.refresh()
+        with self._lock:
+            audio = self._by_name.get(self._name_key(name))
+            return dict(audio) if audio else None
+
+    def by_emoji(self, emoji):
+        self.refresh()
+        with self._lock:
+            audios = self._by_emoji.get(emoji)
+            return dict(audios[0]) if audios else None
+
+    def by_hash(self, sha256):
+        self.refresh()
+        with self._lock:
+            audios = self._by_hash.get(sha256)
+            return dict(audios[0]) if audios else None
+
+    def references(self, caminho):
+        self.refresh()
+        caminho = os.path.abspath(caminho)
+        with self._lock:
+            return sum(1 for audio in self._audios if os.path.abspath(audio['caminho']) == caminho)
+
+    @contextmanager
+    def _write_transaction(self):
+        """Serializa escritas entre threads e processos sobre a versão mais recente"""
+        with self._lock, _file_lock(self.lock_file):
+            self.refresh(force=True, strict=True)
+            if self._journal_partial:
+                # Descartar a linha incompleta antes de acrescentar novas
+                os.truncate(self.journal_file, self._journal_offset)
+                self._journal_partial = False
+                st = os.stat(self.journal_file)
+                self._journal_signature = (st.st_ino, st.st_size)
+            yield
+
+    def _write_snapshot(self):
+        _atomic_write_json(self.db_file, {'geracao': self._generation, 'audios': self._audios})
+        self._signature = self._file_signature(self.db_file)
+        self._last_check = time.monotonic()
+
+    def _append_journal(self, entries):
+        data = ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries).encode('utf-8')
+        with open(self.journal_file, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            st = os.fstat(f.fileno())
+        self._journal_offset += len(data)
+        self._journal_entries += len(entries)
+        self._journal_signature = (st.st_ino, st.st_size)
+        self._last_check = time.monotonic()
+        
+        self._start_compactor()
+        if self._journal_entries >= JOURNAL_COMPACT_THRESHOLD:
+            self._compact_event.set()
+
+    def _commit(self, entries):
+        """Aplica e persiste entradas; deve ser chamado dentro de _write_transaction"""
+        affected = []
+        for entry in entries:
+            entry['geracao'] = self._generation + 1
+            audio = self._apply_entry(entry)
+            # Cópia: operações seguintes do mesmo lote podem alterar o registro
+            affected.append(dict(audio) if audio is not None else None)
+        try:
+            if self.journal_file:
+                self._append_journal(entries)
+            else:
+                self._write_snapshot()
+        except Exception:
+            # Descartar o estado em memória e voltar ao que está em disco
+            self._signature = None
+            self._load()
+            raise
+        return affected
+
+    def compact(self):
+        """Consolida o journal no snapshot e o esvazia"""
+        if not self.journal_file:
+            return
+        with self._write_transaction():
+            if not self._journal_entries and not os.path.exists(self.journal_file):
+                return
+            # O snapshot é gravado antes de truncar o journal; se o processo
+            # cair entre os dois passos, as entradas são ignoradas pela geração
+            self._write_snapshot()
+            with open(self.journal_file, 'wb') as f:
+                os.fsync(f.fileno())
+                st = os.fstat(f.fileno())
+            self._journal_signature = (st.st_ino, st.st_size)
+            self._journal_offset = 0
+            self._journal_entries = 0
+            logger.info(f"Journal consolidado em {self.db_file} (geração {self._generation})")
+
+    def _start_compactor(self):
+        if self._compactor is not None:
+            return
+        self._compactor = threading.Thread(target=self._compactor_loop, name='catalog-compactor', daemon=True)
+        self._compactor.start()
+        atexit.register(self._compact_on_exit)
+
+    def _compactor_loop(self):
+        while True:
+            self._compact_event.wait(JOURNAL_COMPACT_INTERVAL)
+            self._compact_event.clear()
+            try:
+                if self._journal_entries:
+                    self.compact()
+            except Exception as e:
+                logger.error(f"Erro ao consolidar journal do catálogo: {e}")
+
+    def _compact_on_exit(self):
+        try:
+            if self._journal_entries:
+                self.compact()
+        except Exception as e:
+            logger.error(f"Erro ao consolidar journal no encerramento: {e}")
+
+    def apply(self, operations):
+        """Valida e aplica um lote de operações de uma só vez (tudo ou nada).
+
+        Retorna (True, resultados) com um resultado por operação, ou
+        (False, mensagem) sem alterar nada.
+        """
+        with self._write_transaction():
+            error = _validate_operations(
+                operations,
+                lambda nome: self._name_key(nome) in self._by_name,
+                self._name_key
+            )
+            if error:
+                return False, error
+            entries = [dict(operation) for operation in operations]
+            affected = self._commit(entries)
+            return True, [_operation_result(entry, audio) for entry, audio in zip(entries, affected)]
+
+    def add(self, novo_audio):
+        return _single(self.apply([{'op': 'add', 'audio': novo_audio}]))
+
+    def update(self, nome, updates):
+        return _single(self.apply([{'op': 'update', 'nome': nome, 'updates': dict(updates)}]))
+
+    def remove(self, nome):
+        return _single(self.apply([{'op': 'remove', 'nome': nome}]))
+
+
+class SqliteAudioCatalog:
+    """Catálogo de áudios armazenado em um arquivo SQLite local.
+
+    Expõe a mesma interface de AudioCatalog. Cada escrita altera apenas a
+    linha afetada, em vez de regravar o catálogo inteiro. Na primeira
+    abertura os registros do JSON existente são migrados uma única vez.
+    """
+
+    # Colunas próprias da tabela; os demais campos vão para 'extra' (JSON)
+    COLUMNS = ('nome', 'caminho', 'tipo', 'emoji', 'duracao')
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS audios (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            nome_key TEXT,
+            caminho TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            emoji TEXT,
+            duracao INTEGER,
+            extra TEXT NOT NULL DEFAULT '{}'
+        );
+        CREATE INDEX IF NOT EXISTS idx_audios_emoji ON audios (emoji);
+        CREATE INDEX IF NOT EXISTS idx_audios_tipo ON audios (tipo);
+        CREATE INDEX IF NOT EXISTS idx_audios_sha256 ON audios (json_extract(extra, '$.sha256'));
+        CREATE INDEX IF NOT EXISTS idx_audios_caminho ON audios (caminho);
+        CREATE TABLE IF NOT EXISTS meta (
+            chave TEXT PRIMARY KEY,
+            valor TEXT
+        );
+    """
+
+    def __init__(self, db_file, json_file=None):
+        self.db_file = db_file
+        self.json_file = json_file
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self):
+        """Retorna a conexão da thread atual, criando-a se necessário"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.db_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_file, timeout=30.0)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            # Só reaproveitar a conexão depois que o esquema estiver pronto
+            self._ensure_schema(conn)
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self, conn):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            conn.executescript(self.SCHEMA)
+            self._migrate_name_key(conn)
+            self._migrate_from_json(conn)
+            self._schema_ready = True
+
+    def _migrate_name_key(self, conn):
+        """Cria e preenche a coluna nome_key (casefold do nome) em bancos antigos.
+
+        COLLATE NOCASE só ignora a caixa de letras ASCII ('Ação' e 'AÇÃO'
+        seriam nomes distintos); as buscas por nome usam nome_key, com a
+        mesma regra do catálogo JSON. Se houver nomes que passam a ser
+        iguais, nenhum registro é alterado: a migração é interrompida com a
+        lista dos conflitos, para que sejam renomeados por quem administra o bot.
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(audios)")}
+            if 'nome_key' not in columns:
+                conn.execute("ALTER TABLE audios ADD COLUMN nome_key TEXT")
+            rows = conn.execute("SELECT id, nome FROM audios WHERE nome_key IS NULL ORDER BY id").fetchall()
+            if rows:
+                owners = {row['nome_key']: row['nome'] for row in conn.execute(
+                    "SELECT nome, nome_key FROM audios WHERE nome_key IS NOT NULL"
+                )}
+                conflicts = []
+                for row in rows:
+                    key = row['nome'].casefold()
+                    if key in owners:
+                        conflicts.append(f"'{row['nome']}' (id {row['id']}) e '{owners[key]}'")
+                    else:
+                        owners[key] = row['nome']
+                if conflicts:
+                    for conflict in conflicts:
+                        logger.error(f"Nomes iguais ignorando maiúsculas: {conflict}")
+                    raise RuntimeError(
+                        f"Migração de {self.db_file} interrompida: {len(conflicts)} nome(s) repetido(s) "
+                        f"ignorando maiúsculas ({'; '.join(conflicts)}). Renomeie esses áudios e reinicie."
+                    )
+                conn.executemany(
+                    "UPDATE audios SET nome_key = ? WHERE id = ?",
+                    [(row['nome'].casefold(), row['id']) for row in rows]
+                )
+                self._bump_generation(conn)
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_audios_nome_key ON audios (nome_key)")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _migrate_from_json(self, conn):
+        """Importa os registros do JSON legado uma única vez"""
+        if conn.execute("SELECT 1 FROM meta WHERE chave = 'json_migrado'").fetchone():
+            return
+        
+        audios = []
+        if self.json_file:
+            # Lido pelo AudioCatalog para incluir as alterações ainda só no journal
+            legacy = AudioCatalog(self.json_file, journal_file=self.json_file + '.journal')
+            try:
+                legacy.refresh(force=True, strict=True)
+            except json.JSONDecodeError as e:
+                logger.error(f"Erro ao ler {self.json_file} para migração: {e}")
+                return
+            audios = legacy.all()
+        
+        # BEGIN IMMEDIATE garante que só um processo (bot ou web) faça a migração
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE chave = 'json_migrado'").fetchone():
+                conn.rollback()
+                return
+            for audio in audios:
+                conn.execute(
+                    "INSERT OR IGNORE INTO audios (nome, nome_key, caminho, tipo, emoji, duracao, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    self._to_row(audio)
+                )
+            conn.execute(
+                "INSERT INTO meta (chave, valor) VALUES ('json_migrado', ?)",
+                (self.json_file or '',)
+            )
+            self._bump_generation(conn)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        logger.info(f"{len(audios)} áudios migrados de {self.json_file} para {self.db_file}")
+
+    def _to_row(self, audio):
+        extra = {k: v for k, v in audio.items() if k not in self.COLUMNS}
+        return (
+            audio['nome'],
+            audio['nome'].casefold(),
+            str(audio['caminho']),
+            audio['tipo'],
+            audio.get('emoji'),
+            audio.get('duracao'),
+            json.dumps(extra, ensure_ascii=False)
+        )
+
+    @staticmethod
+    def _from_row(row):
+        audio = {
+            'nome': row['nome'],
+            'caminho': row['caminho'],
+            'tipo': row['tipo'],
+            'emoji': row['emoji'],
+            'duracao': row['duracao']
+        }
+        audio.update(json.loads(row['extra'] or '{}'))
+        return audio
+
+    def _fetch_one(self, query, params):
+        row = self.connection().execute(query, params).fetchone()
+        return self._from_row(row) if row else None
+
+    def refresh(self, force=False, strict=False):
+        """Mantido por compatibilidade: o SQLite sempre lê o estado atual"""
+
+    def generation(self):
+        """Contador de escritas gravado na tabela meta"""
+        row = self.connection().execute("SELECT valor FROM meta WHERE chave = 'geracao'").fetchone()
+        return int(row['valor']) if row else 0
+
+    @staticmethod
+    def _bump_generation(conn):
+        conn.execute(
+            "INSERT INTO meta (chave, valor) VALUES ('geracao', 1) "
+            "ON CONFLICT (chave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1"
+        )
+
+    def all(self):
+        rows = self.connection().execute("SELECT * FROM audios ORDER BY id").fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def by_name(self, name):
+        return self._fetch_one("SELECT * FROM audios WHERE nome_key = ?", (name.casefold(),))
+
+    def by_emoji(self, emoji):
+        if not emoji:
+            return None
+        return self._fetch_one("SELECT * FROM audios WHERE emoji = ? ORDER BY id LIMIT 1", (emoji,))
+
+    def by_hash(self, sha256):
+        return self._fetch_one(
+            "SELECT * FROM audios WHERE json_extract(extra, '$.sha256') = ? ORDER BY id LIMIT 1",
+            (sha256,)
+        )
+
+    def references(self, caminho):
+        # Os caminhos são gravados como informados (relativos ou absolutos)
+        paths = {str(caminho), os.path.abspath(caminho), os.path.relpath(caminho)}
+        placeholders = ", ".join("?" * len(paths))
+        row = self.connection().execute(
+            f"SELECT COUNT(*) FROM audios WHERE caminho IN ({placeholders})",
+            tuple(paths)
+        ).fetchone()
+        return row[0]
+
+    def _execute(self, conn, operation):
+        """Executa uma operação já validada dentro da transação corrente"""
+        op = operation['op']
+        if op == 'add':
+            conn.execute(
+                "INSERT INTO audios (nome, nome_key, caminho, tipo, emoji, duracao, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._to_row(operation['audio'])
+            )
+            return dict(operation['audio'])
+        
+        nome_key = operation['nome'].casefold()
+        audio = self._from_row(conn.execute("SELECT * FROM audios WHERE nome_key = ?", (nome_key,)).fetchone())
+        if op == 'remove':
+            conn.execute("DELETE FROM audios WHERE nome_key = ?", (nome_key,))
+            return audio
+        
+        audio.update(operation['updates'])
+        conn.execute(
+            "UPDATE audios SET nome = ?, nome_key = ?, caminho = ?, tipo = ?, emoji = ?, duracao = ?, extra = ? "
+            "WHERE nome_key = ?",
+            self._to_row(audio) + (nome_key,)
+        )
+        return "Áudio atualizado com sucesso"
+
+    def apply(self, operations):
+        """Valida e aplica um lote de operações em uma única transação (tudo ou nada)"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            error = _validate_operations(
+                operations,
+                lambda nome: conn.execute(
+                    "SELECT 1 FROM audios WHERE nome_key = ?", (nome.casefold(),)
+                ).fetchone() is not None,
+                str.casefold
+            )
+            if error:
+                conn.rollback()
+                return False, error
+            results = [self._execute(conn, operation) for operation in operations]
+            self._bump_generation(conn)
+            conn.commit()
+        except sqlite3.IntegrityError as e:
+            conn.rollback()
+            return False, f"Conflito ao gravar no banco de dados: {e}"
+        except BaseException:
+            conn.rollback()
+            raise
+        return True, results
+
+    def add(self, novo_audio):
+        return _single(self.apply([{'op': 'add', 'audio': novo_audio}]))
+
+    def update(self, nome, updates):
+        return _single(self.apply([{'op': 'update', 'nome': nome, 'updates': dict(updates)}]))
+
+    def remove(self, nome):
+        return _single(self.apply([{'op': 'remove', 'nome': nome}]))
+
+
+def _create_catalog():
+    """Cria o catálogo de acordo com o backend configurado"""
+    if DB_BACKEND == 'sqlite':
+        return SqliteAudioCatalog(SQLITE_DB_FILE, json_file=DB_FILE)
+    if DB_BACKEND != 'json':
+        logger.warning(f"Backend de banco de dados desconhecido '{DB_BACKEND}', usando 'json'")
+    return AudioCatalog(DB_FILE, lock_file=LOCK_FILE, journal_file=JOURNAL_FILE if JOURNAL_ENABLED else None)
+
+
+# Catálogo compartilhado por todo o processo
+catalog = _create_catalog()
+
+def get_generation():
+    """Retorna o contador de gerações do catálogo.
+
+    Permite que caches derivados (busca, páginas) detectem mudanças feitas
+    por este ou por outro processo sem reler o catálogo inteiro.
+    """
+    return catalog.generation()
+
 def get_all_audios():
     """Retorna todos os áudios cadastrados no sistema"""
-    try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            db = json.load(f)
-            return db.get('audios', [])
-    except (json.JSONDecodeError, FileNotFoundError) as e:
-        logger.error(f"Erro ao ler banco de dados: {e}")
-        return []
+    return catalog.all()
 
 def get_audio_by_name(name):
     """Procura um áudio pelo nome"""
-    audios = get_all_audios()
-    for audio in audios:
-        if audio['nome'].lower() == name.lower():
-            return audio
-    return None
+    return catalog.by_name(name)
 
 def get_audio_by_emoji(emoji):
     """Procura um áudio pelo emoji associado"""
-    audios = get_all_audios()
-    for audio in audios:
-        if audio.get('emoji') == emoji:
-            return audio
-    return None
+    return catalog.by_emoji(emoji)
+
+def get_audio_by_hash(sha256):
+    """Procura um áudio pelo SHA-256 do conteúdo enviado"""
+    return catalog.by_hash(sha256)
 
-def add_audio(nome, caminho, tipo, emoji=None, duracao=None):
+def count_references(caminho):
+    """Número de áudios do catálogo que usam o arquivo (áudios duplicados compartilham o mesmo)"""
+    return catalog.references(caminho)
+
+def _new_record(nome, caminho, tipo, emoji=None, duracao=None, **extra):
+    """Monta o registro de um novo áudio"""
+    novo_audio = {
+        'nome': nome,
+        'caminho': caminho,
+        'tipo': tipo,  # 'original' ou 'editado'
+        'emoji': emoji,
+        'duracao': duracao
+    }
+    novo_audio.update(extra)
+    return novo_audio
+
+def add_audio(nome, caminho, tipo, emoji=None, duracao=None, **extra):
     """Adiciona um novo áudio ao banco de dados"""
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            db = json.load(f)
-        
-        # Verificar se o áudio já existe
-        for audio in db['audios']:
-            if audio['nome'].lower() == nome.lower():
-                return False, "Um áudio com este nome já existe"
-        
         # Criar novo registro de áudio
-        novo_audio = {
-            'nome': nome,
-            'caminho': caminho,
-            'tipo': tipo,  # 'original' ou 'editado'
-            'emoji': emoji,
-            'duracao': duracao
-        }
+        novo_audio = _new_record(nome, caminho, tipo, emoji, duracao, **extra)
         
-        db['audios'].append(novo_audio)
-        
-        # Salvar no banco de dados
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
-        
-        return True, novo_audio
+        return catalog.add(novo_audio)
     
     except Exception as e:
         logger.error(f"Erro ao adicionar áudio: {e}")
@@ -90,26 +842,7 @@ def add_audio(nome, caminho, tipo, emoji=None, duracao=None):
 def update_audio(nome, updates):
     """Atualiza as informações de um áudio existente"""
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            db = json.load(f)
-        
-        updated = False
-        for i, audio in enumerate(db['audios']):
-            if audio['nome'].lower() == nome.lower():
-                # Atualizar campos
-                for key, value in updates.items():
-                    db['audios'][i][key] = value
-                updated = True
-                break
-        
-        if not updated:
-            return False, "Áudio não encontrado"
-        
-        # Salvar no banco de dados
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
-        
-        return True, "Áudio atualizado com sucesso"
+        return catalog.update(nome, updates)
     
     except Exception as e:
         logger.error(f"Erro ao atualizar áudio: {e}")
@@ -118,28 +851,83 @@ def update_audio(nome, updates):
 def remove_audio(nome):
     """Remove um áudio do banco de dados"""
     try:
-        with open(DB_FILE, 'r', encoding='utf-8') as f:
-            db = json.load(f)
-        
-        # Verificar se o áudio existe
-        index_to_remove = None
-        for i, audio in enumerate(db['audios']):
-            if audio['nome'].lower() == nome.lower():
-                index_to_remove = i
-                break
-        
-        if index_to_remove is None:
-            return False, "Áudio não encontrado"
-        
-        # Remover o áudio
-        audio_removed = db['audios'].pop(index_to_remove)
-        
-        # Salvar no banco de dados
-        with open(DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(db, f, ensure_ascii=False, indent=2)
-        
-        return True, audio_removed
+        return catalog.remove(nome)
     
     except Exception as e:
         logger.error(f"Erro ao remover áudio: {e}")
         return False, f"Erro ao remover áudio: {str(e)}"
+
+def apply_operations(operations):
+    """Aplica uma lista de operações ({'op': 'add'|'update'|'remove', ...}) de uma vez"""
+    try:
+        return catalog.apply(operations)
+    
+    except Exception as e:
+        logger.error(f"Erro ao aplicar lote de alterações: {e}")
+        return False, f"Erro ao aplicar lote de alterações: {str(e)}"
+
+def add_audios(records):
+    """Adiciona vários áudios de uma vez (tudo ou nada).
+
+    Cada registro é um dict com 'nome', 'caminho', 'tipo' e, opcionalmente,
+    'emoji', 'duracao' e outros campos. Retorna (True, [novos_audios]) ou
+    (False, mensagem) sem ter adicionado nenhum.
+    """
+    try:
+        operations = [{'op': 'add', 'audio': _new_record(**record)} for record in records]
+    except TypeError as e:
+        return False, f"Registro de áudio inválido: {e}"
+    return apply_operations(operations)
+
+def update_audios(updates):
+    """Atualiza vários áudios de uma vez (tudo ou nada); updates = {nome: {campo: valor}}"""
+    operations = [
+        {'op': 'update', 'nome': nome, 'updates': dict(changes)}
+        for nome, changes in updates.items()
+    ]
+    return apply_operations(operations)
+
+class Batch:
+    """Acumula alterações no catálogo para gravá-las em um único commit.
+
+    Use por meio de database.batch(). As operações só são validadas e
+    aplicadas no commit; se qualquer uma falhar, nenhuma é aplicada.
+    """
+
+    def __init__(self):
+        self.operations = []
+        self.success = None
+        self.result = None
+
+    def add_audio(self, nome, caminho, tipo, emoji=None, duracao=None, **extra):
+        self.operations.append({'op': 'add', 'audio': _new_record(nome, caminho, tipo, emoji, duracao, **extra)})
+
+    def update_audio(self, nome, updates):
+        self.operations.append({'op': 'update', 'nome': nome, 'updates': dict(updates)})
+
+    def remove_audio(self, nome):
+        self.operations.append({'op': 'remove', 'nome': nome})
+
+    def commit(self):
+        if not self.operations:
+            self.success, self.result = True, []
+        else:
+            self.success, self.result = apply_operations(self.operations)
+        return self.success, self.result
+
+@contextmanager
+def batch():
+    """Agrupa alterações no catálogo em uma transação tudo-ou-nada.
+
+    Exemplo:
+        with database.batch() as lote:
+            lote.add_audio('a', 'audios/originais/a.mp3', 'original')
+            lote.update_audio('b', {'emoji': '🎉'})
+        if not lote.success:
+            print(lote.result)
+
+    Se o bloco levantar uma exceção, nada é gravado.
+    """
+    lote = Batch()
+    yield lote
+    lote.commit()
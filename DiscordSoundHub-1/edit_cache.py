@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import utils
+
+# Configuração do logger
+logger = logging.getLogger('discord_bot.edit_cache')
+
+# Diretório dos resultados de edições, nomeados pelo hash da edição
+EDIT_CACHE_DIR = Path('audios/cache/edicoes')
+
+# Espaço máximo, em MB, dos resultados que nenhum áudio do catálogo usa
+EDIT_CACHE_MB = float(os.environ.get('EDIT_CACHE_MB', '256'))
+
+# Versão do formato das edições; mudar invalida as entradas antigas (ex.: outro codificador)
+CACHE_VERSION = 1
+
+_lock = threading.Lock()
+_last_used = {}  # {chave: instante do último uso}
+_counters = {'acertos': 0, 'falhas': 0, 'removidos': 0}
+
+def normalize_operations(operations):
+    """Forma canônica de uma lista de operações (ver utils.parse_edit_operations)"""
+    normalized = []
+    for name, *values in operations:
+        values = [round(float(value), 4) if isinstance(value, float) else int(value) for value in values]
+        normalized.append([name, *values])
+    return normalized
+
+def cache_key(source_path, operations):
+    """Chave do resultado: hash do conteúdo do original e das operações normalizadas.
+
+    Não depende do nome nem do caminho do áudio, então um original renomeado
+    continua usando o cache e um arquivo substituído gera outra chave.
+    """
+    payload = json.dumps({
+        'versao': CACHE_VERSION,
+        'original': utils.file_sha256(source_path),
+        'operacoes': normalize_operations(operations)
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def cache_path(key):
+    return EDIT_CACHE_DIR / f"{key}.mp3"
+
+def _link_or_copy(source, destination):
+    """Cria `destination` com o conteúdo de `source` (link físico, ou cópia se não houver suporte)"""
+    temp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.link(source, temp_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, destination)
+
+def fetch(key, output_path):
+    """Coloca o resultado em cache em `output_path`; retorna False se não houver"""
+    path = cache_path(key)
+    try:
+        _link_or_copy(path, output_path)
+    except FileNotFoundError:
+        with _lock:
+            _counters['falhas'] += 1
+        return False
+    with _lock:
+        _last_used[key] = time.time()
+        _counters['acertos'] += 1
+    logger.info(f"Edição {key[:12]} reaproveitada do cache")
+    return True
+
+def store(key, output_path):
+    """Guarda o resultado de uma edição e remove os mais antigos se passar do limite"""
+    path = cache_path(key)
+    EDIT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        _link_or_copy(output_path, path)
+    with _lock:
+        _last_used[key] = time.time()
+    evict()
+
+def evict(max_bytes=None):
+    """Remove os resultados menos usados até caberem no limite.
+
+    Os resultados são links físicos dos arquivos do catálogo: enquanto um
+    áudio usa o arquivo, o link extra não ocupa espaço e não é removido.
+    Só contam para o limite os que não têm outro link (áudio excluído ou
+    sistema de arquivos sem links).
+    """
+    if max_bytes is None:
+        max_bytes = EDIT_CACHE_MB * 1024 * 1024
+    with _lock:
+        entries = []
+        for path in EDIT_CACHE_DIR.glob('*.mp3'):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            if st.st_nlink > 1:
+                continue
+            entries.append((_last_used.get(path.stem, st.st_mtime), st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            _last_used.pop(path.stem, None)
+            _counters['removidos'] += 1
+            total -= size
+            logger.info(f"Edição {path.stem[:12]} removida do cache")
+
+def stats():
+    """Acertos, falhas e remoções do cache de edições"""
+    with _lock:
+        return dict(_counters)
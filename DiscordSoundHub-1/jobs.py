@@ -0,0 +1,356 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import itertools
+import subprocess
+import threading
+import edit_cache
+
+# Configuração do logger
+logger = logging.getLogger('discord_bot.jobs')
+
+# Processos de edição (FFmpeg) executando ao mesmo tempo no bot inteiro
+EDIT_WORKERS = int(os.environ.get('EDIT_WORKERS', '2'))
+
+# Edições executando ao mesmo tempo em um mesmo servidor
+EDIT_JOBS_PER_GUILD = int(os.environ.get('EDIT_JOBS_PER_GUILD', '1'))
+
+# Tempo máximo de uma edição, em segundos
+EDIT_TIMEOUT = float(os.environ.get('EDIT_TIMEOUT', '300'))
+
+# Threads que executam as edições pedidas pelo servidor web
+WEB_EDIT_WORKERS = int(os.environ.get('WEB_EDIT_WORKERS', '2'))
+
+# Estados de um job
+QUEUED = 'na fila'
+RUNNING = 'executando'
+DONE = 'concluído'
+CANCELLED = 'cancelado'
+FAILED = 'erro'
+
+_ids = itertools.count(1)
+
+class Job:
+    """Uma edição de áudio executada por um processo FFmpeg"""
+
+    def __init__(self, guild_id, description, command, output_path, expected_ms=None, cache_key=None):
+        self.id = next(_ids)
+        self.guild_id = guild_id
+        self.description = description
+        self.command = list(command or ())
+        self.output_path = str(output_path)
+        self.expected_ms = expected_ms
+        self.status = QUEUED
+        self.progress = 0.0
+        self.error = None
+        self.created_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.finish = None
+        self.prepare = None
+        self.cache_key = cache_key
+        self.cached = False
+        self._process = None
+        self._task = None
+        self._cancelled = False
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def cancel(self):
+        """Cancela o job; um processo em execução é encerrado"""
+        if not self.active:
+            return False
+        self._cancelled = True
+        if self.status == QUEUED:
+            # Ainda esperando vaga: interromper a espera
+            self.status = CANCELLED
+            if self._task:
+                self._task.cancel()
+        elif self._process and self._process.returncode is None:
+            self._process.kill()
+        return True
+
+    def to_dict(self):
+        """Estado do job em formato serializável (para a API web)"""
+        return {
+            'id': self.id,
+            'descricao': self.description,
+            'status': self.status,
+            'progresso': round(self.progress, 3),
+            'erro': self.error,
+            'resultado': self.result,
+            'cache': self.cached
+        }
+
+    def _fetch_cached(self):
+        """Usa um resultado já calculado para a mesma edição, sem executar o FFmpeg"""
+        if not self.cache_key or not edit_cache.fetch(self.cache_key, self.output_path):
+            return False
+        self.cached = True
+        self.status = DONE
+        self.progress = 1.0
+        self.started_at = time.monotonic()
+        return True
+
+    def _store_cached(self):
+        if not self.cache_key:
+            return
+        try:
+            edit_cache.store(self.cache_key, self.output_path)
+        except Exception as e:
+            logger.warning(f"Erro ao guardar o job {self.id} no cache de edições: {e}")
+
+    def _command_with_progress(self):
+        return self.command[:1] + ["-progress", "pipe:1", "-nostats"] + self.command[1:]
+
+    def _check_result(self, returncode, stderr):
+        """Define o estado final a partir da saída do FFmpeg; retorna (sucesso, resultado)"""
+        if self._cancelled:
+            self.status = CANCELLED
+            return False, "Edição cancelada"
+        if returncode != 0:
+            self.status = FAILED
+            self.error = f"Erro ao processar áudio: {stderr}"
+            logger.error(f"Job {self.id} falhou: {stderr}")
+            return False, self.error
+        if "Output file is empty" in stderr:
+            self.status = FAILED
+            self.error = "O áudio resultante ficou vazio"
+            return False, self.error
+
+        self.status = DONE
+        self.progress = 1.0
+        logger.info(f"Job {self.id} ({self.description}) concluído em {time.monotonic() - self.started_at:.1f} s")
+        return True, self.output_path
+
+    def _update_progress(self, line):
+        # Linhas do -progress: out_time_us=1234567 (out_time_ms também é em µs)
+        key, _, value = line.partition('=')
+        if key in ('out_time_us', 'out_time_ms') and value.isdigit() and self.expected_ms:
+            self.progress = min(1.0, int(value) / 1000 / self.expected_ms)
+        elif key == 'progress' and value == 'end':
+            self.progress = 1.0
+
+class JobRunner:
+    """Executa edições em processos FFmpeg fora do loop de eventos.
+
+    No máximo `max_workers` processos rodam ao mesmo tempo e cada servidor
+    tem seu próprio limite, para que um servidor não ocupe todos os
+    processos. O progresso é lido da saída -progress do FFmpeg e um job
+    pode ser cancelado na fila ou durante a execução.
+    """
+
+    def __init__(self, max_workers=EDIT_WORKERS, per_guild=EDIT_JOBS_PER_GUILD):
+        self.max_workers = max_workers
+        self.per_guild = per_guild
+        self.jobs = {}  # {job_id: Job}
+        self._slots = None
+        self._guild_slots = {}  # {guild_id: asyncio.Semaphore}
+
+    def submit(self, guild_id, description, command, output_path, expected_ms=None, cache_key=None):
+        job = Job(guild_id, description, command, output_path, expected_ms, cache_key)
+        self.jobs[job.id] = job
+        self._forget_finished()
+        return job
+
+    def guild_jobs(self, guild_id):
+        """Jobs ativos (na fila ou executando) de um servidor"""
+        return [job for job in self.jobs.values() if job.guild_id == guild_id and job.active]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        return job.cancel() if job else False
+
+    def _forget_finished(self, keep=100):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[:-keep]:
+            del self.jobs[job_id]
+
+    async def run(self, job, on_progress=None, interval=1.5):
+        """Executa o job; retorna (sucesso, caminho de saída ou mensagem de erro).
+
+        `on_progress(job)` é chamado no máximo a cada `interval` segundos.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        guild_slots = self._guild_slots.setdefault(job.guild_id, asyncio.Semaphore(self.per_guild))
+
+        job._task = asyncio.current_task()
+        try:
+            # Edição repetida: não precisa esperar vaga
+            if await asyncio.to_thread(job._fetch_cached):
+                return True, job.output_path
+            async with guild_slots, self._slots:
+                if job._cancelled:
+                    job.status = CANCELLED
+                    return False, "Edição cancelada"
+                success, result = await self._execute(job, on_progress, interval)
+            if success:
+                await asyncio.to_thread(job._store_cached)
+            return success, result
+        except asyncio.CancelledError:
+            # Cancelado pelo usuário enquanto esperava vaga
+            if job._cancelled and job.status == CANCELLED and job._process is None:
+                job._task.uncancel()
+                return False, "Edição cancelada"
+            raise
+        finally:
+            job.finished_at = time.monotonic()
+            if job.status != DONE and os.path.exists(job.output_path):
+                os.remove(job.output_path)
+
+    async def _execute(self, job, on_progress, interval):
+        job.status = RUNNING
+        job.started_at = time.monotonic()
+        job._process = process = await asyncio.create_subprocess_exec(
+            *job._command_with_progress(),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+
+        async def read_progress():
+            last_report = 0.0
+            async for raw_line in process.stdout:
+                job._update_progress(raw_line.decode(errors='replace').strip())
+                now = time.monotonic()
+                if on_progress and now - last_report >= interval:
+                    last_report = now
+                    try:
+                        await on_progress(job)
+                    except Exception as e:
+                        logger.warning(f"Erro ao atualizar progresso do job {job.id}: {e}")
+
+        try:
+            _, stderr = await asyncio.wait_for(
+                asyncio.gather(read_progress(), process.stderr.read()),
+                timeout=EDIT_TIMEOUT
+            )
+            await process.wait()
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            job.status = FAILED
+            job.error = f"A edição excedeu o tempo limite de {EDIT_TIMEOUT:.0f} segundos"
+            return False, job.error
+        except asyncio.CancelledError:
+            # A tarefa que aguardava o job foi cancelada: não deixar o FFmpeg órfão
+            process.kill()
+            job.status = CANCELLED
+            raise
+
+        return job._check_result(process.returncode, stderr.decode(errors='replace'))
+
+class JobQueue:
+    """Fila de edições executada por threads, para o servidor web (Flask).
+
+    A requisição só enfileira o job, recebendo o id de volta. As threads
+    chamam `job.prepare(job)`, se houver, para montar o comando (leituras
+    do arquivo de origem ficam fora da requisição), executam o FFmpeg e
+    depois `job.finish(job)`, cujo retorno fica em `job.result`. O estado é consultado por id. Os jobs
+    ficam na memória do processo.
+    """
+
+    def __init__(self, workers=WEB_EDIT_WORKERS):
+        self.workers = workers
+        self.jobs = {}  # {job_id: Job}
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, description, command, output_path, expected_ms=None, finish=None, cache_key=None, prepare=None):
+        job = Job(None, description, command, output_path, expected_ms, cache_key)
+        job.finish = finish
+        job.prepare = prepare
+        with self._lock:
+            self.jobs[job.id] = job
+            finished = [job_id for job_id, other in self.jobs.items() if not other.active]
+            for job_id in finished[:-100]:
+                del self.jobs[job_id]
+            # Iniciar as threads na primeira edição
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._worker, name=f'edit-worker-{len(self._threads)}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job._cancelled:
+                    job.status = CANCELLED
+                    continue
+                if job.prepare:
+                    # Retorna (comando, duração esperada em ms, chave do cache)
+                    job.command, job.expected_ms, job.cache_key = job.prepare(job)
+                success = job._fetch_cached()
+                if not success:
+                    success, _ = self._execute(job)
+                    if success:
+                        job._store_cached()
+                if success and job.finish:
+                    # Só marcar como concluído depois que o resultado estiver registrado
+                    job.status = RUNNING
+                    job.result = job.finish(job)
+                    job.status = DONE
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                logger.error(f"Erro no job {job.id} ({job.description}): {e}")
+            finally:
+                job.finished_at = time.monotonic()
+                if job.status != DONE and os.path.exists(job.output_path):
+                    os.remove(job.output_path)
+
+    def _execute(self, job):
+        job.status = RUNNING
+        job.started_at = time.monotonic()
+        job._process = process = subprocess.Popen(
+            job._command_with_progress(),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors='replace'
+        )
+
+        # Ler stderr em paralelo para o FFmpeg não travar com o buffer cheio
+        stderr_parts = []
+        reader = threading.Thread(target=lambda: stderr_parts.append(process.stderr.read()), daemon=True)
+        reader.start()
+        timer = threading.Timer(EDIT_TIMEOUT, process.kill)
+        timer.start()
+        try:
+            for line in process.stdout:
+                job._update_progress(line.strip())
+            process.wait()
+        finally:
+            timer.cancel()
+            reader.join()
+
+        if process.returncode != 0 and not job._cancelled and time.monotonic() - job.started_at >= EDIT_TIMEOUT:
+            job.status = FAILED
+            job.error = f"A edição excedeu o tempo limite de {EDIT_TIMEOUT:.0f} segundos"
+            return False, job.error
+        return job._check_result(process.returncode, ''.join(stderr_parts))
+
+
+# Executor compartilhado pelo bot
+runner = JobRunner()
+
+# Fila do servidor web, com threads iniciadas na primeira edição
+web_queue = JobQueue()
+
+def progress_bar(fraction, width=12):
+    """Barra de progresso em texto para mensagens do Discord"""
+    filled = round(max(0.0, min(1.0, fraction)) * width)
+    return "▰" * filled + "▱" * (width - filled)
@@ -108,6 +108,13 @@ if __name__ == "__main__":
             # Carregar todos os cogs
             await load_cogs(bot)
             
+            # Registrar os slash commands (/tocar, /adicionar, /cortar...) no Discord
+            try:
+                synced = await bot.tree.sync()
+                logger.info(f"{len(synced)} slash commands sincronizados")
+            except Exception as e:
+                logger.error(f"Erro ao sincronizar slash commands: {str(e)}")
+            
             # Status personalizado
             await bot.change_presence(activity=discord.Activity(
                 type=discord.ActivityType.listening,
@@ -153,21 +160,21 @@ if __name__ == "__main__":
                 # Comandos de reprodução
                 embed.add_field(
                     name="🔊 Reprodução",
-                    value="`!tocar <nome>` - Toca um áudio\n`!pausar` - Pausa o áudio atual\n`!continuar` - Continua o áudio pausado\n`!parar` - Para a reprodução\n`!pular` - Pula para o próximo áudio\n`!fila` - Mostra a fila de reprodução\n`!limpar` - Limpa a fila\n`!loop` - Ativa/desativa repetição\n`!embaralhar` - Embaralha a fila\n`!adicionar <nomes>` - Adiciona áudios à fila\n`!remover <posição>` - Remove um áudio da fila\n`!tocando` - Mostra o que está tocando",
+                    value="`!tocar <nome>` - Toca um áudio\n`!pausar` - Pausa o áudio atual\n`!continuar` - Continua o áudio pausado\n`!parar` - Para a reprodução\n`!pular` - Pula para o próximo áudio\n`!fila` - Mostra a fila de reprodução\n`!limpar` - Limpa a fila\n`!loop` - Ativa/desativa repetição\n`!embaralhar` - Embaralha a fila\n`!adicionar <nomes>` - Adiciona áudios à fila\n`!remover <posição>` - Remove um áudio da fila\n`!tocando` - Mostra o que está tocando\n`!cache` - Mostra o uso do cache de áudio\n`!conexao` - Mostra o estado da conexão de voz\n`!intervalos` - Mostra os intervalos entre faixas da fila\n`!volume [0-200]` - Mostra ou define o volume do servidor",
                     inline=False
                 )
                 
                 # Comandos de gerenciamento
                 embed.add_field(
                     name="📁 Gerenciamento",
-                    value="`!listar` - Lista todos os áudios\n`!enviar` - Faz upload de um áudio\n`!renomear <antigo> <novo>` - Renomeia um áudio\n`!emoji <nome> <emoji>` - Associa um emoji a um áudio\n`!deletar <nome>` - Remove um áudio",
+                    value="`!listar` - Lista todos os áudios\n`!enviar` - Faz upload de um ou mais áudios\n`!renomear <antigo> <novo>` - Renomeia um áudio\n`!emoji <nome> <emoji>` - Associa um emoji a um áudio\n`!ganho <nome> [10-400]` - Mostra ou define o ganho de um áudio\n`!deletar <nome>` - Remove um áudio",
                     inline=False
                 )
                 
                 # Comandos de edição
                 embed.add_field(
                     name="✂️ Edição",
-                    value="`!cortar <nome> <inicio> <fim>` - Corta um áudio\n`!inverter <nome>` - Inverte um áudio\n`!velocidade <nome> <fator>` - Altera a velocidade",
+                    value="`!cortar <nome> <inicio> <fim>` - Corta um áudio\n`!inverter <nome>` - Inverte um áudio\n`!velocidade <nome> <fator>` - Altera a velocidade\n`!editar <nome> <operações>` - Várias edições de uma vez\n`!cancelar [id]` - Cancela uma edição em andamento",
                     inline=False
                 )
                 
@@ -0,0 +1,205 @@
+import bisect
+import logging
+import re
+import threading
+import unicodedata
+from collections import Counter
+import database
+
+# Configuração do logger
+logger = logging.getLogger('discord_bot.search')
+
+# Número máximo de candidatos avaliados por similaridade de trigramas
+MAX_CANDIDATES = 50
+
+# Quantidade de entradas de listas invertidas percorridas por busca aproximada
+POSTINGS_BUDGET = 3000
+
+# Pontuação mínima para uma sugestão aproximada ser retornada
+MIN_SCORE = 0.3
+
+def normalize(text):
+    """Normaliza um nome para busca: sem acentos, minúsculo e com '_'/'-' como espaço
+
+    Exemplo: 'EITA_GLORIA' -> 'eita gloria', 'cabeça-de-gelo' -> 'cabeca de gelo'
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    without_accents = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    spaced = re.sub(r'[\s_\-.]+', ' ', without_accents.casefold())
+    return spaced.strip()
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex:
+    """Índice de busca por prefixo e aproximada sobre os nomes dos áudios.
+
+    O prefixo é resolvido com busca binária em listas ordenadas de nomes e
+    de palavras normalizadas; a busca aproximada usa um índice invertido de
+    trigramas, avaliando apenas os nomes que compartilham os trigramas mais
+    raros da consulta.
+    """
+
+    def __init__(self, names=()):
+        self.names = []
+        self._keys = []
+        self._sorted_keys = []  # [(chave, id)] ordenado
+        self._sorted_words = []  # [(palavra, id)] ordenado
+        self._grams = {}  # {trigrama: [id, ...]}
+        for name in dict.fromkeys(names):
+            self._add(name)
+        self._sorted_keys.sort()
+        self._sorted_words.sort()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add(self, name):
+        key = normalize(name)
+        name_id = len(self.names)
+        self.names.append(name)
+        self._keys.append(key)
+        self._sorted_keys.append((key, name_id))
+        for word in set(key.split()):
+            self._sorted_words.append((word, name_id))
+        for gram in _trigrams(key):
+            self._grams.setdefault(gram, []).append(name_id)
+
+    @staticmethod
+    def _prefix_range(sorted_list, prefix):
+        start = bisect.bisect_left(sorted_list, (prefix,))
+        for i in range(start, len(sorted_list)):
+            key, name_id = sorted_list[i]
+            if not key.startswith(prefix):
+                break
+            yield name_id
+
+    def prefix(self, query, limit=25):
+        """Nomes cujo início (ou o início de alguma palavra) corresponde à consulta"""
+        key = normalize(query)
+        if not key:
+            return [self.names[name_id] for _, name_id in self._sorted_keys[:limit]]
+
+        found = {}
+        for name_id in self._prefix_range(self._sorted_keys, key):
+            found[name_id] = None
+            if len(found) >= limit:
+                return [self.names[i] for i in found]
+        for name_id in self._prefix_range(self._sorted_words, key):
+            found[name_id] = None
+            if len(found) >= limit:
+                break
+        return [self.names[i] for i in found]
+
+    def search(self, query, limit=5, min_score=MIN_SCORE):
+        """Busca ordenada por relevância; retorna [(nome, pontuação)]
+
+        Correspondência exata vale 1.0, prefixo do nome 0.9, prefixo de uma
+        palavra 0.8; demais nomes são pontuados pelo coeficiente de Dice
+        dos trigramas (limitado a 0.75).
+        """
+        key = normalize(query)
+        if not key:
+            return []
+
+        scores = {}
+        for name_id in self._prefix_range(self._sorted_keys, key):
+            scores[name_id] = 1.0 if self._keys[name_id] == key else 0.9
+            if len(scores) >= limit:
+                break
+        for name_id in self._prefix_range(self._sorted_words, key):
+            if len(scores) >= limit:
+                break
+            scores.setdefault(name_id, 0.8)
+
+        if len(scores) < limit:
+            for name_id, score in self._fuzzy(key):
+                if score < min_score:
+                    break
+                scores.setdefault(name_id, score)
+                if len(scores) >= limit:
+                    break
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], len(self._keys[item[0]]), self._keys[item[0]]))
+        return [(self.names[name_id], round(score, 3)) for name_id, score in ranked[:limit]]
+
+    def _fuzzy(self, key):
+        """Candidatos por trigramas, do mais para o menos parecido"""
+        query_grams = _trigrams(key)
+        postings = sorted(
+            (self._grams[gram] for gram in query_grams if gram in self._grams),
+            key=len
+        )
+
+        # Percorrer primeiro os trigramas mais raros, dentro do orçamento
+        counts = Counter()
+        visited = 0
+        for posting in postings:
+            if visited and visited + len(posting) > POSTINGS_BUDGET:
+                break
+            counts.update(posting)
+            visited += len(posting)
+
+        results = []
+        for name_id, _ in counts.most_common(MAX_CANDIDATES):
+            candidate_grams = _trigrams(self._keys[name_id])
+            shared = len(query_grams & candidate_grams)
+            dice = 2 * shared / (len(query_grams) + len(candidate_grams))
+            results.append((name_id, min(dice, 0.75)))
+        results.sort(key=lambda item: -item[1])
+        return results
+
+
+# Índice compartilhado, reconstruído quando os nomes do catálogo mudam
+_index = SearchIndex()
+_index_generation = None
+_index_lock = threading.Lock()
+_refresh_thread = None
+_refresh_lock = threading.Lock()
+
+def get_index():
+    """Retorna o índice atualizado de acordo com a geração do catálogo.
+
+    Bloqueia enquanto o índice é reconstruído; no loop de eventos do bot use
+    current_index. Alterações que não mexem nos nomes (emoji, ganho,
+    loudness...) só avançam a geração, sem reconstruir o índice.
+    """
+    global _index, _index_generation
+    generation = database.get_generation()
+    if generation == _index_generation:
+        return _index
+    with _index_lock:
+        if generation != _index_generation:
+            names = list(dict.fromkeys(audio['nome'] for audio in database.get_all_audios()))
+            if names != _index.names:
+                _index = SearchIndex(names)
+                logger.debug(f"Índice de busca reconstruído com {len(names)} nomes (geração {generation})")
+            _index_generation = generation
+    return _index
+
+def current_index():
+    """Retorna o índice sem bloquear.
+
+    Se o catálogo mudou, a atualização roda em uma thread e o índice
+    anterior continua respondendo até ela terminar.
+    """
+    global _refresh_thread
+    if database.get_generation() != _index_generation:
+        with _refresh_lock:
+            if _refresh_thread is None or not _refresh_thread.is_alive():
+                _refresh_thread = threading.Thread(target=get_index, name='search-index', daemon=True)
+                _refresh_thread.start()
+    return _index
+
+def search(query, limit=5):
+    """Busca aproximada de nomes de áudio; retorna [(nome, pontuação)]"""
+    return get_index().search(query, limit)
+
+def suggest(query, limit=3):
+    """Sugestões de 'você quis dizer' para um nome não encontrado (sem bloquear o bot)"""
+    return [name for name, _ in current_index().search(query, limit)]
+
+def complete(prefix, limit=25):
+    """Nomes que começam com o texto digitado (para autocomplete, sem bloquear o bot)"""
+    return current_index().prefix(prefix, limit)
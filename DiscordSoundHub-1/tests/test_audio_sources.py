@@ -0,0 +1,92 @@
+import pytest
+
+import audio_sources
+
+
+def lacing_for(size, last=True):
+    """Valores de lacing de um pacote; sem last, o pacote continua na próxima página"""
+    values = [255] * (size // 255)
+    if last:
+        values.append(size % 255)
+    return values
+
+def ogg_page(segments, data):
+    header = b'OggS' + bytes(22) + bytes([len(segments)])
+    return header + bytes(segments) + data
+
+def opus_file(tmp_path, pages):
+    path = tmp_path / 'clip.opus'
+    path.write_bytes(b''.join(pages))
+    return path
+
+HEADERS = [
+    ogg_page(lacing_for(19), b'OpusHead' + bytes(11)),
+    ogg_page(lacing_for(16), b'OpusTags' + bytes(8)),
+]
+
+
+def test_read_ogg_packets_skips_opus_headers(tmp_path):
+    packets = [b'a' * 10, b'b' * 300, b'c']
+    segments = [value for packet in packets for value in lacing_for(len(packet))]
+    path = opus_file(tmp_path, HEADERS + [ogg_page(segments, b''.join(packets))])
+
+    assert audio_sources.read_ogg_packets(path) == packets
+
+def test_packet_of_exactly_255_bytes_ends_with_empty_segment(tmp_path):
+    packet = b'x' * 255
+    path = opus_file(tmp_path, HEADERS + [ogg_page(lacing_for(255) + lacing_for(1), packet + b'y')])
+
+    assert lacing_for(255) == [255, 0]
+    assert audio_sources.read_ogg_packets(path) == [packet, b'y']
+
+def test_packet_continued_on_next_page(tmp_path):
+    packet = b'z' * 600
+    first = ogg_page(lacing_for(510, last=False), packet[:510])
+    second = ogg_page(lacing_for(90), packet[510:])
+    path = opus_file(tmp_path, HEADERS + [first, second])
+
+    assert audio_sources.read_ogg_packets(path) == [packet]
+
+def test_truncated_file_stops_at_last_complete_page(tmp_path):
+    complete = ogg_page(lacing_for(5), b'12345')
+    path = opus_file(tmp_path, HEADERS + [complete, complete[:10]])
+
+    assert audio_sources.read_ogg_packets(path) == [b'12345']
+
+def test_invalid_stream_raises(tmp_path):
+    path = tmp_path / 'clip.opus'
+    path.write_bytes(b'RIFF' + bytes(40))
+
+    with pytest.raises(ValueError):
+        audio_sources.read_ogg_packets(path)
+
+def test_long_opus_tracks_stream_from_disk(tmp_path):
+    path = opus_file(tmp_path, HEADERS + [ogg_page(lacing_for(5), b'12345')])
+
+    source = audio_sources.cached_opus_source(path, audio_sources.MAX_CACHED_CLIP_MS + 1)
+    try:
+        assert isinstance(source, audio_sources.OggOpusAudio)
+        assert source.read() == b'12345'
+    finally:
+        source.cleanup()
+    assert audio_sources.file_key(path) not in audio_sources.frame_cache
+
+def test_frame_cache_rejects_entries_over_the_entry_limit():
+    cache = audio_sources.FrameCache(max_bytes=1000, max_entry_bytes=100)
+
+    assert not cache.put('grande', [b'x' * 101], is_opus=True)
+    assert cache.put('a', [b'x' * 60], is_opus=True)
+    assert cache.put('b', [b'x' * 60], is_opus=True)
+    assert cache.get('a') == ((b'x' * 60,), True)
+    assert 'grande' not in cache
+
+def test_frame_cache_evicts_least_recently_used():
+    cache = audio_sources.FrameCache(max_bytes=100, max_entry_bytes=100)
+    cache.put('a', [b'x' * 40], is_opus=False)
+    cache.put('b', [b'x' * 40], is_opus=False)
+    cache.get('a')
+    cache.put('c', [b'x' * 40], is_opus=False)
+
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+    assert cache.stats()['bytes'] == 80
@@ -0,0 +1,157 @@
+import json
+
+import pytest
+
+import database
+
+
+def make_json_catalog(tmp_path):
+    db_file = str(tmp_path / 'audios_db.json')
+    return database.AudioCatalog(db_file, journal_file=db_file + '.journal')
+
+def record(nome, **extra):
+    return {'nome': nome, 'caminho': f'audios/originais/{nome}.mp3', 'tipo': 'original', **extra}
+
+@pytest.fixture(params=['json', 'sqlite'])
+def catalog(request, tmp_path, monkeypatch):
+    """Catálogo de cada backend, instalado como o catálogo do módulo"""
+    if request.param == 'json':
+        instance = make_json_catalog(tmp_path)
+    else:
+        instance = database.SqliteAudioCatalog(str(tmp_path / 'audios_db.sqlite3'))
+    monkeypatch.setattr(database, 'catalog', instance)
+    return instance
+
+
+def test_journal_is_replayed_by_another_instance(tmp_path):
+    writer = make_json_catalog(tmp_path)
+    writer.add(record('a'))
+    writer.add(record('b'))
+    writer.update('a', {'emoji': '🎉'})
+    writer.remove('b')
+
+    # As alterações estão só no journal: o snapshot nem foi criado
+    assert not (tmp_path / 'audios_db.json').exists()
+    reader = make_json_catalog(tmp_path)
+    assert [audio['nome'] for audio in reader.all()] == ['a']
+    assert reader.by_name('A')['emoji'] == '🎉'
+    assert reader.generation() == writer.generation() == 4
+
+def test_journal_partial_line_is_ignored(tmp_path):
+    writer = make_json_catalog(tmp_path)
+    writer.add(record('a'))
+    with open(writer.journal_file, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'op': 'add', 'audio': record('b'), 'geracao': 2})[:20])
+
+    reader = make_json_catalog(tmp_path)
+    assert [audio['nome'] for audio in reader.all()] == ['a']
+
+    # A próxima escrita descarta a linha incompleta antes de acrescentar a sua
+    assert reader.add(record('c'))[0]
+    assert [audio['nome'] for audio in make_json_catalog(tmp_path).all()] == ['a', 'c']
+
+def test_compact_moves_journal_into_snapshot(tmp_path):
+    catalog = make_json_catalog(tmp_path)
+    for nome in ('a', 'b', 'c'):
+        catalog.add(record(nome))
+    catalog.remove('b')
+
+    catalog.compact()
+
+    assert (tmp_path / 'audios_db.json.journal').stat().st_size == 0
+    snapshot = json.loads((tmp_path / 'audios_db.json').read_text(encoding='utf-8'))
+    assert snapshot['geracao'] == 4
+    assert [audio['nome'] for audio in snapshot['audios']] == ['a', 'c']
+
+    reader = make_json_catalog(tmp_path)
+    assert [audio['nome'] for audio in reader.all()] == ['a', 'c']
+    assert reader.generation() == 4
+
+def test_entries_already_in_snapshot_are_not_applied_twice(tmp_path):
+    catalog = make_json_catalog(tmp_path)
+    catalog.add(record('a'))
+    journal = (tmp_path / 'audios_db.json.journal').read_bytes()
+    catalog.compact()
+
+    # Consolidação interrompida depois do snapshot e antes de esvaziar o journal
+    (tmp_path / 'audios_db.json.journal').write_bytes(journal)
+    reader = make_json_catalog(tmp_path)
+    assert [audio['nome'] for audio in reader.all()] == ['a']
+
+def test_add_audios_adds_all_records(catalog):
+    success, result = database.add_audios([
+        record('a'),
+        record('b', emoji='🎵', duracao=1000, sha256='abc')
+    ])
+
+    assert success
+    assert [audio['nome'] for audio in result] == ['a', 'b']
+    assert database.get_audio_by_name('B')['emoji'] == '🎵'
+    assert database.get_audio_by_hash('abc')['nome'] == 'b'
+
+def test_add_audios_is_all_or_nothing(catalog):
+    database.add_audio('existente', 'x.mp3', 'original')
+
+    success, message = database.add_audios([record('novo'), record('EXISTENTE')])
+
+    assert not success
+    assert 'EXISTENTE' in message
+    assert database.get_audio_by_name('novo') is None
+
+def test_add_audios_rejects_duplicates_in_the_same_batch(catalog):
+    success, _ = database.add_audios([record('Ação'), record('AÇÃO')])
+
+    assert not success
+    assert database.get_all_audios() == []
+
+def test_add_audios_rejects_invalid_records(catalog):
+    success, message = database.add_audios([{'nome': 'sem_caminho'}])
+
+    assert not success
+    assert 'inválido' in message
+
+def test_batch_commits_operations_together(catalog):
+    database.add_audio('a', 'a.mp3', 'original')
+    database.add_audio('b', 'b.mp3', 'original')
+
+    with database.batch() as lote:
+        lote.add_audio('c', 'c.mp3', 'editado')
+        lote.update_audio('a', {'nome': 'a2', 'emoji': '🎉'})
+        lote.remove_audio('b')
+
+    assert lote.success
+    assert sorted(audio['nome'] for audio in database.get_all_audios()) == ['a2', 'c']
+    assert database.get_audio_by_name('a2')['emoji'] == '🎉'
+
+def test_batch_failure_applies_nothing(catalog):
+    database.add_audio('a', 'a.mp3', 'original')
+    generation = database.get_generation()
+
+    with database.batch() as lote:
+        lote.update_audio('a', {'emoji': '🎉'})
+        lote.remove_audio('inexistente')
+
+    assert not lote.success
+    assert "'inexistente'" in lote.result
+    assert database.get_audio_by_name('a')['emoji'] is None
+    assert database.get_generation() == generation
+
+def test_batch_is_discarded_when_the_block_raises(catalog):
+    with pytest.raises(RuntimeError):
+        with database.batch() as lote:
+            lote.add_audio('a', 'a.mp3', 'original')
+            raise RuntimeError('falha no meio do lote')
+
+    assert lote.success is None
+    assert database.get_all_audios() == []
+
+def test_batch_rename_frees_the_old_name(catalog):
+    database.add_audio('a', 'a.mp3', 'original')
+
+    with database.batch() as lote:
+        lote.update_audio('a', {'nome': 'b'})
+        lote.add_audio('A', 'novo.mp3', 'original')
+
+    assert lote.success, lote.result
+    assert database.get_audio_by_name('a')['caminho'] == 'novo.mp3'
+    assert database.get_audio_by_name('b')['caminho'] == 'a.mp3'
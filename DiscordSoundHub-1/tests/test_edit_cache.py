@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+import edit_cache
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'edicoes'
+    monkeypatch.setattr(edit_cache, 'EDIT_CACHE_DIR', directory)
+    monkeypatch.setattr(edit_cache, '_last_used', {})
+    monkeypatch.setattr(edit_cache, '_counters', {'acertos': 0, 'falhas': 0, 'removidos': 0})
+    return directory
+
+def make_result(tmp_path, name, size):
+    path = tmp_path / f'{name}.mp3'
+    path.write_bytes(b'x' * size)
+    return path
+
+
+def test_cache_key_depends_on_content_and_operations(tmp_path):
+    first = make_result(tmp_path, 'a', 10)
+    renamed = make_result(tmp_path, 'b', 10)
+    other = make_result(tmp_path, 'c', 11)
+    operations = [('cortar', 1000, 2000)]
+
+    assert edit_cache.cache_key(first, operations) == edit_cache.cache_key(renamed, operations)
+    assert edit_cache.cache_key(first, operations) == edit_cache.cache_key(first, [['cortar', 1000, 2000]])
+    assert edit_cache.cache_key(first, operations) != edit_cache.cache_key(other, operations)
+    assert edit_cache.cache_key(first, operations) != edit_cache.cache_key(first, [('inverter',)])
+
+def test_store_and_fetch(tmp_path):
+    result = make_result(tmp_path, 'resultado', 10)
+    edit_cache.store('chave', result)
+
+    output = tmp_path / 'copia.mp3'
+    assert edit_cache.fetch('chave', output)
+    assert output.read_bytes() == result.read_bytes()
+    assert not edit_cache.fetch('outra', tmp_path / 'nada.mp3')
+    assert edit_cache.stats()['acertos'] == 1
+    assert edit_cache.stats()['falhas'] == 1
+
+def test_evict_removes_least_recently_used_unlinked_results(tmp_path, cache_dir):
+    for key in ('antigo', 'medio', 'recente'):
+        result = make_result(tmp_path, key, 100)
+        edit_cache.store(key, result)
+        # Só a entrada do cache fica: o áudio do catálogo foi excluído
+        os.remove(result)
+    edit_cache._last_used.update({'antigo': 1.0, 'medio': 2.0, 'recente': 3.0})
+
+    edit_cache.evict(max_bytes=150)
+
+    assert sorted(path.stem for path in cache_dir.glob('*.mp3')) == ['recente']
+    assert edit_cache.stats()['removidos'] == 2
+
+def test_evict_keeps_results_still_used_by_the_catalog(tmp_path, cache_dir):
+    in_use = make_result(tmp_path, 'em_uso', 100)
+    edit_cache.store('em_uso', in_use)
+    orphan = make_result(tmp_path, 'orfao', 100)
+    edit_cache.store('orfao', orphan)
+    os.remove(orphan)
+    edit_cache._last_used.update({'em_uso': 1.0, 'orfao': 2.0})
+
+    edit_cache.evict(max_bytes=0)
+
+    # O link extra do resultado em uso não ocupa espaço e não conta para o limite
+    assert edit_cache.cache_path('em_uso').exists()
+    assert not edit_cache.cache_path('orfao').exists()
+    assert in_use.exists()
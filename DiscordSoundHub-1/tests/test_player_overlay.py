@@ -0,0 +1,107 @@
+import asyncio
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+import audio_sources
+import database
+import search
+import transcoder
+import utils
+from cogs import player as player_module
+
+FRAME = b'\x01\x00' * (audio_sources.FRAME_SIZE // 2)
+
+class FakeEncoder:
+    SAMPLES_PER_FRAME = 960
+
+    def encode(self, pcm, frame_size):
+        return b'opus'
+
+class FakeDecoder:
+    def decode(self, packet):
+        return FRAME
+
+class PassthroughSource(discord.AudioSource):
+    """Versão pré-codificada tocando em Opus direto"""
+
+    def read(self):
+        return b'packet'
+
+    def is_opus(self):
+        return True
+
+class PCMSource(discord.AudioSource):
+    def read(self):
+        return FRAME
+
+class FakeVoiceClient:
+    """Imita o VoiceClient depois de play() com uma fonte Opus: sem codificador"""
+
+    def __init__(self, source):
+        self.source = source
+        self.encoder = discord.utils.MISSING
+        self.sent = []
+
+    def is_playing(self):
+        return True
+
+    def send_audio_packet(self, data, *, encode=True):
+        # Mesmo caminho do VoiceClient do discord.py
+        if encode:
+            data = self.encoder.encode(data, self.encoder.SAMPLES_PER_FRAME)
+        self.sent.append(data)
+
+class FakeContext:
+    def __init__(self):
+        self.guild = SimpleNamespace(id=1)
+        self.messages = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append(content)
+
+@pytest.fixture
+def overlay_player(monkeypatch, tmp_path):
+    monkeypatch.setattr(discord.opus, 'Encoder', FakeEncoder)
+    monkeypatch.setattr(discord.opus, 'Decoder', FakeDecoder)
+    monkeypatch.setattr(search, 'current_index', lambda: None)
+    monkeypatch.setattr(transcoder, 'schedule_catalog', lambda: None)
+
+    clip = tmp_path / 'clip.mp3'
+    clip.write_bytes(b'mp3')
+    monkeypatch.setattr(database, 'get_audio_by_name', lambda name: {'nome': name, 'caminho': str(clip), 'emoji': None})
+
+    voice_client = FakeVoiceClient(PassthroughSource())
+
+    async def ensure_voice_client(ctx):
+        return voice_client
+    monkeypatch.setattr(utils, 'ensure_voice_client', ensure_voice_client)
+
+    cog = player_module.Player(bot=None)
+    monkeypatch.setattr(cog, '_create_audio_source', lambda audio, options, volume=1.0: PCMSource())
+    return cog, voice_client
+
+def test_overlay_on_passthrough_source_creates_encoder(overlay_player):
+    cog, voice_client = overlay_player
+    ctx = FakeContext()
+
+    asyncio.run(cog.play_overlay(ctx, 'clip'))
+
+    assert isinstance(voice_client.source, audio_sources.MixerSource)
+    assert voice_client.source.voice_count == 2
+    assert isinstance(voice_client.encoder, FakeEncoder)
+
+    # Próximo quadro do AudioPlayer: a mistura é PCM e precisa ser codificada
+    source = voice_client.source
+    voice_client.send_audio_packet(source.read(), encode=not source.is_opus())
+    assert voice_client.sent == [b'opus']
+
+def test_overlay_keeps_existing_encoder(overlay_player):
+    cog, voice_client = overlay_player
+    encoder = FakeEncoder()
+    voice_client.encoder = encoder
+
+    asyncio.run(cog.play_overlay(FakeContext(), 'clip'))
+
+    assert voice_client.encoder is encoder
@@ -0,0 +1,53 @@
+import pytest
+
+import search
+
+NAMES = ['EITA_GLORIA', 'cabeça-de-gelo', 'eita', 'bom dia', 'risada', 'risadinha', 'Trombeta']
+
+@pytest.fixture
+def index():
+    return search.SearchIndex(NAMES)
+
+
+def test_normalize():
+    assert search.normalize('EITA_GLORIA') == 'eita gloria'
+    assert search.normalize(' cabeça-de-gelo ') == 'cabeca de gelo'
+
+def test_duplicate_names_are_indexed_once():
+    assert len(search.SearchIndex(['a', 'a', 'b'])) == 2
+
+def test_prefix_matches_whole_name_before_words(index):
+    assert index.prefix('ei') == ['eita', 'EITA_GLORIA']
+
+def test_prefix_matches_any_word(index):
+    assert index.prefix('gel') == ['cabeça-de-gelo']
+    assert index.prefix('dia') == ['bom dia']
+
+def test_prefix_ignores_case_and_accents(index):
+    assert index.prefix('CABECA') == ['cabeça-de-gelo']
+
+def test_prefix_respects_limit(index):
+    assert index.prefix('', limit=3) == ['bom dia', 'cabeça-de-gelo', 'eita']
+    assert index.prefix('risad', limit=1) == ['risada']
+
+def test_search_ranks_exact_then_prefix(index):
+    assert index.search('eita') == [('eita', 1.0), ('EITA_GLORIA', 0.9)]
+
+def test_search_finds_typos_by_trigrams(index):
+    results = index.search('trombta')
+    assert results[0][0] == 'Trombeta'
+    assert search.MIN_SCORE <= results[0][1] <= 0.75
+
+    assert [name for name, _ in index.search('rizada')][0] == 'risada'
+
+def test_search_without_similar_names(index):
+    assert index.search('xyzw') == []
+    assert index.search('   ') == []
+
+def test_fuzzy_search_is_bounded_by_postings_budget(monkeypatch):
+    names = [f'som {i:05d}' for i in range(2000)] + ['trombeta']
+    monkeypatch.setattr(search, 'POSTINGS_BUDGET', 50)
+    index = search.SearchIndex(names)
+
+    # O trigrama mais raro ('tro', 'rom'...) é percorrido primeiro
+    assert index.search('trombta', limit=1)[0][0] == 'trombeta'
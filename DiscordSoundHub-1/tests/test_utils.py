@@ -0,0 +1,33 @@
+import pytest
+
+import utils
+
+
+def test_parse_edit_operations_chain():
+    tokens = ['CORTAR', '0:01', '0:04', 'velocidade', '1.5', 'inverter', 'fadeout', '0.5']
+
+    assert utils.parse_edit_operations(tokens) == [
+        ('cortar', 1000, 4000),
+        ('velocidade', 1.5),
+        ('inverter',),
+        ('fadeout', 500)
+    ]
+
+@pytest.mark.parametrize('tokens, message', [
+    ([], "Nenhuma operação informada"),
+    (['girar'], "Operação desconhecida: 'girar'"),
+    (['cortar', '0:01'], "A operação 'cortar' precisa de 2 valor(es)"),
+    (['inverter', 'velocidade'], "A operação 'velocidade' precisa de 1 valor(es)"),
+    (['cortar', 'a', 'b'], "Tempo inválido em 'cortar a b'"),
+    (['cortar', '0:05', '0:01'], "O tempo inicial deve ser menor que o tempo final"),
+    (['cortar', '0:05', '0:05'], "O tempo inicial deve ser menor que o tempo final"),
+    (['velocidade', 'x'], "Fator de velocidade inválido"),
+    (['velocidade', '0'], "O fator de velocidade deve ser maior que zero"),
+    (['fadein', '-1'], "A duração do fadein deve ser maior que zero"),
+    (['fadeout', 'rápido'], "Duração do fadeout inválido"),
+    (['inverter'] * (utils.MAX_EDIT_OPERATIONS + 1), f"Máximo de {utils.MAX_EDIT_OPERATIONS} operações"),
+])
+def test_parse_edit_operations_errors(tokens, message):
+    with pytest.raises(ValueError) as error:
+        utils.parse_edit_operations(tokens)
+    assert message in str(error.value)
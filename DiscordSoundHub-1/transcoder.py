@@ -0,0 +1,219 @@
+import os
+import re
+import math
+import hashlib
+import logging
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import database
+
+# Configuração do logger
+logger = logging.getLogger('discord_bot.transcoder')
+
+# Diretório das versões Ogg/Opus pré-codificadas
+OPUS_CACHE_DIR = Path('audios/cache/opus')
+
+# Volume aplicado na reprodução (o mesmo do antigo PCMVolumeTransformer)
+PLAYBACK_VOLUME = 0.5
+
+# Bitrate das versões Opus (o Discord usa 64-128 kbps nos canais de voz)
+OPUS_BITRATE = '96k'
+
+# Loudness integrado (EBU R128) para o qual os clipes são normalizados
+TARGET_LUFS = float(os.environ.get('AUDIO_TARGET_LUFS', '-16'))
+
+# Limites do ganho de normalização (cerca de -12 dB a +12 dB)
+MIN_NORMALIZATION = 0.25
+MAX_NORMALIZATION = 4.0
+
+# Abaixo disso o clipe é considerado silêncio e não é normalizado
+SILENCE_LUFS = -70.0
+
+# Transcodificações simultâneas em segundo plano
+MAX_WORKERS = int(os.environ.get('TRANSCODER_WORKERS', '2'))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='transcoder')
+_pending = set()
+_pending_lock = threading.Lock()
+
+def normalization_gain(audio):
+    """Ganho que leva o clipe ao loudness alvo, sem passar de 0 dBFS no pico"""
+    lufs = audio.get('loudness_lufs')
+    if lufs is None or lufs <= SILENCE_LUFS:
+        return 1.0
+    gain_db = TARGET_LUFS - lufs
+    peak = audio.get('pico_dbfs')
+    if peak is not None:
+        gain_db = min(gain_db, -peak)
+    return min(MAX_NORMALIZATION, max(MIN_NORMALIZATION, 10 ** (gain_db / 20)))
+
+def playback_gain(audio):
+    """Ganho gravado na versão Opus de um áudio: volume padrão × normalização × ganho do clipe"""
+    return PLAYBACK_VOLUME * normalization_gain(audio) * float(audio.get('ganho', 1.0))
+
+def _parse_ebur128_value(summary, label, unit):
+    match = re.search(rf'{label}:\s+(-?inf|-?[\d.]+) {unit}', summary)
+    if not match:
+        return None
+    value = float(match.group(1))
+    return value if math.isfinite(value) else None
+
+def analyze_loudness(caminho):
+    """Mede o loudness integrado (LUFS) e o pico (dBFS) de um arquivo com o filtro ebur128"""
+    command = [
+        "ffmpeg", "-nostdin", "-hide_banner", "-nostats",
+        "-i", str(caminho),
+        "-vn", "-af", "ebur128=peak=sample",
+        "-f", "null", "-"
+    ]
+    process = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0 or 'Summary:' not in process.stderr:
+        logger.error(f"Erro FFmpeg ao analisar loudness de {caminho}: {process.stderr[-500:]}")
+        return False, process.stderr
+
+    # Usar apenas o resumo final, não as medições de cada trecho
+    summary = process.stderr.rsplit('Summary:', 1)[1]
+    lufs = _parse_ebur128_value(summary, 'I', 'LUFS')
+    if lufs is None:
+        return False, "Loudness integrado não encontrado na saída do FFmpeg"
+    return True, {
+        'loudness_lufs': round(lufs, 2),
+        'pico_dbfs': _parse_ebur128_value(summary, 'Peak', 'dBFS')
+    }
+
+def sidecar_path(caminho, ganho=PLAYBACK_VOLUME):
+    """Caminho da versão Opus de um arquivo de áudio.
+
+    A chave inclui mtime e tamanho do original e o ganho aplicado, de forma
+    que um arquivo substituído nunca reaproveita uma versão antiga.
+    """
+    st = os.stat(caminho)
+    key = f"{os.path.abspath(caminho)}|{st.st_mtime_ns}|{st.st_size}|{ganho:.4f}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return OPUS_CACHE_DIR / f"{digest}.ogg"
+
+def get_sidecar(caminho, ganho=PLAYBACK_VOLUME):
+    """Retorna o caminho da versão Opus pronta ou None"""
+    try:
+        path = sidecar_path(caminho, ganho)
+    except OSError:
+        return None
+    return path if path.exists() else None
+
+def transcode(caminho, ganho=PLAYBACK_VOLUME):
+    """Gera a versão Ogg/Opus (48 kHz, estéreo, quadros de 20 ms) de um arquivo"""
+    output_path = sidecar_path(caminho, ganho)
+    if output_path.exists():
+        return True, output_path
+
+    OPUS_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix('.tmp.ogg')
+    command = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "error",
+        "-i", str(caminho),
+        "-vn", "-af", f"volume={ganho}",
+        "-ac", "2", "-ar", "48000",
+        "-c:a", "libopus", "-b:a", OPUS_BITRATE,
+        "-application", "audio", "-frame_duration", "20",
+        "-f", "ogg", str(tmp_path)
+    ]
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        logger.error(f"Erro FFmpeg ao gerar Opus de {caminho}: {process.stderr}")
+        return False, process.stderr
+
+    os.replace(tmp_path, output_path)
+    logger.info(f"Versão Opus gerada para {caminho}: {output_path}")
+    return True, output_path
+
+def _run(caminho, ganho, key):
+    try:
+        return transcode(caminho, ganho)
+    except Exception as e:
+        logger.error(f"Erro ao transcodificar {caminho}: {e}")
+        return False, str(e)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+def schedule(caminho, ganho=PLAYBACK_VOLUME):
+    """Agenda a geração da versão Opus em segundo plano (sem duplicar tarefas)"""
+    if shutil.which('ffmpeg') is None:
+        return None
+    try:
+        if sidecar_path(caminho, ganho).exists():
+            return None
+    except OSError:
+        return None
+
+    key = (str(caminho), ganho)
+    with _pending_lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+    return _executor.submit(_run, str(caminho), ganho, key)
+
+def _ingest(audio, key):
+    """Analisa o loudness, grava o resultado no catálogo e gera a versão Opus"""
+    try:
+        success, result = analyze_loudness(audio['caminho'])
+        if success:
+            updated, message = database.update_audio(audio['nome'], result)
+            if updated:
+                audio = dict(audio, **result)
+                logger.info(f"Loudness de '{audio['nome']}': {result['loudness_lufs']} LUFS")
+            else:
+                logger.warning(f"Não foi possível gravar o loudness de '{audio['nome']}': {message}")
+        return transcode(audio['caminho'], playback_gain(audio))
+    except Exception as e:
+        logger.error(f"Erro ao processar {audio['caminho']}: {e}")
+        return False, str(e)
+    finally:
+        with _pending_lock:
+            _pending.discard(key)
+
+def schedule_ingest(audio):
+    """Agenda a análise de loudness e a versão Opus de um áudio recém-adicionado.
+
+    Roda no pool de segundo plano; quem faz o upload não espera a análise.
+    Um áudio que já chega com loudness (ex.: duplicata de outro) só tem a
+    versão Opus agendada, que também é pulada se já existir.
+    """
+    if shutil.which('ffmpeg') is None:
+        return None
+    if 'loudness_lufs' in audio:
+        return schedule(audio['caminho'], playback_gain(audio))
+
+    key = ('ingest', str(audio['caminho']))
+    with _pending_lock:
+        if key in _pending:
+            return None
+        _pending.add(key)
+    return _executor.submit(_ingest, dict(audio), key)
+
+def schedule_catalog():
+    """Agenda versões Opus para todo o catálogo e remove as que ficaram órfãs.
+
+    Áudios ainda sem análise de loudness são analisados antes da geração.
+    """
+    wanted = set()
+    for audio in database.get_all_audios():
+        ganho = playback_gain(audio)
+        try:
+            wanted.add(sidecar_path(audio['caminho'], ganho).name)
+        except OSError:
+            continue
+        if 'loudness_lufs' in audio:
+            schedule(audio['caminho'], ganho)
+        else:
+            schedule_ingest(audio)
+
+    if OPUS_CACHE_DIR.exists():
+        for path in OPUS_CACHE_DIR.glob('*.ogg'):
+            if path.name not in wanted and not path.name.endswith('.tmp.ogg'):
+                path.unlink(missing_ok=True)
@@ -1,11 +1,20 @@
+import io
 import os
 import re
+import json
+import hashlib
 import logging
+import subprocess
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from pydub import AudioSegment
 import tempfile
-import asyncio
 import discord
+from discord import app_commands
+import database
+import search
+import voice_manager
 
 # Configuração do logger
 logger = logging.getLogger('discord_bot.utils')
@@ -49,8 +58,187 @@ def get_audio_paths():
     edited_dir = Path('audios/editados')
     return originals_dir, edited_dir
 
+# Metadados já lidos, por (caminho, mtime, tamanho)
+PROBE_CACHE_SIZE = 1024
+_probe_cache = OrderedDict()
+_probe_lock = threading.Lock()
+
+def _int_or_none(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+def probe_audio(file_path):
+    """Lê os metadados de um arquivo de áudio a partir dos cabeçalhos, via ffprobe.
+
+    Retorna {'duracao' (ms), 'taxa_amostragem', 'canais', 'bitrate', 'codec'}
+    ou None se o arquivo não puder ser lido. O resultado fica em cache até o
+    arquivo mudar (mtime ou tamanho).
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+    
+    with _probe_lock:
+        cached = _probe_cache.get(key)
+        if cached is not None:
+            _probe_cache.move_to_end(key)
+            return dict(cached)
+    
+    command = [
+        "ffprobe", "-v", "error", "-select_streams", "a:0",
+        "-show_entries", "format=duration,bit_rate:stream=codec_name,sample_rate,channels,duration,bit_rate",
+        "-of", "json", str(file_path)
+    ]
+    try:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    except OSError as e:
+        logger.error(f"ffprobe indisponível: {e}")
+        return None
+    if process.returncode != 0:
+        logger.error(f"Erro ffprobe em {file_path}: {process.stderr}")
+        return None
+    
+    data = json.loads(process.stdout or '{}')
+    streams = data.get('streams') or []
+    if not streams:
+        return None
+    stream = streams[0]
+    container = data.get('format', {})
+    
+    # A duração do fluxo é mais precisa; alguns formatos só informam a do contêiner
+    duration = stream.get('duration', container.get('duration'))
+    try:
+        duration_ms = round(float(duration) * 1000)
+    except (TypeError, ValueError):
+        duration_ms = None
+    
+    metadata = {
+        'duracao': duration_ms,
+        'taxa_amostragem': _int_or_none(stream.get('sample_rate')),
+        'canais': _int_or_none(stream.get('channels')),
+        'bitrate': _int_or_none(stream.get('bit_rate', container.get('bit_rate'))),
+        'codec': stream.get('codec_name')
+    }
+    
+    with _probe_lock:
+        _probe_cache[key] = metadata
+        while len(_probe_cache) > PROBE_CACHE_SIZE:
+            _probe_cache.popitem(last=False)
+    return dict(metadata)
+
+# Hashes já calculados, por (caminho, mtime, tamanho)
+HASH_CACHE_SIZE = 1024
+_hash_cache = OrderedDict()
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """SHA-256 (hex) do conteúdo de um arquivo, lido em blocos.
+
+    O resultado fica em cache enquanto o arquivo não mudar (mesmo mtime e
+    tamanho), como em probe_audio.
+    """
+    st = os.stat(file_path)
+    key = (os.path.abspath(file_path), st.st_mtime_ns, st.st_size)
+    with _probe_lock:
+        cached = _hash_cache.get(key)
+        if cached is not None:
+            _hash_cache.move_to_end(key)
+            return cached
+    
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    
+    with _probe_lock:
+        _hash_cache[key] = digest.hexdigest()
+        while len(_hash_cache) > HASH_CACHE_SIZE:
+            _hash_cache.popitem(last=False)
+    return digest.hexdigest()
+
+# Tamanho máximo de um arquivo enviado (bot e site)
+UPLOAD_MAX_MB = float(os.environ.get('UPLOAD_MAX_MB', '100'))
+UPLOAD_MAX_BYTES = int(UPLOAD_MAX_MB * 1024 * 1024)
+
+class HashingWriter(io.BufferedIOBase):
+    """Arquivo de escrita que calcula o SHA-256 do conteúdo enquanto ele é salvo.
+
+    Aceito por attachment.save (discord.py, com seek_begin=False) e por
+    FileStorage.save (Flask), evitando reler o arquivo para calcular o hash.
+    Com `max_bytes`, levanta ValueError assim que o limite é ultrapassado.
+    """
+
+    def __init__(self, fp, max_bytes=None):
+        self.fp = fp
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.max_bytes = max_bytes
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise ValueError(f"O arquivo excede o limite de {self.max_bytes / 1024 / 1024:.0f} MB")
+        self.digest.update(data)
+        return self.fp.write(data)
+
+    def flush(self):
+        self.fp.flush()
+
+    def hexdigest(self):
+        return self.digest.hexdigest()
+
+# Campos reaproveitados de um áudio com o mesmo conteúdo
+SHARED_CONTENT_FIELDS = ('caminho', 'duracao', 'loudness_lufs', 'pico_dbfs')
+
+def reuse_duplicate(file_path, sha256):
+    """Reaproveita o arquivo de um áudio já cadastrado com o mesmo conteúdo.
+
+    Se houver um, o arquivo recém-salvo é apagado e são retornados
+    (nome do áudio existente, campos a copiar para o novo registro); o
+    arquivo passa a ser compartilhado e só é apagado quando o último áudio
+    que o usa for excluído. Caso contrário retorna (None, {}).
+    """
+    existing = database.get_audio_by_hash(sha256)
+    if not existing or not os.path.isfile(existing['caminho']):
+        return None, {}
+    if os.path.abspath(existing['caminho']) == os.path.abspath(file_path):
+        return None, {}
+    
+    os.remove(file_path)
+    shared = {field: existing[field] for field in SHARED_CONTENT_FIELDS if field in existing}
+    logger.info(f"Conteúdo de {file_path} já existe em '{existing['nome']}', reaproveitando {existing['caminho']}")
+    return existing['nome'], shared
+
+def release_audio_file(caminho):
+    """Apaga o arquivo de um áudio removido do catálogo, se nenhum outro áudio o usar.
+
+    Retorna True se o arquivo foi apagado.
+    """
+    if database.count_references(caminho) > 0:
+        return False
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    return True
+
 def get_audio_duration(file_path):
-    """Obtém a duração de um arquivo de áudio em milissegundos"""
+    """Obtém a duração de um arquivo de áudio em milissegundos.
+
+    Lê a duração dos cabeçalhos com probe_audio; só decodifica o arquivo
+    inteiro se o contêiner não informar a duração.
+    """
+    metadata = probe_audio(file_path)
+    if metadata and metadata['duracao'] is not None:
+        return metadata['duracao']
+    
     try:
         audio = AudioSegment.from_file(file_path)
         return len(audio)
@@ -58,50 +246,295 @@ def get_audio_duration(file_path):
         logger.error(f"Erro ao obter duração do áudio {file_path}: {e}")
         return 0
 
-def cut_audio(input_path, output_path, start_time, end_time):
-    """Corta um trecho de um arquivo de áudio e salva no caminho de saída"""
+# Amostras por quadro MP3 (MPEG-1 Layer III)
+MP3_FRAME_SAMPLES = 1152
+
+# Distância máxima (ms) de uma borda de quadro para cortar sem recodificar
+FRAME_ALIGN_TOLERANCE_MS = 1.0
+
+def _is_frame_aligned(time_ms, sample_rate):
+    frame_ms = MP3_FRAME_SAMPLES * 1000 / sample_rate
+    offset = time_ms % frame_ms
+    return min(offset, frame_ms - offset) <= FRAME_ALIGN_TOLERANCE_MS
+
+def _atempo_chain(speed_factor):
+    """Filtros atempo para um fator qualquer (cada instância aceita de 0.5 a 2.0)"""
+    filters = []
+    while speed_factor > 2.0:
+        filters.append("atempo=2.0")
+        speed_factor /= 2.0
+    while speed_factor < 0.5:
+        filters.append("atempo=0.5")
+        speed_factor /= 0.5
+    filters.append(f"atempo={speed_factor:.6g}")
+    return ",".join(filters)
+
+def build_cut_command(input_path, output_path, start_time, end_time):
+    """Monta o comando FFmpeg de corte; retorna (comando, duração esperada em ms).
+
+    O FFmpeg busca o início do trecho antes de abrir a entrada (-ss/-t no
+    lado da entrada), então só o trecho cortado é lido. Se entrada e saída
+    forem MP3 e os tempos caírem em bordas de quadro, os quadros são
+    copiados sem recodificar; caso contrário apenas o trecho é recodificado.
+    """
+    # Converter tempos para milissegundos se forem strings
+    if isinstance(start_time, str):
+        start_time = parse_time(start_time)
+    if isinstance(end_time, str):
+        end_time = parse_time(end_time)
+    
+    # Verificar limites
+    if start_time < 0:
+        start_time = 0
+    if start_time >= end_time:
+        raise ValueError("O tempo inicial deve ser menor que o tempo final")
+    
+    metadata = probe_audio(input_path) or {}
+    if metadata.get('duracao') is not None:
+        if start_time >= metadata['duracao']:
+            raise ValueError("O tempo inicial é maior que a duração do áudio")
+        end_time = min(end_time, metadata['duracao'])
+    
+    sample_rate = metadata.get('taxa_amostragem')
+    stream_copy = (
+        metadata.get('codec') == 'mp3'
+        and str(output_path).lower().endswith('.mp3')
+        and sample_rate is not None
+        and _is_frame_aligned(start_time, sample_rate)
+        and _is_frame_aligned(end_time, sample_rate)
+    )
+    
+    command = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "warning",
+        "-ss", f"{start_time / 1000:.3f}",
+        "-t", f"{(end_time - start_time) / 1000:.3f}",
+        "-i", str(input_path),
+        "-vn", "-map", "0:a:0"
+    ]
+    command += ["-c:a", "copy"] if stream_copy else ["-c:a", "libmp3lame"]
+    command.append(str(output_path))
+    return command, end_time - start_time
+
+def build_reverse_command(input_path, output_path):
+    """Monta o comando FFmpeg de inversão; retorna (comando, duração esperada em ms)"""
+    metadata = probe_audio(input_path) or {}
+    command = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "warning",
+        "-i", str(input_path),
+        "-vn", "-map", "0:a:0", "-af", "areverse",
+        "-c:a", "libmp3lame", str(output_path)
+    ]
+    return command, metadata.get('duracao')
+
+def build_speed_command(input_path, output_path, speed_factor):
+    """Monta o comando FFmpeg de mudança de velocidade; retorna (comando, duração esperada em ms)"""
+    # Converter para float se for string
+    if isinstance(speed_factor, str):
+        speed_factor = float(speed_factor)
+    
+    # Verificar limites do fator de velocidade
+    if speed_factor <= 0:
+        raise ValueError("O fator de velocidade deve ser maior que zero")
+    
+    metadata = probe_audio(input_path) or {}
+    command = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "warning",
+        "-i", str(input_path),
+        "-vn", "-map", "0:a:0", "-filter:a", _atempo_chain(speed_factor),
+        str(output_path)
+    ]
+    duration = metadata.get('duracao')
+    return command, round(duration / speed_factor) if duration else None
+
+def build_mp3_command(input_path, output_path):
+    """Monta o comando FFmpeg que converte um arquivo enviado para MP3; retorna (comando, duração esperada em ms).
+
+    Um MP3 é apenas copiado (remuxado), sem recodificar.
+    """
+    metadata = probe_audio(input_path)
+    if metadata is None:
+        raise ValueError("O arquivo enviado não contém áudio reconhecível")
+    
+    command = [
+        "ffmpeg", "-y", "-nostdin", "-loglevel", "warning",
+        "-i", str(input_path),
+        "-vn", "-map", "0:a:0"
+    ]
+    command += ["-c:a", "copy"] if metadata.get('codec') == 'mp3' else ["-c:a", "libmp3lame", "-q:a", "2"]
+    command.append(str(output_path))
+    return command, metadata.get('duracao')
+
+def convert_to_mp3(input_path, output_path):
+    """Converte um arquivo enviado para MP3 com o FFmpeg, sem decodificá-lo na memória do Python"""
     try:
-        # Converter tempos para milissegundos se forem strings
-        if isinstance(start_time, str):
-            start_time = parse_time(start_time)
-        if isinstance(end_time, str):
-            end_time = parse_time(end_time)
-            
-        # Carregar o áudio
-        audio = AudioSegment.from_file(input_path)
-        
-        # Verificar limites
-        if start_time < 0:
-            start_time = 0
-        if end_time > len(audio):
-            end_time = len(audio)
-        if start_time >= end_time:
-            raise ValueError("O tempo inicial deve ser menor que o tempo final")
-        
-        # Cortar o áudio
-        audio_cut = audio[start_time:end_time]
+        command, _ = build_mp3_command(input_path, output_path)
+        return run_ffmpeg(command, output_path)
+    except Exception as e:
+        logger.error(f"Erro ao converter {input_path} para MP3: {e}")
+        return False, str(e)
+
+# Operações aceitas em uma edição encadeada e quantos valores cada uma recebe
+EDIT_OPERATIONS = {'cortar': 2, 'velocidade': 1, 'inverter': 0, 'fadein': 1, 'fadeout': 1}
+
+# Limite de operações em uma única edição
+MAX_EDIT_OPERATIONS = 20
+
+def _parse_number(value, description):
+    try:
+        return float(value.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"{description} inválido: '{value}'")
+
+def parse_edit_operations(tokens):
+    """Converte palavras como `cortar 0:01 0:04 velocidade 1.5 inverter` em operações.
+
+    Retorna uma lista de tuplas (operação, *valores), com tempos em ms:
+    [('cortar', 1000, 4000), ('velocidade', 1.5), ('inverter',)]
+    """
+    operations = []
+    position = 0
+    while position < len(tokens):
+        name = tokens[position].lower()
+        if name not in EDIT_OPERATIONS:
+            raise ValueError(f"Operação desconhecida: '{tokens[position]}'. Use: {', '.join(EDIT_OPERATIONS)}")
         
-        # Salvar o áudio cortado
-        audio_cut.export(output_path, format="mp3")
+        count = EDIT_OPERATIONS[name]
+        args = tokens[position + 1:position + 1 + count]
+        if len(args) < count:
+            raise ValueError(f"A operação '{name}' precisa de {count} valor(es)")
+        position += 1 + count
         
-        return True, output_path
+        if name == 'cortar':
+            try:
+                start_ms, end_ms = parse_time(args[0]), parse_time(args[1])
+            except ValueError:
+                raise ValueError(f"Tempo inválido em 'cortar {args[0]} {args[1]}'. Use HH:MM:SS, MM:SS ou SS")
+            if start_ms >= end_ms:
+                raise ValueError("O tempo inicial deve ser menor que o tempo final")
+            operations.append((name, start_ms, end_ms))
+        elif name == 'velocidade':
+            speed_factor = _parse_number(args[0], "Fator de velocidade")
+            if speed_factor <= 0:
+                raise ValueError("O fator de velocidade deve ser maior que zero")
+            operations.append((name, speed_factor))
+        elif name in ('fadein', 'fadeout'):
+            fade_ms = round(_parse_number(args[0], f"Duração do {name}") * 1000)
+            if fade_ms <= 0:
+                raise ValueError(f"A duração do {name} deve ser maior que zero")
+            operations.append((name, fade_ms))
+        else:
+            operations.append((name,))
+    
+    if not operations:
+        raise ValueError(f"Nenhuma operação informada. Use: {', '.join(EDIT_OPERATIONS)}")
+    if len(operations) > MAX_EDIT_OPERATIONS:
+        raise ValueError(f"Máximo de {MAX_EDIT_OPERATIONS} operações por edição")
+    return operations
+
+def describe_edit_operations(operations):
+    """Descrição legível de uma lista de operações"""
+    parts = []
+    for operation in operations:
+        name = operation[0]
+        if name == 'cortar':
+            parts.append(f"cortar {format_duration(operation[1])}–{format_duration(operation[2])}")
+        elif name == 'velocidade':
+            parts.append(f"velocidade {operation[1]:g}x")
+        elif name in ('fadein', 'fadeout'):
+            parts.append(f"{name} {operation[1] / 1000:g} s")
+        else:
+            parts.append(name)
+    return " → ".join(parts)
+
+def build_edit_command(input_path, output_path, operations):
+    """Monta um único comando FFmpeg para uma cadeia de operações; retorna (comando, duração esperada em ms).
+
+    As operações viram um filtergraph (atrim, atempo, areverse, afade)
+    aplicado em uma só decodificação e codificação, sem arquivos
+    intermediários. Um corte no início da cadeia é feito na entrada
+    (-ss/-t), como em build_cut_command.
+    """
+    operations = list(operations)
+    if len(operations) == 1 and operations[0][0] == 'cortar':
+        # Corte simples: pode copiar os quadros sem recodificar
+        return build_cut_command(input_path, output_path, operations[0][1], operations[0][2])
+    
+    metadata = probe_audio(input_path) or {}
+    duration = metadata.get('duracao')
+    
+    def clamp_cut(start_ms, end_ms):
+        if duration is None:
+            return start_ms, end_ms
+        if start_ms >= duration:
+            raise ValueError("O tempo inicial do corte é maior que a duração do áudio")
+        return start_ms, min(end_ms, duration)
+    
+    input_args = []
+    if operations and operations[0][0] == 'cortar':
+        start_ms, end_ms = clamp_cut(*operations.pop(0)[1:])
+        input_args = ["-ss", f"{start_ms / 1000:.3f}", "-t", f"{(end_ms - start_ms) / 1000:.3f}"]
+        duration = end_ms - start_ms
+    
+    filters = []
+    for operation in operations:
+        name = operation[0]
+        if name == 'cortar':
+            # Tempos relativos ao resultado das operações anteriores
+            start_ms, end_ms = clamp_cut(*operation[1:])
+            filters.append(f"atrim=start={start_ms / 1000:.3f}:end={end_ms / 1000:.3f},asetpts=PTS-STARTPTS")
+            duration = end_ms - start_ms
+        elif name == 'velocidade':
+            filters.append(_atempo_chain(operation[1]))
+            if duration is not None:
+                duration = round(duration / operation[1])
+        elif name == 'inverter':
+            filters.append("areverse")
+        elif name == 'fadein':
+            fade_ms = min(operation[1], duration) if duration is not None else operation[1]
+            filters.append(f"afade=t=in:st=0:d={fade_ms / 1000:.3f}")
+        elif name == 'fadeout':
+            if duration is None:
+                raise ValueError("Não foi possível ler a duração do áudio para aplicar o fadeout")
+            fade_ms = min(operation[1], duration)
+            filters.append(f"afade=t=out:st={(duration - fade_ms) / 1000:.3f}:d={fade_ms / 1000:.3f}")
+    
+    command = ["ffmpeg", "-y", "-nostdin", "-loglevel", "warning"] + input_args + [
+        "-i", str(input_path),
+        "-vn", "-map", "0:a:0"
+    ]
+    if filters:
+        command += ["-af", ",".join(filters)]
+    command += ["-c:a", "libmp3lame", str(output_path)]
+    return command, duration
+
+def run_ffmpeg(command, output_path):
+    """Executa um comando FFmpeg de edição de forma síncrona"""
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0:
+        logger.error(f"Erro FFmpeg: {process.stderr}")
+        return False, f"Erro ao processar áudio: {process.stderr}"
+    
+    # Um início depois do fim do arquivo gera uma saída vazia
+    if "Output file is empty" in process.stderr:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False, "O áudio resultante ficou vazio"
+    return True, output_path
+
+def cut_audio(input_path, output_path, start_time, end_time):
+    """Corta um trecho de um arquivo de áudio e salva no caminho de saída (versão síncrona)"""
+    try:
+        command, _ = build_cut_command(input_path, output_path, start_time, end_time)
+        return run_ffmpeg(command, output_path)
     except Exception as e:
         logger.error(f"Erro ao cortar áudio: {e}")
         return False, str(e)
 
 def reverse_audio(input_path, output_path):
-    """Inverte um arquivo de áudio"""
+    """Inverte um arquivo de áudio (versão síncrona)"""
     try:
-        # Carregar o áudio
-        audio = AudioSegment.from_file(input_path)
-        
-        # Inverter o áudio
-        audio_reversed = audio.reverse()
-        
-        # Salvar o áudio invertido
-        audio_reversed.export(output_path, format="mp3")
-        
-        return True, output_path
+        command, _ = build_reverse_command(input_path, output_path)
+        return run_ffmpeg(command, output_path)
     except Exception as e:
         logger.error(f"Erro ao inverter áudio: {e}")
         return False, str(e)
@@ -109,159 +542,32 @@ def reverse_audio(input_path, output_path):
 def change_speed(input_path, output_path, speed_factor):
     """Altera a velocidade de um arquivo de áudio (versão síncrona para uso web)"""
     try:
-        # Converter para float se for string
-        if isinstance(speed_factor, str):
-            speed_factor = float(speed_factor)
-        
-        # Verificar limites do fator de velocidade
-        if speed_factor <= 0:
-            raise ValueError("O fator de velocidade deve ser maior que zero")
-        
-        # Como o pydub não tem um método direto para alterar a velocidade,
-        # usamos FFmpeg diretamente via subprocess
-        import subprocess
-        
-        command = [
-            "ffmpeg", "-y",
-            "-i", input_path,
-            "-filter:a", f"atempo={speed_factor}",
-            "-vn", output_path
-        ]
-        
-        # Executar o comando de forma síncrona
-        process = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True
-        )
-        
-        if process.returncode != 0:
-            logger.error(f"Erro FFmpeg: {process.stderr}")
-            return False, f"Erro ao processar áudio: {process.stderr}"
-        
-        return True, output_path
-    except Exception as e:
-        logger.error(f"Erro ao alterar velocidade do áudio: {e}")
-        return False, str(e)
-
-# Versão assíncrona para uso no Discord
-async def change_speed_async(input_path, output_path, speed_factor):
-    """Altera a velocidade de um arquivo de áudio (versão assíncrona para uso no Discord)"""
-    try:
-        # Converter para float se for string
-        if isinstance(speed_factor, str):
-            speed_factor = float(speed_factor)
-        
-        # Verificar limites do fator de velocidade
-        if speed_factor <= 0:
-            raise ValueError("O fator de velocidade deve ser maior que zero")
-        
-        # Como o pydub não tem um método direto para alterar a velocidade,
-        # usamos FFmpeg diretamente via subprocess
-        command = [
-            "ffmpeg", "-y",
-            "-i", input_path,
-            "-filter:a", f"atempo={speed_factor}",
-            "-vn", output_path
-        ]
-        
-        # Executar o comando
-        process = await asyncio.create_subprocess_exec(
-            *command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        # Aguardar a conclusão do processo
-        stdout, stderr = await process.communicate()
-        
-        if process.returncode != 0:
-            logger.error(f"Erro FFmpeg: {stderr.decode()}")
-            return False, f"Erro ao processar áudio: {stderr.decode()}"
-        
-        return True, output_path
+        command, _ = build_speed_command(input_path, output_path, speed_factor)
+        return run_ffmpeg(command, output_path)
     except Exception as e:
         logger.error(f"Erro ao alterar velocidade do áudio: {e}")
         return False, str(e)
 
 async def ensure_voice_client(ctx):
-    """Garante que o bot esteja conectado ao canal de voz do autor"""
+    """Garante que o bot esteja conectado ao canal de voz do autor.
+
+    A conexão do servidor é mantida aberta pelo voice_manager: se o bot já
+    estiver no canal ela é reaproveitada, e se estiver em outro canal é
+    movida, sem desconectar. O áudio em reprodução não é interrompido.
+    """
     # Verificar se o autor está em um canal de voz
     if ctx.author.voice is None:
         await ctx.send("❌ Você precisa estar em um canal de voz para usar este comando!")
         return None
     
     voice_channel = ctx.author.voice.channel
-    logger.info(f"Tentando conectar ao canal: {voice_channel.name} (ID: {voice_channel.id})")
-    
-    # Obter o cliente de voz para o servidor atual
-    voice_client = ctx.guild.voice_client
-    
-    # Se o bot já estiver conectado ao canal correto, apenas retornar o cliente
-    if voice_client and voice_client.channel.id == voice_channel.id:
-        logger.info(f"Já conectado ao canal correto: {voice_channel.name}")
-        # Se estiver reproduzindo, interromper
-        if voice_client.is_playing() or voice_client.is_paused():
-            voice_client.stop()
-            logger.info(f"Áudio anterior interrompido para nova reprodução")
-        return voice_client
-    
-    # Se o bot estiver conectado a um canal diferente, desconectar primeiro
-    if voice_client:
-        # Se estiver reproduzindo, interromper
-        if voice_client.is_playing() or voice_client.is_paused():
-            voice_client.stop()
-        
-        # Desconectar do canal atual para evitar problemas de conexão persistente
-        logger.info(f"Desconectando do canal {voice_client.channel.name} para reconexão")
-        await voice_client.disconnect(force=True)
-        
-        # Aguardar um pouco para garantir que a desconexão foi concluída
-        await asyncio.sleep(1)
-        voice_client = None
+    logger.info(f"Garantindo conexão ao canal: {voice_channel.name} (ID: {voice_channel.id})")
     
-    # Tentar conectar com várias tentativas, se necessário
-    max_retries = 3
-    for attempt in range(1, max_retries + 1):
-        try:
-            logger.info(f"Tentativa {attempt} de conectar ao canal {voice_channel.name}")
-            voice_client = await voice_channel.connect(timeout=10.0, reconnect=True)
-            logger.info(f"Conectado com sucesso ao canal de voz: {voice_channel.name}")
-            
-            # Se chegamos aqui, a conexão foi bem-sucedida
-            return voice_client
-            
-        except discord.ClientException as ce:
-            logger.error(f"Erro de cliente Discord ao conectar: {ce}")
-            if "already connected" in str(ce).lower():
-                # Tenta obter a conexão existente e retorná-la
-                for vc in ctx.bot.voice_clients:
-                    if vc.guild.id == ctx.guild.id:
-                        logger.info(f"Encontrada conexão existente, usando-a em vez de criar nova")
-                        return vc
-            
-            # Se não é o último retry, aguardar antes de tentar novamente
-            if attempt < max_retries:
-                logger.info(f"Aguardando antes de tentar novamente...")
-                await asyncio.sleep(2)
-            else:
-                await ctx.send(f"❌ Erro ao conectar ao canal (problema de cliente): {ce}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Erro ao conectar ao canal de voz: {e}")
-            
-            # Se não é o último retry, aguardar antes de tentar novamente
-            if attempt < max_retries:
-                logger.info(f"Aguardando antes de tentar novamente...")
-                await asyncio.sleep(2)
-            else:
-                await ctx.send(f"❌ Erro ao conectar ao canal de voz após {max_retries} tentativas: {e}")
-                return None
-    
-    # Se chegamos aqui, todas as tentativas falharam
-    return None
+    success, result = await voice_manager.manager.connect(ctx.guild, voice_channel)
+    if not success:
+        await ctx.send(f"❌ {result}")
+        return None
+    return result
 
 def create_embed_for_audio(audio, is_playing=False):
     """Cria um embed para exibir informações de um áudio"""
@@ -285,3 +591,43 @@ def create_embed_for_audio(audio, is_playing=False):
     embed.set_footer(text=f"Caminho: {audio['caminho']}")
     
     return embed
+
+class InteractionContext:
+    """Adapta uma Interaction de slash command para as funções que esperam um ctx de prefixo"""
+
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.bot = interaction.client
+        self.guild = interaction.guild
+        self.author = interaction.user
+        self.channel = interaction.channel
+
+    async def send(self, content=None, **kwargs):
+        """Responde pela interação (a resposta inicial deve ter sido adiada com defer)"""
+        if content is not None:
+            kwargs['content'] = content
+        return await self.interaction.followup.send(**kwargs)
+
+async def audio_name_autocomplete(interaction, current):
+    """Autocomplete de nomes de áudio para slash commands.
+
+    Responde a partir do índice de busca em memória, sem ler o catálogo
+    do disco a cada tecla digitada. Se o catálogo acabou de mudar, usa o
+    índice anterior enquanto o novo é montado em segundo plano, para não
+    estourar o prazo de 3 s do Discord nem travar os outros servidores.
+    """
+    return [
+        app_commands.Choice(name=nome[:100], value=nome[:100])
+        for nome in search.complete(current, limit=25)
+    ]
+
+async def ensure_slash_active(interaction):
+    """Verifica se o bot está ativado antes de executar um slash command"""
+    activation_cog = interaction.client.get_cog('Activation')
+    if activation_cog and not activation_cog.is_bot_active():
+        await interaction.response.send_message(
+            f"O bot está desativado. {activation_cog.get_activation_message()}",
+            ephemeral=True
+        )
+        return False
+    return True
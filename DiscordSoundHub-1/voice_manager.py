@@ -0,0 +1,218 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+import discord
+
+# Configuração do logger
+logger = logging.getLogger('discord_bot.voice_manager')
+
+# Segundos sem reprodução antes de desconectar do canal de voz (0 desativa)
+VOICE_IDLE_TIMEOUT = float(os.environ.get('VOICE_IDLE_TIMEOUT', '300'))
+
+# Tempo limite de cada tentativa de conexão
+CONNECT_TIMEOUT = 10.0
+
+# Tentativas de conexão e espera inicial entre elas (dobra a cada falha)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.25
+
+# Quantidade de medições de latência guardadas por servidor
+LATENCY_SAMPLES = 50
+
+class GuildConnection:
+    """Estado e métricas da conexão de voz de um servidor"""
+
+    def __init__(self, guild):
+        self.guild = guild
+        self.lock = asyncio.Lock()
+        self.last_activity = time.monotonic()
+        self.connects = 0
+        self.moves = 0
+        self.reuses = 0
+        self.failures = 0
+        self.stale = 0
+        self.idle_disconnects = 0
+        self.last_error = None
+        self.connect_latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.move_latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    @property
+    def voice_client(self):
+        return self.guild.voice_client
+
+    def is_healthy(self):
+        voice_client = self.voice_client
+        return voice_client is not None and voice_client.is_connected()
+
+def _percentile(samples, fraction):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class VoiceManager:
+    """Mantém as conexões de voz abertas por servidor.
+
+    Uma conexão existente é reaproveitada; troca de canal usa move_to em vez
+    de desconectar e reconectar. Conexões que deixaram de responder são
+    descartadas e refeitas, com novas tentativas em backoff exponencial. Uma
+    tarefa em segundo plano desconecta servidores ociosos após
+    VOICE_IDLE_TIMEOUT segundos.
+    """
+
+    def __init__(self, idle_timeout=VOICE_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self._connections = {}  # {guild_id: GuildConnection}
+        self._idle_task = None
+
+    def _state(self, guild):
+        state = self._connections.get(guild.id)
+        if state is None:
+            state = self._connections[guild.id] = GuildConnection(guild)
+        state.guild = guild
+        return state
+
+    def touch(self, guild_id):
+        """Registra atividade no servidor (adia a desconexão por ociosidade).
+
+        Pode ser chamado da thread de áudio do discord.py.
+        """
+        state = self._connections.get(guild_id)
+        if state:
+            state.touch()
+
+    async def connect(self, guild, channel):
+        """Garante uma conexão ao canal; retorna (sucesso, voice_client ou mensagem de erro)"""
+        self._start_idle_task()
+        state = self._state(guild)
+        async with state.lock:
+            state.touch()
+            voice_client = guild.voice_client
+
+            if voice_client and voice_client.is_connected():
+                if voice_client.channel.id == channel.id:
+                    state.reuses += 1
+                    return True, voice_client
+
+                start = time.perf_counter()
+                try:
+                    await voice_client.move_to(channel)
+                    state.move_latencies.append(time.perf_counter() - start)
+                    state.moves += 1
+                    logger.info(f"Movido para o canal {channel.name} em {state.move_latencies[-1] * 1000:.0f} ms")
+                    return True, voice_client
+                except Exception as e:
+                    logger.warning(f"Falha ao mover para o canal {channel.name}, reconectando: {e}")
+                    state.last_error = str(e)
+
+            # Conexão existente, mas sem resposta: descartar antes de reconectar
+            if voice_client:
+                state.stale += 1
+                logger.info(f"Descartando conexão de voz inativa no servidor {guild.id}")
+                try:
+                    await voice_client.disconnect(force=True)
+                except Exception as e:
+                    logger.warning(f"Erro ao descartar conexão de voz: {e}")
+
+            delay = RETRY_BACKOFF
+            for attempt in range(1, MAX_RETRIES + 1):
+                start = time.perf_counter()
+                try:
+                    voice_client = await channel.connect(timeout=CONNECT_TIMEOUT, reconnect=True)
+                    state.connect_latencies.append(time.perf_counter() - start)
+                    state.connects += 1
+                    state.touch()
+                    logger.info(f"Conectado ao canal {channel.name} em {state.connect_latencies[-1] * 1000:.0f} ms (tentativa {attempt})")
+                    return True, voice_client
+                except discord.ClientException as ce:
+                    # Outra tarefa conectou enquanto esta tentava
+                    if guild.voice_client and guild.voice_client.is_connected():
+                        return True, guild.voice_client
+                    error = ce
+                except Exception as e:
+                    error = e
+
+                state.failures += 1
+                state.last_error = str(error)
+                logger.error(f"Tentativa {attempt} de conectar ao canal {channel.name} falhou: {error}")
+                if attempt < MAX_RETRIES:
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+            return False, f"Erro ao conectar ao canal de voz após {MAX_RETRIES} tentativas: {error}"
+
+    async def disconnect(self, guild):
+        """Desconecta do canal de voz do servidor, se houver conexão"""
+        voice_client = guild.voice_client
+        if not voice_client:
+            return False
+        await voice_client.disconnect()
+        return True
+
+    def _start_idle_task(self):
+        if self.idle_timeout <= 0:
+            return
+        if self._idle_task is None or self._idle_task.done():
+            self._idle_task = asyncio.get_running_loop().create_task(self._idle_loop())
+
+    async def _idle_loop(self):
+        interval = max(1.0, min(30.0, self.idle_timeout / 2))
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for state in list(self._connections.values()):
+                voice_client = state.voice_client
+                if not voice_client:
+                    continue
+                if voice_client.is_playing() or voice_client.is_paused():
+                    state.touch()
+                    continue
+                if now - state.last_activity < self.idle_timeout:
+                    continue
+                try:
+                    await voice_client.disconnect()
+                    state.idle_disconnects += 1
+                    logger.info(f"Desconectado do servidor {state.guild.id} por ociosidade")
+                except Exception as e:
+                    logger.error(f"Erro ao desconectar por ociosidade: {e}")
+
+    def stats(self, guild_id):
+        """Métricas de conexão de um servidor (latências em milissegundos)"""
+        state = self._connections.get(guild_id)
+        if state is None:
+            return None
+
+        def summary(samples):
+            p50 = _percentile(samples, 0.5)
+            p95 = _percentile(samples, 0.95)
+            return {
+                'amostras': len(samples),
+                'p50_ms': p50 * 1000 if p50 is not None else None,
+                'p95_ms': p95 * 1000 if p95 is not None else None
+            }
+
+        voice_client = state.voice_client
+        return {
+            'conectado': state.is_healthy(),
+            'canal': voice_client.channel.name if voice_client and voice_client.channel else None,
+            'latencia_ws_ms': voice_client.latency * 1000 if state.is_healthy() else None,
+            'ocioso_s': time.monotonic() - state.last_activity,
+            'conexoes': state.connects,
+            'movimentos': state.moves,
+            'reaproveitadas': state.reuses,
+            'falhas': state.failures,
+            'descartadas': state.stale,
+            'desconexoes_ociosidade': state.idle_disconnects,
+            'ultimo_erro': state.last_error,
+            'conectar': summary(state.connect_latencies),
+            'mover': summary(state.move_latencies)
+        }
+
+
+# Gerenciador compartilhado por todos os cogs
+manager = VoiceManager()